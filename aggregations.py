@@ -0,0 +1,53 @@
+# SERVER SIDE AGGREGATIONS OVER THE EXPENSE BUCKETS
+# SORTING, DATE WINDOWS AND GROUPING RUN INSIDE MONGODB, PYTHON ONLY TOUCHES THE RESULT
+import pymongo
+import expense_store
+
+
+# PIPELINE STAGES TURNING THE BUCKETS OF A USER INTO ONE DOCUMENT PER EXPENSE
+def _expense_stages(email, start=None, end=None):
+    bucketFilter = {"user": email}
+    dateFilter = {}
+    months = {}
+    # ONLY OPEN THE BUCKETS OF THE MONTHS INSIDE THE WINDOW
+    if start is not None:
+        months["$gte"] = expense_store.month_of(start)
+        dateFilter["$gte"] = start
+    if end is not None:
+        months["$lte"] = expense_store.month_of(end)
+        dateFilter["$lte"] = end
+    if months:
+        bucketFilter["month"] = months
+    stages = [
+        {"$match": bucketFilter},
+        {"$unwind": "$expenses"},
+        {"$replaceRoot": {"newRoot": "$expenses"}},
+    ]
+    if dateFilter:
+        stages.append({"$match": {"date": dateFilter}})
+    return stages
+
+
+# CURSOR OVER THE EXPENSES OF A USER SORTED BY DATE (OLDEST FIRST)
+def expenses(collection, email, start=None, end=None, batch_size=1000):
+    pipeline = _expense_stages(email, start, end) + [
+        {"$sort": {"date": pymongo.ASCENDING, "_id": pymongo.ASCENDING}},
+    ]
+    return collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+
+
+# PER DATE TOTALS OF ONE CATEGORY BETWEEN TWO DATES, OLDEST FIRST, AS [["%Y-%m-%d", AMOUNT]]
+# (THE ROLLUPS DO NOT SPLIT THE DAYS BY CATEGORY)
+def daily_totals(collection, email, start=None, end=None, category=None):
+    stages = _expense_stages(email, start, end)
+    if category is not None:
+        stages.append({"$match": {"category": category}})
+    pipeline = stages + [
+        {"$group": {"_id": "$date", "amount": {"$sum": "$amount"}}},
+        {"$sort": {"_id": pymongo.ASCENDING}},
+    ]
+    totals = {}
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        date = expense_store.format_date(row["_id"])
+        totals[date] = totals.get(date, 0) + row["amount"]
+    return [[date, amount] for date, amount in totals.items()]
@@ -0,0 +1,183 @@
+# SPENDING ANALYTICS OVER THE WHOLE HISTORY OF A USER
+# THE EXPENSES ARE READ ONCE INTO NUMPY COLUMNS (DATE ORDINAL, AMOUNT, CATEGORY CODE
+# AND MONTH NUMBER) AND EVERY FIGURE OF THE REPORT IS A VECTORIZED PASS OVER THEM:
+#   month       SPENT THIS MONTH SO FAR, BURN RATE PER DAY, PROJECTED SPENDING AND
+#               BALANCE AT THE END OF THE MONTH
+#   categories  PER CATEGORY: THIS MONTH SO FAR AND PROJECTED, THE AVERAGE OF THE
+#               PREVIOUS "months" MONTHS AND THEIR TREND (LEAST SQUARES, PER MONTH)
+#   anomalies   EXPENSES OF THE LAST RECENT_DAYS DAYS MORE THAN THRESHOLD STANDARD
+#               DEVIATIONS ABOVE THE MEAN OF THEIR CATEGORY
+# READING THE BUCKETS IS THE SLOW PART, SO THE COLUMNS ARE CACHED PER USER REVISION
+# (application.analyticsCache) AND A History KEEPS ITS LAST REPORT
+from datetime import date, datetime as dt
+import numpy as np
+import expense_store
+
+# PREVIOUS MONTHS THE CATEGORY AVERAGES AND TRENDS ARE TAKEN OVER
+MONTHS = 6
+
+# DAYS OF EXPENSES CHECKED FOR ANOMALIES
+RECENT_DAYS = 30
+
+# STANDARD DEVIATIONS ABOVE THE CATEGORY MEAN FLAGGING AN EXPENSE
+THRESHOLD = 3.0
+
+# EXPENSES A CATEGORY NEEDS BEFORE ITS EXPENSES ARE FLAGGED
+MIN_COUNT = 5
+
+# ANOMALIES RETURNED, LARGEST FIRST
+MAX_ANOMALIES = 20
+
+# ORDINAL OF 1970-01-01, WHERE NUMPY COUNTS THE DAYS FROM
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+class History:
+    # THE EXPENSES OF ONE USER AS COLUMNS, ONE ROW PER EXPENSE (IN NO ORDER)
+    def __init__(self, days, amounts, categories, names):
+        self.days = days
+        self.amounts = amounts
+        self.categories = categories
+        self.names = names
+        # MONTHS SINCE 1970-01
+        self.months = (
+            (days - EPOCH).astype("datetime64[D]").astype("datetime64[M]").astype(np.int32)
+        )
+        self._report = None
+
+    def __len__(self):
+        return len(self.days)
+
+    # BYTES HELD BY THE COLUMNS
+    @property
+    def nbytes(self):
+        return sum(c.nbytes for c in (self.days, self.amounts, self.categories, self.months))
+
+    # REPORT FOR "today", BUILT ONCE PER DAY, BUDGET AND SPENT AMOUNT
+    def report(self, budget, spent, today=None, months=MONTHS):
+        key = (today or date.today(), budget, spent, months)
+        if self._report is None or self._report[0] != key:
+            self._report = (key, report(self, budget, spent, key[0], months))
+        return self._report[1]
+
+
+# READ THE EXPENSES OF A USER INTO A History (ONLY THE THREE FIELDS NEEDED)
+def load(collection, email, batch_size=100):
+    ordinals, amounts, categories, codes = [], [], [], {}
+    for bucket in collection.find(
+        {"user": email},
+        {"_id": 0, "expenses.date": 1, "expenses.amount": 1, "expenses.category": 1},
+        batch_size=batch_size,
+    ):
+        for expense in bucket["expenses"]:
+            day = expense["date"]
+            if not isinstance(day, dt):
+                # AN OLD STRING DATE
+                day = expense_store.parse_date(day)
+            ordinals.append(day.toordinal())
+            amounts.append(expense["amount"])
+            categories.append(codes.setdefault(expense["category"], len(codes)))
+    return History(
+        np.array(ordinals, dtype=np.int32),
+        np.array(amounts, dtype=np.float64),
+        np.array(categories, dtype=np.int32),
+        list(codes),
+    )
+
+
+def _month_number(day):
+    return (day.year - 1970) * 12 + day.month - 1
+
+
+def _round(value):
+    return round(float(value), 2)
+
+
+# THE REPORT OF A History ON "today" FOR A USER WITH THIS BUDGET AND SPENT AMOUNT
+def report(history, budget, spent, today, months=MONTHS):
+    if isinstance(today, dt):
+        today = today.date()
+    todayOrdinal = today.toordinal()
+    monthStart = today.replace(day=1)
+    nextMonth = date(today.year + today.month // 12, today.month % 12 + 1, 1)
+    daysInMonth = (nextMonth - monthStart).days
+    elapsed = today.day
+    currentMonth = _month_number(today)
+    size = len(history.names)
+    days, amounts, categories = history.days, history.amounts, history.categories
+
+    # THIS MONTH SO FAR
+    thisMonth = (days >= monthStart.toordinal()) & (days <= todayOrdinal)
+    monthSpent = amounts[thisMonth].sum()
+    burnRate = monthSpent / elapsed
+    balance = budget - spent
+
+    # PER CATEGORY: THIS MONTH AND A (MONTH, CATEGORY) GRID OF THE PREVIOUS MONTHS
+    categorySpent = np.bincount(
+        categories[thisMonth], weights=amounts[thisMonth], minlength=size
+    )
+    first = currentMonth - months
+    previous = (history.months >= first) & (history.months < currentMonth)
+    grid = np.bincount(
+        (history.months[previous] - first) * size + categories[previous],
+        weights=amounts[previous],
+        minlength=months * size,
+    ).reshape(months, size)
+    average = grid.mean(axis=0)
+    x = np.arange(months) - (months - 1) / 2
+    trend = x @ (grid - average) / (x @ x) if months > 1 else np.zeros(size)
+    projected = categorySpent / elapsed * daysInMonth
+
+    categoryRows = []
+    for code in np.flatnonzero((categorySpent != 0) | (average != 0)):
+        categoryRows.append(
+            {
+                "category": history.names[code],
+                "spent": _round(categorySpent[code]),
+                "projected": _round(projected[code]),
+                "average": _round(average[code]),
+                "trend": _round(trend[code]),
+                "change": _round(projected[code] / average[code] - 1) if average[code] else None,
+            }
+        )
+    categoryRows.sort(key=lambda row: row["projected"], reverse=True)
+
+    # ANOMALIES: Z SCORE OF THE RECENT EXPENSES AGAINST THEIR WHOLE CATEGORY
+    counts = np.bincount(categories, minlength=size)
+    sums = np.bincount(categories, weights=amounts, minlength=size)
+    squares = np.bincount(categories, weights=amounts * amounts, minlength=size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = sums / counts
+        std = np.sqrt(np.maximum(squares / counts - mean * mean, 0))
+    recent = np.flatnonzero(
+        (days > todayOrdinal - RECENT_DAYS) & (days <= todayOrdinal)
+    )
+    recentCategories = categories[recent]
+    usable = (std[recentCategories] > 0) & (counts[recentCategories] >= MIN_COUNT)
+    recent, recentCategories = recent[usable], recentCategories[usable]
+    scores = (amounts[recent] - mean[recentCategories]) / std[recentCategories]
+    flagged = np.flatnonzero(scores > THRESHOLD)
+    flagged = flagged[np.argsort(-scores[flagged], kind="stable")][:MAX_ANOMALIES]
+
+    return {
+        "month": {
+            "month": monthStart.strftime("%Y-%m"),
+            "spent": _round(monthSpent),
+            "burn_rate": _round(burnRate),
+            "projected_spent": _round(burnRate * daysInMonth),
+            "balance": _round(balance),
+            "projected_balance": _round(balance - burnRate * (daysInMonth - elapsed)),
+            "over_budget": bool(balance - burnRate * (daysInMonth - elapsed) < 0),
+        },
+        "categories": categoryRows,
+        "anomalies": [
+            {
+                "date": date.fromordinal(int(days[recent[i]])).strftime(expense_store.DATE_FORMAT),
+                "amount": _round(amounts[recent[i]]),
+                "category": history.names[categories[recent[i]]],
+                "score": _round(scores[i]),
+            }
+            for i in flagged
+        ],
+        "expenses": len(history),
+    }
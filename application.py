@@ -1,21 +1,34 @@
-import pandas as pd
-import pymongo
 import secrets
-import smtplib
-import random
-import matplotlib
-matplotlib.use('Agg')
-from werkzeug.security import generate_password_hash, check_password_hash
-import matplotlib.pyplot as plt
+import uuid
 import os
-from io import StringIO
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import tempfile
+import importlib
+import importlib.util
 from flask import Flask, render_template, request, redirect, url_for, session, Response
+from flask import jsonify
 from flask import flash
-from datetime import datetime as dt
+from markupsafe import Markup
+from jinja2 import FileSystemBytecodeCache
+from datetime import datetime as dt, timedelta
 from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+import bson.errors
 import logging
+import database
+import expense_store
+import user_store
+import aggregations
+import rollups
+import mailer as mail_queue
+import sessions
+import summary_cache
+import log_pipeline
+import metrics
+import passwords
+import otp_store
+import recurring
+import assets
+import compression
 
 
 # CREATING A FLASK APPLICATION
@@ -24,41 +37,209 @@ app = Flask(__name__)
 # LOAD THE ENV FILE DATAS
 load_dotenv()
 
-# FETCHING THE CURRENT PROJECT ABSOLUTE PATH
-logFilePath = os.path.join(
-    os.path.dirname(os.path.abspath(__file__)), "allLog", "Logs.log"
+# COMPILED TEMPLATES KEPT ON DISK, A NEW WORKER LOADS THEM INSTEAD OF COMPILING
+# (JINJA_CACHE_DIR, "off" TURNS IT OFF, IT IS ONLY A CACHE AND CAN BE DELETED)
+jinjaCacheDir = os.environ.get(
+    "JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "expense-tracker-jinja")
 )
+if jinjaCacheDir != "off":
+    try:
+        os.makedirs(jinjaCacheDir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinjaCacheDir)
+    except OSError as e:
+        logging.warning(f"Template Cache Not Used, {jinjaCacheDir} Is Not Writable : {e}")
 
-# CREATE FILE IN CASE IF FILE NOT EXIST
-os.makedirs(os.path.dirname(logFilePath), exist_ok=True)
+# GZIP/BROTLI RESPONSES AND THE FINGERPRINTED CSS AND JS UNDER /assets (SET UP ON
+# IMPORT, SO WITH WEB_PRELOAD=1 THE FILES ARE READ AND COMPRESSED ONCE IN THE MASTER)
+compression.init_compression(app)
+assets.init_assets(app)
 
-# LOGGING CONFIGRATION SET UP
-logging.basicConfig(
-    filename=logFilePath,
-    filemode="a",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-)
+# DATABASE, COLLECTIONS AND CHART RENDERER (SET UP BY create_app)
+ExpenseDb = None
+userCollection = None
+expenseCollection = None
+rollupCollection = None
+otpCollection = None
+recurringCollection = None
+scheduler = None
+mailer = None
+summaryCache = None
+analyticsCache = None
+fragmentCache = None
+passwordHasher = None
+loginLimiter = None
+# KEY OF THE OTP HASHES, ONLY THE CONFIGURED SECRET_KEY (THE SAME IN EVERY WORKER)
+otpSecret = None
+# LIMIT ON THE RESET CODES ONE IP ASKS FOR
+otpLimiter = None
+
+
+# APPLICATION FACTORY USED BY GUNICORN ("wsgi:app") AND BY "python application.py"
+def create_app(config=None):
+    global ExpenseDb, userCollection, expenseCollection, rollupCollection, otpCollection
+    global recurringCollection, scheduler
+    global mailer, summaryCache, analyticsCache, fragmentCache, passwordHasher, loginLimiter
+    global otpSecret, otpLimiter
+    if config:
+        app.config.update(config)
+    # STATELESS WORKERS KEEP NOTHING ON THE LOCAL DISK, SO ANY WORKER ON ANY MACHINE
+    # CAN SERVE ANY REQUEST
+    stateless = app.config.get("STATELESS", os.environ.get("STATELESS") == "1")
+
+    # JSON LOGS WRITTEN BY A BACKGROUND THREAD INTO THE ROTATING allLog/Logs.log
+    # (STDERR FOR STATELESS WORKERS, COLLECTED BY THE PLATFORM)
+    logFile = app.config.get("LOG_FILE")
+    if logFile is None and stateless:
+        logFile = os.environ.get("LOG_FILE", "-")
+    log_pipeline.setup(logFile)
+
+    # FETCH THE SECRETE KEY FOR SESSION OR GENERATE NEW IN CASE NOT FOUND IN ENV FILE
+    app.secret_key = app.config.get("SECRET_KEY") or os.environ.get("SECRET_KEY")
+    # A CODE SAVED BY ONE WORKER IS CHECKED BY ANY OTHER, SO A RANDOM KEY CAN NOT BE USED
+    otpSecret = app.secret_key or None
+    if not app.secret_key:
+        if stateless:
+            # EVERY WORKER MUST SIGN THE SESSION COOKIES WITH THE SAME KEY
+            raise RuntimeError("SECRET_KEY Must Be Set When STATELESS=1")
+        # A RANDOM KEY ONLY WORKS INSIDE THIS PROCESS
+        logging.warning(
+            "SECRET_KEY Not Set, Sessions Will Not Survive A Restart And Password Reset Is Off"
+        )
+        app.secret_key = secrets.token_hex(16)
+
+    # DATABASE CONNECTION WITH MONGODB (ONLY ONCE PER PROCESS)
+    if ExpenseDb is None:
+        try:
+            # CONNECT WITH MONGO DB AND FETCH THE DATABASE
+            ExpenseDb = database.get_database(
+                app.config.get("MONGO_URL"), event_listeners=[metrics.CommandTimer()]
+            )
+            # CREATING A COLLECTION
+            userCollection = ExpenseDb[user_store.COLLECTION]
+            # COLLECTION OF THE EXPENSE BUCKETS
+            expenseCollection = ExpenseDb[expense_store.COLLECTION]
+            # DAILY, MONTHLY AND CATEGORY TOTALS KEPT UP TO DATE ON EVERY WRITE
+            rollupCollection = ExpenseDb[rollups.COLLECTION]
+            # ONE TIME PASSWORDS OF THE PASSWORD RESET (EXPIRED BY A TTL INDEX)
+            otpCollection = ExpenseDb[otp_store.COLLECTION]
+            # RECURRING EXPENSE AND BUDGET RULES
+            recurringCollection = ExpenseDb[recurring.COLLECTION]
+            # CREATE THE INDEXES IF NOT EXIST
+            database.bootstrap(ExpenseDb)
+        except Exception as e:
+            # SAVING THE LOG INFO IN CASE ERROR OCCUR
+            logging.info("Error Occured During MongoDB Connection ")
+
+    # PASSWORD HASHING ON A PROCESS POOL AND THE LIMITS ON CONCURRENT LOGINS
+    if passwordHasher is None:
+        passwordHasher = passwords.PasswordHasher.from_env()
+        loginLimiter = passwords.LoginLimiter.from_env()
+        otpLimiter = otp_store.IssueLimiter.from_env()
 
+    # OUTBOUND MAIL QUEUE WITH ONE PERSISTENT SMTP CONNECTION
+    if mailer is None:
+        mailer = mail_queue.Mailer.from_env()
 
-# DATABASE CONNECTION WITH MONGODB
-try:
-    # MONGO DB URL
-    mongo_url = os.environ.get("mongo_url")
-    # CONNECT WITH MONGO DB
-    Client = pymongo.MongoClient(mongo_url)
-    # CREATING A DATABASE
-    ExpenseDb = Client["ExpenseTracker"]
-    # CREATING A COLLECTION
-    userCollection = ExpenseDb["User"]
-except Exception as e:
-    # SAVING THE LOG INFO IN CASE ERROR OCCUR
-    logging.info("Error Occured During MongoDB Connection ")
+    # SERVER SIDE SESSIONS AND THE CACHE OF THE DASHBOARD SUMMARIES
+    if summaryCache is None:
+        sessions.init_sessions(app, mongo_db=ExpenseDb, stateless=stateless)
+        # PER ROUTE LATENCY, MONGODB COMMANDS PER REQUEST AND /metrics
+        metrics.init_metrics(app)
+        summaryCache = summary_cache.SummaryCache(
+            max_size=int(os.environ.get("SUMMARY_CACHE_SIZE", 10000)),
+            ttl=float(os.environ.get("SUMMARY_CACHE_TTL", 300)),
+        )
+        # DROP THE SUMMARIES WRITTEN BY THE OTHER WORKERS (CHANGE STREAM OR POLL)
+        if userCollection is not None:
+            summary_cache.Invalidator.from_env(summaryCache, userCollection).start()
+        # EXPENSE HISTORIES OF THE ANALYTICS AS NUMPY COLUMNS, PER USER REVISION
+        analyticsCache = summary_cache.SummaryCache(
+            max_size=int(os.environ.get("ANALYTICS_CACHE_SIZE", 32)),
+            ttl=float(os.environ.get("ANALYTICS_CACHE_TTL", 3600)),
+            name="analytics",
+        )
+        # RENDERED SUMMARY CARDS AND LAST FIVE EXPENSES OF THE HOME PAGE, PER USER REVISION
+        fragmentCache = summary_cache.SummaryCache(
+            max_size=int(os.environ.get("FRAGMENT_CACHE_SIZE", 10000)),
+            ttl=float(os.environ.get("FRAGMENT_CACHE_TTL", 3600)),
+            name="fragments",
+        )
+
+    # WRITES THE DUE RECURRING EXPENSES AND BUDGETS (ONE WORKER AT A TIME, LEASED)
+    if scheduler is None and ExpenseDb is not None:
+        if os.environ.get("RECURRING_SCHEDULER", "1") != "0":
+            scheduler = recurring.Scheduler.from_env(ExpenseDb)
+            scheduler.start()
+    return app
+
+
+# MODULES ONLY SOME ROUTES NEED, IMPORTED ON FIRST USE OR BY warm_up
+LAZY_MODULES = [
+    "analytics",
+    "exporters",
+    "importer",
+    "smtplib",
+    "email.mime.text",
+    "email.mime.multipart",
+    "pyarrow.parquet",
+]
 
 
-# FETCH THE SECRETE KEY FOR SESSION OR GENERATE NEW IN CASE NOT FOUND IN ENV FILE
-app.secret_key = os.environ.get("SECRET_KEY", secrets.token_hex(16))
+# IMPORT THE LAZY MODULES AND COMPILE THE TEMPLATES BEFORE GUNICORN FORKS THE
+# WORKERS (WEB_PRELOAD=1), SO EVERY WORKER STARTS WITH THEM IN SHARED MEMORY AND
+# THE FIRST REQUESTS DO NOT PAY FOR THEM. NO CONNECTION OR THREAD IS OPENED HERE
+def warm_up():
+    for name in LAZY_MODULES:
+        if importlib.util.find_spec(name.split(".")[0]) is not None:
+            importlib.import_module(name)
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    return app
+
+
+# SAVE WHO THE USER IS IN THE SESSION AND THE DASHBOARD SUMMARY IN THE CACHE
+def remember_summary(summary):
+    session["user"] = {"email": summary["email"], "name": summary["name"], "rev": summary["rev"]}
+    summaryCache.put(summary["email"], summary["rev"], summary)
+
+
+# DASHBOARD SUMMARY OF THE LOGGED IN USER, READ FROM THE DATABASE ONLY WHEN THE
+# CACHED ONE IS OLDER THAN THE LAST WRITE OF THIS SESSION
+def current_summary():
+    userData = session["user"]
+    return summaryCache.get_or_load(
+        userData["email"],
+        userData.get("rev", 0),
+        lambda: user_store.find_summary(userCollection, userData["email"]),
+    )
+
 
+# IDEMPOTENCY KEY OF A FORM POST (THE HIDDEN "op" FIELD OF THE HOME PAGE FORMS)
+def form_key():
+    key = request.form.get("op", "").strip()
+    return key[:64] or None
+
+
+# TAKE AN EXPENSE OUT OF ITS BUCKET AGAIN WHEN THE USER WAS NOT UPDATED WITH IT, AND
+# MOVE THE USER TO A NEW "rev" SO A HISTORY CACHED WITH THE EXPENSE IS NOT SERVED
+def discard_expense(email, expense):
+    try:
+        expense_store.remove_expense(expenseCollection, email, expense)
+        user_store.touch(userCollection, email)
+    except Exception as e:
+        logging.error(f"Expense {expense['_id']} Of {email} Not Taken Back : {e}")
+
+
+# CHECK THE PASSWORD AGAINST THE SAVED HASH (TIMED, THE HASH IS SLOW ON PURPOSE)
+@metrics.timed
+def verify_password(password_hash, password):
+    return passwordHasher.verify(password_hash, password)
+
+
+# HASH A NEW PASSWORD ON THE HASHING POOL
+@metrics.timed
+def hash_password(password):
+    return passwordHasher.hash(password)
 
 
 # LOGIN PAGE ROUTE
@@ -69,43 +250,44 @@ def login():
         email = request.form.get("email")
         password = request.form.get("password")
         try:
-            try:
-                user = userCollection.find_one({"email": email})
-            except:
-                logging.info("Error In Finding User For Login ")
-                return render_template("login.html", message="Something Went Wrong!")
-            if user:
-                if check_password_hash(user["password"], password):
-                    # SAVE THE USER DETAILS IN THE SESSION
-                    for key in ['_id', 'otp', 'password']:
-                        user.pop(key, None) 
-                    user['balance']=user['budget']-user['spent']
-                    user['expenses']=user['expenses'][-5:]
-                    session["user"] = user
-                    # GENERATE THE GRAPH
-                    generate_chart()
-                    # SAVE LOG ON SUCCESSFUL LOGIN
-                    logging.info(
-                        f"Email : {email} Password : {password} :-Login Successfully & Session Saved Successfully!"
-                    )
-                    # DELETE ALL THE PREVIOUS CHART 
-                    try:
-                        file_path = os.path.join(app.static_folder, "chart.png")
-                        if os.path.exists(file_path):
-                            os.remove(file_path)
-                            print(f"Deleted: {file_path}")
-                    except Exception as e:
-                        print(f"Error deleting file: {e}")
-
-                    # REDIRECT TO HOMEPAGE ROUTE
-                    flash("Login Successfully!","success")
-                    return redirect(url_for("homePage"))
+            # ONLY A FEW LOGINS PER IP AND PER EMAIL HASH AT THE SAME TIME
+            with loginLimiter.hold(request.remote_addr, email):
+                try:
+                    user = user_store.find_for_login(userCollection, email)
+                except:
+                    logging.info("Error In Finding User For Login ")
+                    return render_template("login.html", message="Something Went Wrong!")
+                if user:
+                    if verify_password(user["password"], password):
+                        # THE HASHING METHOD OR COST CHANGED SINCE THE PASSWORD WAS SAVED
+                        if passwordHasher.needs_rehash(user["password"]):
+                            user_store.set_password(
+                                userCollection, email, hash_password(password)
+                            )
+                            logging.info(f"Password Rehashed For Email : {email}")
+                        # SAVE THE USER SUMMARY IN THE SESSION
+                        remember_summary(user_store.to_summary(user))
+                        # SAVE LOG ON SUCCESSFUL LOGIN
+                        logging.info(
+                            f"Email : {email} :-Login Successfully & Session Saved Successfully!"
+                        )
+                        # REDIRECT TO HOMEPAGE ROUTE
+                        flash("Login Successfully!","success")
+                        return redirect(url_for("homePage"))
+                    else:
+                        logging.info(f"Invalid Password For Email : {email}")
+                        return render_template("login.html", message="Invalid Password")
                 else:
-                    logging.info(f"Invalid Password Password : {password}")
-                    return render_template("login.html", message="Invalid Password")
-            else:
-                logging.info(f"Invalid Email Email : {email}")
-                return render_template("login.html", message="Invalid Email")
+                    logging.info(f"Invalid Email Email : {email}")
+                    return render_template("login.html", message="Invalid Email")
+        except passwords.Busy:
+            logging.warning(f"Too Many Logins At Once For Email : {email}")
+            return (
+                render_template(
+                    "login.html", message="Too Many Login Attempts, Please Try Again"
+                ),
+                429,
+            )
         except Exception as e:
             logging.info("Error Occured In Login ")
             return render_template(
@@ -126,7 +308,7 @@ def register():
         confirmpass = request.form.get("confirm_password").strip()
         # CHECK PASSWORD AND CONFIRM PASSWORD IS MATCHING OR NOT ?
         if password != confirmpass:
-            logging.info(f"Password Not Matching For Register : Email :{email} Password :{password} : {confirmpass}")
+            logging.info(f"Password Not Matching For Register : Email :{email}")
             return render_template("register.html", message="Password Is Not Matching")
         # CHECK ANY OF THE VALUE IS INVALID OR NOT 
         if (
@@ -140,48 +322,54 @@ def register():
             return render_template("register.html", message="Invalid Credential")
         else:
             try:
-                # CHECK FOR IS THE EMAIL ALREADY REGISTER OR NOT 
-                user = userCollection.find_one({"email": email})
-                if not user:
-                    try:
-                        # SAVE THE USER DATA INTO THE DATABASE 
-                        userCollection.insert_one(
-                            {
-                                "name": name,
-                                "email": email,
-                                "password": generate_password_hash(password),
-                                "expenses": [],
-                                "budget": 0,
-                                "spent": 0,
-                            }
-                        )
-                    except Exception as e:
-                        # IF ANY ERROR FOUND DURING SAVING USER DATA INTO DATABASE 
-                        # SAVE THE LOG 
-                        logging.info("Error Occured During Inserting User Data Into Database ")
-                        # RETURN BACK TO THE REGISTER PAGE 
-                        return render_template(
-                        "register.html", message="SomeThing Went Wrong"
-                    )
-                    logging.info(f"Name :{name} Email:{email} Password:{password} :: User Register Successfully")
-                    # ON SUCCESSFULLY REGISTRATION REDIRECT TO LOGIN PAGE 
-                    return redirect(url_for("login"))
-                else:
-                    # IF EMAIL FOUND ALREADY REGISTERED 
-                    # SAVE THE LOG 
-                    logging.info("Email Already Registered!")
-                    # RETURN BACK TO THE REGISTER PAGE 
-                    return render_template(
-                        "register.html", message="Email Already Registered"
-                    )
+                # SAVE THE USER DATA INTO THE DATABASE, THE UNIQUE INDEX ON EMAIL 
+                # REJECTS AN EMAIL THAT IS ALREADY REGISTERED 
+                with loginLimiter.hold(request.remote_addr, email):
+                    passwordHash = hash_password(password)
+                user_store.create_user(userCollection, name, email, passwordHash)
+            except passwords.Busy:
+                logging.warning(f"Too Many Registrations At Once For Email : {email}")
+                return (
+                    render_template(
+                        "register.html", message="Too Many Attempts, Please Try Again"
+                    ),
+                    429,
+                )
+            except DuplicateKeyError:
+                # IF EMAIL FOUND ALREADY REGISTERED 
+                # SAVE THE LOG 
+                logging.info("Email Already Registered!")
+                # RETURN BACK TO THE REGISTER PAGE 
+                return render_template(
+                    "register.html", message="Email Already Registered"
+                )
             except Exception as e:
+                # IF ANY ERROR FOUND DURING SAVING USER DATA INTO DATABASE 
+                # SAVE THE LOG 
                 logging.error("Something Went Wrong In Registering The User")
+                # RETURN BACK TO THE REGISTER PAGE 
                 return render_template(
                         "register.html", message="Internal Server Error"
                     )
+            logging.info(f"Name :{name} Email:{email} :: User Register Successfully")
+            # ON SUCCESSFULLY REGISTRATION REDIRECT TO LOGIN PAGE 
+            return redirect(url_for("login"))
     return render_template("register.html")
 
 
+# THE PARTS OF THE HOME PAGE THAT ONLY CHANGE WITH A WRITE OF THE USER, RENDERED
+# AGAIN ONLY FOR A NEW REVISION
+def page_fragments(user):
+    fragments = fragmentCache.get(user["email"], user["rev"])
+    if fragments is None:
+        fragments = {
+            "summary": Markup(render_template("fragments/summary_cards.html", user=user)),
+            "recent": Markup(render_template("fragments/recent_expenses.html", user=user)),
+        }
+        fragmentCache.put(user["email"], user["rev"], fragments)
+    return fragments
+
+
 # HOME PAGE ROUTE
 @app.route("/homePage", methods=["POST", "GET"])
 def homePage():
@@ -189,9 +377,12 @@ def homePage():
     # CHECK FOR VALID USER OR NOT BY CHECKING THE SESSION INFO
     if "user" in session:
         message = request.args.get("message", "")
+        user = current_summary()
         return render_template(
             "homePage.html",
-            user=session['user']
+            user=user,
+            fragments=page_fragments(user),
+            op=uuid.uuid4().hex,
         )
     else:
     # IF SESSION INFO IS NOT PRESENT THEN REDIRECT TO LOGIN PAGE 
@@ -215,42 +406,53 @@ def add_expense():
         date = request.form.get("date").strip()
         category = request.form.get("category").strip()
         # CHECK FOR DATA IS VALID OR NOT 
-        if len(title) == 0 or len(date) == 0 or len(category) == 0:
+        try:
+            date = expense_store.parse_date(date)
+        except ValueError:
+            date = None
+        if len(title) == 0 or date is None or len(category) == 0:
             logging.info("Invalid Data Filled By User")
             flash("Invalid Data Found!", "error")
             return redirect(url_for("homePage"))
         else:
             # CREATE A DICTIONARY OF EXPENSE FOR ADDING INTO THE EXPENSES
-            data = {
-                "date": date,
-                "amount": amount,
-                "title": title,
-                "category": category,
-            }
+            data = expense_store.new_expense(date, amount, title, category)
+            key = form_key()
             try:
-                # ADD THE NEW EXPENSE INTO THE DATABSE 
-                updatedData = userCollection.find_one_and_update(
-                    {"email": email},
-                    {"$push": {"expenses": data}, "$inc": {"spent": amount}},
-                    return_document=pymongo.ReturnDocument.AFTER,
-                )
+                # ADD THE NEW EXPENSE INTO ITS MONTHLY BUCKET FIRST: THE USER'S "rev" IS
+                # BUMPED AFTER IT, SO A HISTORY CACHED UNDER THE NEW "rev" HAS IT
+                expense_store.add_expense(expenseCollection, email, data)
+                try:
+                    # UPDATE THE TOTAL AND THE LAST FIVE EXPENSES ON THE USER, ONCE PER KEY
+                    updatedData, applied = user_store.record_expense(
+                        userCollection, email, expense_store.public(data), key=key
+                    )
+                except Exception:
+                    # TAKE THE EXPENSE BACK SO THE RETRY OF THIS POST DOES NOT ADD IT TWICE
+                    discard_expense(email, data)
+                    raise
+                if applied:
+                    try:
+                        # ADD IT TO THE TOTALS OF ITS DAY, MONTH AND CATEGORY
+                        rollups.record(rollupCollection, email, [data])
+                    except Exception as e:
+                        # THE EXPENSE IS SAVED, ONLY THE TOTALS ARE BEHIND:
+                        # "python rollups.py --repair" REBUILDS THEM FROM THE BUCKETS
+                        logging.error(f"Rollups Not Updated For {email}, Run The Repair : {e}")
+                else:
+                    # A RETRY OF A POST ALREADY SAVED, ITS COPY OF THE EXPENSE GOES
+                    discard_expense(email, data)
+                    logging.info("Expense Already Added For Key %s", key)
                 # UPDATE THE DATA INTO SESSION AND HOME PAGE
-                for key in ['_id', 'otp', 'password']:
-                        updatedData.pop(key, None) 
-                updatedData['balance']=updatedData['budget']-updatedData['spent']
-                updatedData['expenses']=updatedData.get("expenses")[-5:]
-                session['user']=updatedData
+                remember_summary(updatedData)
                 
                 # SAVE THE LOG 
-                logging.info(f"Expense Added Successfully,Updated Data : {updatedData}")
-                # GENERATE CHART FOR UPDATED DATA 
-                generate_chart()
-                
+                logging.info("Expense Added Successfully,Updated Data : %s", updatedData)
                 # RERENSER THE PAGE WITH UPDATED DATA 
                 flash("Expense Added Successfully!","success")
                 return redirect(url_for("homePage"))
             except Exception as e:
-                logging.info("Error Occured During Adding Expense ")
+                logging.error(f"Error Occured During Adding Expense : {e}")
                 flash("Something went wrong!","error")
                 return redirect(url_for("homePage"))
     else:
@@ -270,22 +472,17 @@ def add_budget():
         amount = int(request.form.get("budget_amount").strip())
         try:
             # ADDING THE BUDGET INTO THE DATABSE 
-            updatedData = userCollection.find_one_and_update(
-                {"email": email},
-                {"$inc": {"budget": amount}},
-                return_document=pymongo.ReturnDocument.AFTER,
+            updatedData, applied = user_store.add_budget(
+                userCollection, email, amount, key=form_key()
             )
+            if not applied:
+                logging.info("Budget Already Added For This Request")
             
             # UPDATE THE DATA INTO SESSION AND HOME PAGE
-            for key in ['_id', 'otp', 'password']:
-                updatedData.pop(key, None) 
-                
-            updatedData['expenses']=updatedData.get("expenses")[-5:]
-            updatedData['balance']=amount-updatedData['spent']
-            session["user"] = updatedData
+            remember_summary(updatedData)
             
             # SAVE THE LOG 
-            logging.info(f"Budget Added Successfully,Updated Data : {updatedData}")
+            logging.info("Budget Added Successfully,Updated Data : %s", updatedData)
             
             # RERENDER THE PAGE WITH UPDATED DATA 
             flash("Budget Added Successfully!", "success")
@@ -310,25 +507,27 @@ def reset_all():
         # FETCH THE DATA FROM SESSION 
         userData=session['user']
         email = userData['email']
+        # THE REVISION THE PAGE WAS RENDERED WITH
+        rev = request.values.get("rev")
         try:
-            # RESET ALL THE DATA EXCEPT THE LIST OF EXPENSES 
-            updatedData = userCollection.find_one_and_update(
-                {"email": email},
-                {"$set": {"budget": 0, "spent": 0}},
-                return_document=pymongo.ReturnDocument.AFTER,
+            # RESET ALL THE DATA EXCEPT THE LIST OF EXPENSES, UNLESS IT CHANGED SINCE
+            updatedData, _ = user_store.reset_totals(
+                userCollection, email, rev=int(rev) if rev else None
             )
             
             # UPDATE IN THE SESSION
-            for key in ['_id', 'otp', 'password']:
-                updatedData.pop(key, None) 
-            updatedData['balance']=updatedData['budget']-updatedData['spent']
-            updatedData['expenses']=updatedData.get("expenses")[-5:]
-            session['user']=updatedData
+            remember_summary(updatedData)
             # SAVE THE LOG 
-            logging.info(f"Reset Successfully,Updated Data : {updatedData}")
+            logging.info("Reset Successfully,Updated Data : %s", updatedData)
             # RETURN THE HOME PAGE WITH UPDATED DATA
             flash("Data Reset Successfully","success")
             return redirect(url_for("homePage"))
+        except user_store.Conflict:
+            # ANOTHER TAB OR DEVICE CHANGED THE DATA, SHOW IT BEFORE RESETTING
+            logging.info("Reset Skipped, The Data Changed Since The Page Was Loaded")
+            remember_summary(user_store.find_summary(userCollection, email))
+            flash("Your Data Changed Meanwhile, Please Check It And Reset Again","error")
+            return redirect(url_for("homePage"))
         except Exception as e:
             logging.info("Something Went Wrong During Reset All ")
             flash("Something Went Wrong!","error")
@@ -340,20 +539,71 @@ def reset_all():
         return redirect(url_for("login"))
 
 
+# ADD A RECURRING EXPENSE OR BUDGET TOP UP, WRITTEN BY THE SCHEDULER FROM ITS START
+# DATE ON (A START DATE IN THE PAST IS CAUGHT UP)
+@app.route("/add_recurring", methods=["POST", "GET"])
+def add_recurring():
+    logging.info("Add Recurring Request Fetched")
+    if request.method == "POST" and "user" in session:
+        email = session["user"]["email"]
+        form = request.form
+        try:
+            until = form.get("until", "").strip()
+            rule = recurring.new_rule(
+                email,
+                form.get("kind", "expense").strip(),
+                int(form.get("amount", "").strip()),
+                form.get("every", "").strip(),
+                expense_store.parse_date(form.get("start", "").strip()),
+                title=form.get("title", "").strip(),
+                category=form.get("category", "").strip(),
+                until=expense_store.parse_date(until) if until else None,
+            )
+        except ValueError:
+            logging.info("Invalid Recurring Rule Filled By User")
+            flash("Invalid Data Found!", "error")
+            return redirect(url_for("homePage"))
+        try:
+            recurring.add_rule(recurringCollection, rule)
+            logging.info("Recurring Rule Added : %s", rule["_id"])
+            flash("Recurring Entry Added Successfully!", "success")
+        except Exception as e:
+            logging.error(f"Error Occured During Adding Recurring Rule : {e}")
+            flash("Something Went Wrong!", "error")
+        return redirect(url_for("homePage"))
+    else:
+        logging.info("Unautherised User Trying To Access The Add Recurring Route")
+        return redirect(url_for("login"))
+
+
+# STOP A RECURRING RULE (WHAT IT ALREADY WROTE IS KEPT)
+@app.route("/delete_recurring", methods=["POST", "GET"])
+def delete_recurring():
+    logging.info("Delete Recurring Request Fetched")
+    if request.method == "POST" and "user" in session:
+        try:
+            if recurring.delete_rule(
+                recurringCollection, session["user"]["email"], request.form.get("id", "")
+            ):
+                flash("Recurring Entry Removed", "success")
+            else:
+                flash("Recurring Entry Not Found", "error")
+        except bson.errors.InvalidId:
+            flash("Recurring Entry Not Found", "error")
+        except Exception as e:
+            logging.error(f"Error Occured During Deleting Recurring Rule : {e}")
+            flash("Something Went Wrong!", "error")
+        return redirect(url_for("homePage"))
+    else:
+        logging.info("Unautherised User Trying To Access The Delete Recurring Route")
+        return redirect(url_for("login"))
+
+
 # LOGOUT FUNCTION
 @app.route("/logout", methods=["POST", "GET"])
 def logout():
     logging.info("Log Out Request Fetched")
     if "user" in session:
-        userData=session['user']
-        # DELETE THE GRAPH 
-        try:
-            file_path = os.path.join(app.static_folder, f"{userData['name']}.png")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                logging.info(f"Graph Deleted : {file_path}")
-        except Exception as e:
-            logging.info("Error In Deleteing The File ")
         # CLEARING THE SESSION DATA 
         session.clear()
         # RETURN BACK TO THE LOGIN PAGE 
@@ -367,19 +617,18 @@ def logout():
 @app.route("/resetPassword", methods=["POST", "GET"])
 def resetPassword():
     logging.info("Reset Password Request Fetched ")
-    if "email" in session:
+    # ONLY AFTER THE OTP OF THE EMAIL WAS VERIFIED
+    if "reset_email" in session:
         if request.method == "POST":
             # FETCH THE DATA FROM THE FORM 
-            email = session.get("email")
+            email = session.get("reset_email")
             password = request.form.get("new_password")
             newPassword = request.form.get("confirm_password")
             if password == newPassword:
                 try:
-                    # UPADTE THE PASSWORD IN THE DATABSE 
-                    userCollection.find_one_and_update(
-                        {"email": email}, {"$set": {"password": password}}
-                    )
-                    logging.info(f"Email :{email},Password :{password} [Password Reset Successfully]")
+                    # SAVE THE HASH OF THE NEW PASSWORD IN THE DATABSE 
+                    user_store.set_password(userCollection, email, hash_password(password))
+                    logging.info(f"Email :{email} [Password Reset Successfully]")
                     session.clear()
                     return redirect(url_for("login"))
                 except Exception as e:
@@ -403,157 +652,146 @@ def resetPassword():
 
 
 # FORGOT PASSWORD ROUTE
+# THE SAME ANSWER FOR A REGISTERED AND AN UNKNOWN EMAIL, SO THE PAGE CAN NOT BE USED
+# TO FIND OUT WHO HAS AN ACCOUNT. EVERY STEP IS ONE DATABASE CALL: SAVING THE CODE,
+# THEN CHECKING IT (THE MAILER THREAD LOOKS UP THE USER BEFORE SENDING)
 @app.route("/forgot_password", methods=["POST", "GET"])
 def forgot_password():
     logging.info("Forgot Password Request Fetched")
     if request.method == "POST":
-        # FETCH THE DATA FROM SESSION OR FORM 
-        email = request.form.get("email")
-        
-        # FETCH THE USER FROM THE DATABASE 
-        user = userCollection.find_one({"email": email})
-        
-        # CHECK USER FOUND OR NOT 
-        if user:
-            # CHECK OTP IS AVAILABLE IN REUEST FORM OR NOT 
-            try:
-                otp = request.form.get("otp")
-            except:
-                logging.info("Error Occured While Fetching Otp From Form")
-                return render_template("forgotPassword.html", email=email)
+        # FETCH THE DATA FROM THE FORM 
+        email = request.form.get("email", "").strip()
+        otp = request.form.get("otp", "").strip()
+        if not email:
+            return render_template("forgotPassword.html")
+        if otpSecret is None:
+            logging.error("Password Reset Needs SECRET_KEY To Be Set")
+            return render_template(
+                "forgotPassword.html", message="Password Reset Is Not Available"
+            )
+        try:
             if otp:
-                # IF OTP FOUND IN THE FORM 
-                # VERIFY THE OTP 
-                if verify_otp(otp):
+                # IF OTP FOUND IN THE FORM, CHECK AND USE IT IN ONE CALL
+                if otp_store.redeem(otpCollection, otpSecret, email, otp):
                     # SAVE THE LOG 
                     logging.info("OTP Verified Successfully")
+                    session["reset_email"] = email
                     # REDIRECT TO RESET PASSWORD ROUTE 
                     return redirect(url_for("resetPassword"))
-                else:
-                    # IF OTP IS INCORRECT 
-                    # SAVE THE LOG 
-                    logging.info("Incorrect OTP")
-                    # RERENDER THE FORGOT PASSWORD PAGE 
-                    return render_template(
-                        "forgotPassword.html", message="Incorrect OTP", email=email
-                    )
-            else:
-                # IF OTP NOT FOUND IN FORM MEAN OTP NOT SENT TO USERS EMAIL 
-                # SEND THE OTP TO USER EMAIL 
-                send_mail(email)
-                logging.info(f"OTP Sent To Email : {email}")
-                # SAVE THE EMAIL INTO THE SESSION 
-                session["email"] = email
-                # RERENDER THE FORGOT PASSWORD PAGE 
+                # IF OTP IS INCORRECT, EXPIRED OR USED TOO MANY TIMES 
+                logging.info("Incorrect OTP")
                 return render_template(
-                    "forgotPassword.html",
-                    message=f"OTP Sent Successfully On {email}",
-                    email=email,
+                    "forgotPassword.html", message="Incorrect Or Expired OTP", email=email
                 )
-        else:
-            # IF NO USER FOUND WITH GIVEN EMAIL THEN 
-            # SAVE THE LOG 
-            logging.info("Invalid Email For Forgot Password")
-            return redirect(url_for("forgotPassword.html", "Invalid Email"))
+            # IF OTP NOT FOUND IN FORM MEAN OTP NOT SENT TO USERS EMAIL 
+            # SEND THE OTP TO USER EMAIL, ONLY A FEW PER IP
+            if not otpLimiter.allow(request.remote_addr):
+                logging.warning(f"Too Many OTP Requests From {request.remote_addr}")
+                return (
+                    render_template(
+                        "forgotPassword.html",
+                        message="Too Many OTP Requests, Please Try Again Later",
+                    ),
+                    429,
+                )
+            send_mail(email)
+        except Exception as e:
+            logging.error(f"Something Went Wrong During Forgot Password : {e}")
+            return render_template("forgotPassword.html", message="Something Went Wrong")
+        # RERENDER THE FORGOT PASSWORD PAGE 
+        return render_template(
+            "forgotPassword.html",
+            message=f"If {email} Is Registered, An OTP Was Sent To It (One Per Minute)",
+            email=email,
+        )
     else:
         return render_template("forgotPassword.html")
 
 
-# FUNCTION TO VERIFY OTP
-def verify_otp(otp):
-    logging.info("Verify OTP Function Called ")
-    email = session["email"]
-    # FETCH THE USER FROM THE DATABASE USING EMAIL 
-    user = userCollection.find_one({"email": email})
-    if user["otp"] == otp:
-        logging.info("OTP Is Correct")
-        return True
-    else:
-        logging.info("OTP Is Incorrect")
-        return False
-
-
 # SEND MAIL FUNCTION CODE
+@metrics.timed
 def send_mail(email):
     logging.info("Send Mail Fucntion Called ")
-    sender_email = os.environ.get("sender_email")
-    sender_password = os.environ.get("sender_password")
-
-    # Setup the MIME
-    message = MIMEMultipart()
-    message["From"] = f"ExpenseTracker <{os.environ.get('sender_email')}>"
-    message["To"] = email
-    message["Subject"] = "OTP To Forgot Password"
-    num = random.randint(1000, 9999)
+    code = otp_store.new_code()
+    minutes = int(otp_store.LIFETIME.total_seconds() // 60)
 
     # Body of the email
     body = (
         f"Dear User,\n\n"
         f"We have received a request to reset your password for your ExpenseTracker account.\n\n"
-        f"Your One-Time Password (OTP) for resetting your password is: {num}\n\n"
-        f"Please use this OTP within the next 10 minutes to complete your password reset process.\n\n"
+        f"Your One-Time Password (OTP) for resetting your password is: {code}\n\n"
+        f"Please use this OTP within the next {minutes} minutes to complete your password reset process.\n\n"
         f"If you did not request a password reset, please ignore this email.\n\n"
         f"Thank you for using ExpenseTracker.\n\n"
         f"Best Regards,\n"
         f"ExpenseTracker Team"
     )
 
-    message.attach(MIMEText(body, "plain"))
-
-    # Sending the email via Gmail's SMTP server
-    try:
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()  # Secure the connection
-        server.login(sender_email, sender_password)
-        text = message.as_string()
-        server.sendmail(sender_email, email, text)
-        server.quit()
-        userCollection.find_one_and_update(
-            {"email": email}, {"$set": {"otp": str(num)}}
-        )
-        logging.info(f"OTP Sent To Email : {email},OTP : {num}")
-        return True
-    except Exception as e:
-        logging.info("Failed To Send The Email")
-        return False
+    # SAVE THE HASH OF THE CODE FIRST SO IT CAN BE VERIFIED AS SOON AS THE MAIL ARRIVES
+    if not otp_store.issue(otpCollection, otpSecret, email, code, cooldown=otpLimiter.cooldown):
+        # THE LAST CODE OF THIS EMAIL IS STILL IN ITS COOLDOWN, IT STAYS THE VALID ONE
+        logging.info(f"OTP Not Sent, Last One Too Recent For Email : {email}")
+        return
+    # THE MAILER THREAD SENDS IT IF THE USER EXISTS, THE REQUEST DOES NOT WAIT
+    mailer.enqueue(
+        email,
+        "OTP To Forgot Password",
+        body,
+        check=lambda: user_store.exists(userCollection, email),
+    )
+    logging.info(f"OTP Queued For Email : {email}")
 
 
 # DOWNLOAD EXPENSE ROUTE
 @app.route("/download_expense", methods=["POST", "GET"])
 def download_expense():
     logging.info("Download Expense Request Fetched")
+    import exporters
+
     if request.method == "POST":
         userData=session['user']
         email = userData["email"]
         category = request.form.get("category")
-        user = userCollection.find_one({"email": email})
+        fileFormat = request.form.get("format", "csv")
+        if fileFormat not in exporters.FORMATS:
+            flash("Invalid Download Format!", "error")
+            return redirect(url_for("homePage"))
+        mimetype, extension, exporter = exporters.FORMATS[fileFormat]
+        if fileFormat == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            logging.info("Parquet Export Requested But pyarrow Is Not Installed")
+            flash("Parquet Download Is Not Available!", "error")
+            return redirect(url_for("homePage"))
 
-        if user and "expenses" in user:
-            # Always sort first
-            sorted_expenses = sorted(
-                user["expenses"], key=lambda x: dt.strptime(x["date"], "%Y-%m-%d")
-            )
+        # DATE WINDOW OF THE DOWNLOAD 
+        today = dt.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = end = None
+        try:
+            if category == "1":
+                start, name = today - timedelta(days=6), "weekly"
+            elif category == "2":
+                start, name = today - timedelta(days=29), "monthly"
+            elif category == "custom":
+                startDate = request.form.get("start_date", "").strip()
+                endDate = request.form.get("end_date", "").strip()
+                start = expense_store.parse_date(startDate) if startDate else None
+                end = expense_store.parse_date(endDate) if endDate else None
+                name = f"{startDate or 'first'}_to_{endDate or 'last'}"
+            else:
+                name = "all"
+        except ValueError:
+            flash("Invalid Date Range!", "error")
+            return redirect(url_for("homePage"))
 
-        if category == "1":
-            data = sorted_expenses[-7:]
-            filename = "weekly_expense.csv"
-        elif category == "2":
-            data = sorted_expenses[-30:]
-            filename = "monthly_expense.csv"
-        else:
-            data = sorted_expenses
-            filename = "all_expense.csv"
-        # CONVERTING DATA INTO PANDAS DATAFRAME
-        df = pd.DataFrame(data)
-        # CONVERT DATAFRAME INTO CSV FILE
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_buffer.seek(0)
-        # SENDING RESPONSE
+        # MONGODB SORTS AND FILTERS THE EXPENSES, THE CURSOR IS READ IN BATCHES 
+        cursor = aggregations.expenses(expenseCollection, email, start=start, end=end)
+        logging.info(f"Streaming {fileFormat} Export Of {email}")
+        # SENDING THE FILE PIECE BY PIECE 
         return Response(
-            csv_buffer,
-            mimetype="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
+            exporter(cursor),
+            mimetype=mimetype,
+            headers={
+                "Content-Disposition": f"attachment; filename={name}_expense.{extension}"
+            },
         )
     else:
         # IF UNAUTHERISED USER TRY TO ACCESS THIS ROUTE 
@@ -563,63 +801,278 @@ def download_expense():
         return redirect(url_for("login"))
 
 
-# VISUALISE EXPENSE USING CHART
-def generate_chart():
-    logging.info("Generate Chart Function Called ")
-    # FETCH THE DATA FROM THE SESSION 
+# BULK IMPORT OF EXPENSES FROM A CSV OR JSON FILE
+@app.route("/import_expenses", methods=["POST", "GET"])
+def import_expenses():
+    logging.info("Import Expenses Request Fetched")
+    import importer
+
+    if request.method == "POST" and "user" in session:
+        email = session["user"]["email"]
+        upload = request.files.get("file")
+        if upload is None or not upload.filename:
+            flash("No File Selected!", "error")
+            return redirect(url_for("homePage"))
+        fileFormat = request.form.get("format") or (
+            "json" if upload.filename.lower().endswith(("json", "ndjson")) else "csv"
+        )
+        if fileFormat not in importer.PARSERS:
+            flash("Invalid Import Format!", "error")
+            return redirect(url_for("homePage"))
+
+        # LOG THE PROGRESS AFTER EVERY BATCH 
+        def progress(result):
+            logging.info(f"Import Progress Of {email} : {result['read']} Rows Read, {result['imported']} Imported")
+
+        try:
+            result = importer.import_expenses(
+                userCollection,
+                expenseCollection,
+                email,
+                importer.PARSERS[fileFormat](upload.stream),
+                batch_size=int(os.environ.get("IMPORT_BATCH_SIZE", importer.BATCH_SIZE)),
+                on_progress=progress,
+                rollupCollection=rollupCollection,
+            )
+        except (ValueError, UnicodeDecodeError) as e:
+            logging.info(f"Invalid Import File : {e}")
+            flash("Invalid File!", "error")
+            return redirect(url_for("homePage"))
+        except Exception as e:
+            logging.error(f"Something Went Wrong During Import : {e}")
+            flash("Something Went Wrong!", "error")
+            return redirect(url_for("homePage"))
+
+        # REFRESH THE SUMMARY ONCE FOR THE WHOLE IMPORT 
+        remember_summary(user_store.find_summary(userCollection, email))
+        logging.info(f"Import Finished For {email} : {result}")
+        if request.accept_mimetypes.best == "application/json":
+            return jsonify(result)
+        flash(
+            f"Imported {result['imported']} Expenses "
+            f"({result['duplicates']} Duplicates, {result['invalid']} Invalid Rows)",
+            "success" if result["invalid"] == 0 else "warning",
+        )
+        return redirect(url_for("homePage"))
+    else:
+        logging.info("Unautherised User Trying To Access The Import Expenses Route")
+        return redirect(url_for("login"))
+
+
+# LONGEST SERIES RETURNED BY THE CHART DATA API
+CHART_LIMIT = 366
+
+
+# CHART DATA AS COLUMNS, DRAWN BY THE BROWSER
+#   group=day       PER DATE TOTALS (THE LAST "limit" DAYS WITH EXPENSES, OR start..end)
+#   group=month     PER MONTH TOTALS (THE LAST "limit" MONTHS)
+#   group=category  PER CATEGORY TOTALS (ALL TIME, OR THE MONTHS OF start..end)
+# "category" KEEPS ONLY ONE CATEGORY FOR THE DAY AND MONTH SERIES
+@app.route("/api/chart_data")
+def api_chart_data():
+    if "user" not in session:
+        return jsonify({"error": "Unauthorised"}), 401
+    email = session["user"]["email"]
+    group = request.args.get("group", "day")
+    category = request.args.get("category") or None
     try:
-        userData=session['user']
-        email = userData["email"]
-        # FINDING THE USER FROM THE DATABSE USING GIVEN EMAIL 
-        user = userCollection.find_one({"email": email})
-        if user:
-            # IF USER FOUND 
-            if len(user["expenses"]) != 0:
-                try:
-                    sorted_expenses = sorted(
-                        user["expenses"], key=lambda x: dt.strptime(x["date"], "%Y-%m-%d")
-                    )
-                    monthly_data = sorted_expenses[-30:]
-                except Exception as e:
-                    logging.info(f"No Expense Found Or Something Went Wrong In Sorting The Expense")
-                
-                # CREATING A PANDAS DATAFRAME
-                df = pd.DataFrame(monthly_data)
-                
-                # GROUP THE DATA INTO DATE AND AMOUNT FORM DATE IS INDEX AND AMOUNT WILL VALUE 
-                grouped = df.groupby("date")["amount"].sum().sort_values(ascending=False)
-                
-                # SET THE CHART FIGURE SIZE 
-                plt.figure(figsize=(8, 6))
-                # PLOTING THE BAR CHART WITH BLUE COLOR 
-                grouped.plot(kind="bar", color="skyblue")
-                # SET THE TITLE OF THE CHART 
-                plt.title("Monthly Expense by Date")
-                # SET THE NAME OF Y AXIS VALUE 
-                plt.ylabel("Amount (₹)")
-                # SET THE NAME FOR X AXIS VALUE 
-                plt.xlabel("Date")
-                plt.tight_layout()
-                
-                # FETCHING THE CURRENT WORKING PROJECT ABSOLUTE PATH 
-                base_dir = os.path.dirname(os.path.abspath(__file__)) + "/static"
-                # CREATING NEW PATH FOR SAVING THE CHART 
-                chart_path = os.path.join(base_dir, f"{userData['name']}.png")
-                # IF FOLDER (STATIC) NOT EXIST THEN CREATE 
-                if not os.path.exists(base_dir):
-                    os.makedirs(base_dir)
-                # SAVE THE CHART IN THE CREATED PATH 
-                plt.savefig(chart_path)
-                # CLOSE THE PLOTING 
-                plt.close()
-                logging.info("Chart Prepared Successfully")
-            else:
-                logging.info("No Expense Found")
+        limit = min(int(request.args.get("limit", 30)), CHART_LIMIT)
+        start = request.args.get("start")
+        end = request.args.get("end")
+        start = expense_store.parse_date(start) if start else None
+        end = expense_store.parse_date(end) if end else None
+    except ValueError:
+        return jsonify({"error": "Invalid Parameters"}), 400
+    if group not in ("day", "month", "category") or limit < 1:
+        return jsonify({"error": "Invalid Parameters"}), 400
+
+    try:
+        if group == "day" and category is not None:
+            # THE ROLLUPS DO NOT SPLIT THE DAYS BY CATEGORY, ASK THE BUCKETS 
+            if start is None and end is None:
+                today = dt.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                start = today - timedelta(days=limit - 1)
+            rows = aggregations.daily_totals(expenseCollection, email, start, end, category)
+        elif group == "day" and (start or end):
+            rows = rollups.daily_range(
+                rollupCollection, email, start or dt(1970, 1, 1), end or dt(9999, 12, 31)
+            )
+        elif group == "day":
+            rows = rollups.daily_totals(rollupCollection, email, limit)
+        elif group == "month":
+            rows = [
+                [m["month"], m["amount"]]
+                for m in rollups.monthly_totals(rollupCollection, email, limit, category)
+            ]
         else:
-            logging.info(f"Invalid Email: No USer Found With Email {email}")
-    except Exception as  e:
-        logging.error(f"Something Went Wrong During Generating Chart : {e}")
+            rows = [
+                [c["category"], c["amount"]]
+                for c in rollups.category_totals(rollupCollection, email, start, end)
+            ]
+    except Exception as e:
+        logging.error(f"Something Went Wrong During Fetching Chart Data : {e}")
+        return jsonify({"error": "Something Went Wrong"}), 500
+
+    response = jsonify(
+        {
+            "group": group,
+            "labels": [label for label, _ in rows],
+            "values": [amount for _, amount in rows],
+        }
+    )
+    # THE BROWSER KEEPS THE DATA AND ASKS AGAIN WITH If-None-Match, AN UNCHANGED 
+    # SERIES COMES BACK AS AN EMPTY 304 
+    response.add_etag()
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
+# LONGEST PAGE OF THE EXPENSE HISTORY API
+HISTORY_LIMIT = 100
+
+
+# EXPENSE HISTORY, NEWEST FIRST, ONE PAGE AT A TIME
+#   limit                   EXPENSES PER PAGE (20, AT MOST HISTORY_LIMIT)
+#   after                   THE "next" KEY OF THE PREVIOUS PAGE
+#   category                ONLY ONE CATEGORY
+#   start, end              DATE RANGE ("%Y-%m-%d", BOTH INCLUDED)
+#   min_amount, max_amount  AMOUNT RANGE
+#   q                       WORDS TO SEARCH IN THE TITLES
+@app.route("/api/expenses")
+def api_expenses():
+    if "user" not in session:
+        return jsonify({"error": "Unauthorised"}), 401
+    email = session["user"]["email"]
+    args = request.args
+    try:
+        limit = min(int(args.get("limit", 20)), HISTORY_LIMIT)
+        after = args.get("after") or None
+        if after is not None:
+            expense_store.parse_page_key(after)
+        start = expense_store.parse_date(args["start"]) if args.get("start") else None
+        end = expense_store.parse_date(args["end"]) if args.get("end") else None
+        minAmount = int(args["min_amount"]) if args.get("min_amount") else None
+        maxAmount = int(args["max_amount"]) if args.get("max_amount") else None
+    except (ValueError, bson.errors.InvalidId):
+        return jsonify({"error": "Invalid Parameters"}), 400
+    if limit < 1:
+        return jsonify({"error": "Invalid Parameters"}), 400
+
+    try:
+        expenses, nextKey = expense_store.history_page(
+            expenseCollection,
+            email,
+            limit=limit,
+            after=after,
+            category=args.get("category") or None,
+            start=start,
+            end=end,
+            min_amount=minAmount,
+            max_amount=maxAmount,
+            search=args.get("q") or None,
+        )
+    except Exception as e:
+        logging.error(f"Something Went Wrong During Fetching Expenses : {e}")
+        return jsonify({"error": "Something Went Wrong"}), 500
+    return jsonify(
+        {
+            "expenses": [
+                dict(
+                    expense_store.public(e),
+                    id=str(e["_id"]),
+                    date=expense_store.format_date(e["date"]),
+                )
+                for e in expenses
+            ],
+            "next": nextKey,
+        }
+    )
+
+
+# TOTALS PER CATEGORY (CURRENT MONTH) AND PER MONTH FOR THE DASHBOARD WIDGETS
+@app.route("/api/totals")
+def api_totals():
+    if "user" not in session:
+        return jsonify({"error": "Unauthorised"}), 401
+    email = session["user"]["email"]
+    today = dt.now()
+    try:
+        start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        months = min(int(request.args.get("months", 12)), 120)
+        return jsonify(
+            {
+                "categories": rollups.category_totals(
+                    rollupCollection, email, start=start
+                ),
+                "months": rollups.monthly_totals(
+                    rollupCollection, email, months=months
+                ),
+            }
+        )
+    except Exception as e:
+        logging.error(f"Something Went Wrong During Fetching Totals : {e}")
+        return jsonify({"error": "Something Went Wrong"}), 500
+
+
+# RECURRING RULES OF THE USER, THE NEXT DUE FIRST
+@app.route("/api/recurring")
+def api_recurring():
+    if "user" not in session:
+        return jsonify({"error": "Unauthorised"}), 401
+    try:
+        rules = recurring.list_rules(recurringCollection, session["user"]["email"])
+    except Exception as e:
+        logging.error(f"Something Went Wrong During Fetching Recurring Rules : {e}")
+        return jsonify({"error": "Something Went Wrong"}), 500
+    return jsonify(
+        {
+            "rules": [
+                {
+                    "id": str(rule["_id"]),
+                    "kind": rule["kind"],
+                    "title": rule.get("title", ""),
+                    "category": rule.get("category", ""),
+                    "amount": rule["amount"],
+                    "every": rule["every"],
+                    "next": expense_store.format_date(rule["next"]) if rule["next"] else None,
+                    "until": expense_store.format_date(rule["until"]) if rule.get("until") else None,
+                }
+                for rule in rules
+            ]
+        }
+    )
+
+
+# SPENDING ANALYTICS OF THE WHOLE HISTORY: BURN RATE AND PROJECTED BALANCE OF THE
+# MONTH, CATEGORY TRENDS AND UNUSUAL EXPENSES
+#   months  PREVIOUS MONTHS OF THE CATEGORY AVERAGES AND TRENDS (6, AT MOST 24)
+@app.route("/api/analytics")
+def api_analytics():
+    import analytics
+
+    if "user" not in session:
+        return jsonify({"error": "Unauthorised"}), 401
+    email = session["user"]["email"]
+    try:
+        months = int(request.args.get("months", analytics.MONTHS))
+    except ValueError:
+        return jsonify({"error": "Invalid Parameters"}), 400
+    if not 1 <= months <= 24:
+        return jsonify({"error": "Invalid Parameters"}), 400
+
+    try:
+        userData = current_summary()
+        # THE HISTORY IS READ AGAIN ONLY AFTER A WRITE (A NEWER REVISION)
+        history = analyticsCache.get(email, userData["rev"])
+        if history is None:
+            history = analytics.load(expenseCollection, email)
+            analyticsCache.put(email, userData["rev"], history)
+        return jsonify(history.report(userData["budget"], userData["spent"], months=months))
+    except Exception as e:
+        logging.error(f"Something Went Wrong During Fetching Analytics : {e}")
+        return jsonify({"error": "Something Went Wrong"}), 500
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000)
+    # DEVELOPMENT SERVER ONLY, RUN "gunicorn -c gunicorn.conf.py wsgi:app" IN PRODUCTION
+    create_app().run(host="0.0.0.0", port=8000)
@@ -0,0 +1,93 @@
+# FINGERPRINTED STATIC FILES (THE CSS AND JS OF THE PAGES)
+# EVERY FILE UNDER static/ IS SERVED AT /assets/<name>.<HASH>.<ext>, THE HASH IS
+# TAKEN FROM ITS CONTENT. A CHANGED FILE GETS A NEW URL, SO THE BROWSER CAN KEEP
+# A FILE FOR A YEAR WITHOUT ASKING FOR IT AGAIN. THE FILES ARE READ AND COMPRESSED
+# ONCE WHEN THE APP IS LOADED (BEFORE THE FORK WITH WEB_PRELOAD=1), NOT PER REQUEST
+#
+# THE TEMPLATES LINK THEM WITH {{ asset_url("css/home.css") }}
+import os
+import hashlib
+import logging
+import mimetypes
+from flask import Response, abort, request
+import compression
+
+HASH_SIZE = 12
+# A FINGERPRINTED URL NEVER CHANGES CONTENT
+IMMUTABLE = "public, max-age=31536000, immutable"
+# BROTLI QUALITY OF THE FILES, SLOW BUT DONE ONCE
+ASSET_BROTLI_QUALITY = 11
+
+
+class Asset:
+    # ONE FILE, ITS FINGERPRINT AND ITS BODY IN EVERY ENCODING (None IS THE PLAIN ONE)
+    def __init__(self, name, data):
+        self.name = name
+        self.fingerprint = hashlib.sha256(data).hexdigest()[:HASH_SIZE]
+        stem, extension = os.path.splitext(name)
+        self.url_path = f"{stem}.{self.fingerprint}{extension}"
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.bodies = {None: data}
+        if self.mimetype in compression.COMPRESSIBLE:
+            for encoding in compression.available():
+                level = ASSET_BROTLI_QUALITY if encoding == "br" else 9
+                body = compression.compress(data, encoding, level)
+                if len(body) < len(data):
+                    self.bodies[encoding] = body
+
+
+class AssetStore:
+    def __init__(self, folder):
+        self.folder = folder
+        self.assets = {}
+        self.by_path = {}
+        self.load()
+
+    # READ (AGAIN) EVERY FILE OF THE FOLDER
+    def load(self):
+        assets = {}
+        for root, _, files in os.walk(self.folder):
+            for file in files:
+                path = os.path.join(root, file)
+                name = os.path.relpath(path, self.folder).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    assets[name] = Asset(name, f.read())
+        self.assets = assets
+        self.by_path = {asset.url_path: asset for asset in assets.values()}
+        logging.info(f"{len(assets)} Static Assets Loaded From {self.folder}")
+
+    # URL OF THE CURRENT VERSION OF A FILE
+    def url(self, name):
+        asset = self.assets.get(name)
+        if asset is None:
+            raise KeyError(f"Unknown Asset {name}")
+        return f"/assets/{asset.url_path}"
+
+    def serve(self, path):
+        asset = self.by_path.get(path)
+        cache = IMMUTABLE
+        if asset is None:
+            # A PAGE RENDERED BEFORE A DEPLOY ASKS FOR THE OLD VERSION, SEND THE
+            # CURRENT ONE BUT DO NOT LET THE BROWSER KEEP IT UNDER THE OLD URL
+            stem, extension = os.path.splitext(path)
+            asset = self.assets.get(stem.rsplit(".", 1)[0] + extension)
+            if asset is None:
+                abort(404)
+            cache = "no-cache"
+        encoding = compression.negotiate([e for e in asset.bodies if e is not None])
+        response = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = cache
+        response.set_etag(asset.fingerprint, weak=encoding is not None)
+        return response.make_conditional(request)
+
+
+# SERVE THE FILES OF "folder" (THE APP'S static/) UNDER /assets AND ADD THE
+# asset_url() FUNCTION TO THE TEMPLATES
+def init_assets(app, folder=None):
+    store = AssetStore(folder or app.static_folder)
+    app.add_url_rule("/assets/<path:path>", "assets", store.serve)
+    app.jinja_env.globals["asset_url"] = store.url
+    return store
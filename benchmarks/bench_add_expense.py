@@ -0,0 +1,60 @@
+# REQUESTS PER SECOND ON /add_expense AND ON THE CHART DATA API
+#
+#   python benchmarks/bench_add_expense.py [--requests 200]
+#
+# THE APP RUNS IN PROCESS THROUGH THE FLASK TEST CLIENT ON A MONGOMOCK DATABASE
+# (OR "bench_mongo_url"). THE CHART IS DRAWN BY THE BROWSER, SO A WRITE ONLY
+# UPDATES THE BUCKET, THE ROLLUP AND THE USER. "chart_data 304" SENDS THE ETAG
+# OF THE PREVIOUS RESPONSE BACK, LIKE THE BROWSER DOES
+import os
+import argparse
+import time
+import common
+
+os.environ["mongo_url"] = os.environ.get("bench_mongo_url", "mongomock://")
+import application
+
+
+def login(client, email):
+    client.post(
+        "/register",
+        data={"name": "Bench", "email": email, "password": "pw", "confirm_password": "pw"},
+    )
+    client.post("/", data={"email": email, "password": "pw"})
+    client.post("/add_budget", data={"budget_amount": "1000000"})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    client = application.create_app().test_client()
+    login(client, "bench@example.com")
+    expenses = list(common.synthetic_expenses(args.requests, seed=time.time_ns(), days=60))
+    start = time.perf_counter()
+    for expense in expenses:
+        client.post("/add_expense", data=expense)
+    elapsed = time.perf_counter() - start
+    print(f"{'add_expense':<16} {args.requests / elapsed:8.1f} req/s")
+
+    etag = client.get("/api/chart_data").headers["ETag"]
+    print(
+        common.summary(
+            "chart_data 200",
+            common.measure(lambda: client.get("/api/chart_data"), args.requests),
+        )
+    )
+    print(
+        common.summary(
+            "chart_data 304",
+            common.measure(
+                lambda: client.get("/api/chart_data", headers={"If-None-Match": etag}),
+                args.requests,
+            ),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# SPENDING ANALYTICS ON NUMPY COLUMNS AGAINST THE SAME REPORT BUILT FROM DICTS
+#
+#   python benchmarks/bench_analytics.py [--sizes 10000 100000 1000000] [--repeat 20]
+#                                        [--load-max 100000]
+#
+# "dicts" LOOPS OVER THE EXPENSES AS PYTHON DICTS, "pandas" GROUPS A DATAFRAME BUILT
+# FROM THEM (LIKE THE OLD generate_chart, ONLY WHEN PANDAS IS INSTALLED), "numpy" IS
+# analytics.report ON THE COLUMNS. "columns" IS THE ONE OFF CONVERSION OF THE DICTS
+# INTO A History AND "load" READS IT FROM THE BUCKETS (ONLY UP TO --load-max
+# EXPENSES, FILLING MONGOMOCK IS SLOW). THE THREE REPORTS ARE CHECKED TO AGREE
+import argparse
+from datetime import date
+import numpy as np
+from common import get_bench_database, synthetic_expenses, measure, summary
+import expense_store
+import analytics
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+# MONTH SPENT, CATEGORY AVERAGES OF THE PREVIOUS MONTHS AND ANOMALY COUNT WITH LOOPS
+def dict_report(expenses, today, months=analytics.MONTHS):
+    monthKey = today.strftime("%Y-%m")
+    todayKey = today.strftime(expense_store.DATE_FORMAT)
+    previous = set()
+    year, month = today.year, today.month
+    for _ in range(months):
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        previous.add(f"{year:04d}-{month:02d}")
+    monthSpent, totals, stats = 0, {}, {}
+    for e in expenses:
+        if e["date"][:7] == monthKey and e["date"] <= todayKey:
+            monthSpent += e["amount"]
+        if e["date"][:7] in previous:
+            totals[e["category"]] = totals.get(e["category"], 0) + e["amount"]
+        count, total, squares = stats.get(e["category"], (0, 0, 0))
+        stats[e["category"]] = (count + 1, total + e["amount"], squares + e["amount"] ** 2)
+    recentKey = date.fromordinal(today.toordinal() - analytics.RECENT_DAYS + 1).strftime(
+        expense_store.DATE_FORMAT
+    )
+    anomalies = 0
+    for e in expenses:
+        if recentKey <= e["date"] <= todayKey:
+            count, total, squares = stats[e["category"]]
+            mean = total / count
+            std = max(squares / count - mean * mean, 0) ** 0.5
+            if count >= analytics.MIN_COUNT and std and (e["amount"] - mean) / std > analytics.THRESHOLD:
+                anomalies += 1
+    averages = {c: round(t / months, 2) for c, t in totals.items()}
+    return round(monthSpent, 2), averages, anomalies
+
+
+# THE SAME WITH A PANDAS DATAFRAME
+def pandas_report(expenses, today, months=analytics.MONTHS):
+    frame = pd.DataFrame(expenses)
+    frame["date"] = pd.to_datetime(frame["date"])
+    period = frame["date"].dt.to_period("M")
+    current = pd.Period(today, "M")
+    thisMonth = (period == current) & (frame["date"] <= pd.Timestamp(today))
+    previous = (period >= current - months) & (period < current)
+    averages = (frame[previous].groupby("category")["amount"].sum() / months).round(2)
+    stats = frame.groupby("category")["amount"].agg(["count", "mean", "std"])
+    recent = frame[
+        (frame["date"] > pd.Timestamp(today) - pd.Timedelta(days=analytics.RECENT_DAYS))
+        & (frame["date"] <= pd.Timestamp(today))
+    ]
+    joined = recent.join(stats, on="category")
+    # POPULATION STANDARD DEVIATION, LIKE THE OTHER TWO
+    std = joined["std"] * np.sqrt((joined["count"] - 1) / joined["count"])
+    anomalies = int(
+        (((joined["amount"] - joined["mean"]) / std > analytics.THRESHOLD)
+         & (joined["count"] >= analytics.MIN_COUNT)).sum()
+    )
+    return round(float(frame.loc[thisMonth, "amount"].sum()), 2), averages.to_dict(), anomalies
+
+
+def columns(expenses):
+    codes = {}
+    return analytics.History(
+        np.array([date.fromisoformat(e["date"]).toordinal() for e in expenses], dtype=np.int32),
+        np.array([e["amount"] for e in expenses], dtype=np.float64),
+        np.array([codes.setdefault(e["category"], len(codes)) for e in expenses], dtype=np.int32),
+        list(codes),
+    )
+
+
+def run(size, args):
+    expenses = list(synthetic_expenses(size, days=args.days))
+    # AN OUTLIER IN THE LAST DAYS SO THE ANOMALY PATH HAS SOMETHING TO FIND
+    expenses[-1] = dict(expenses[-1], amount=10**6)
+    today = expense_store.parse_date(expenses[-1]["date"]).date()
+    print(f"--- {size} expenses")
+
+    expected = dict_report(expenses, today)
+    print(summary("dicts", measure(lambda: dict_report(expenses, today), max(1, args.repeat // 10))))
+    if pd is not None:
+        assert pandas_report(expenses, today) == expected
+        print(summary("pandas", measure(lambda: pandas_report(expenses, today), max(1, args.repeat // 10))))
+
+    print(summary("columns", measure(lambda: columns(expenses), 1)))
+    history = columns(expenses)
+    result = analytics.report(history, 0, 0, today)
+    got = (
+        result["month"]["spent"],
+        {row["category"]: row["average"] for row in result["categories"] if row["average"]},
+        len(result["anomalies"]),
+    )
+    assert got == expected, (got, expected)
+    print(summary("numpy", measure(lambda: analytics.report(history, 0, 0, today), args.repeat)))
+    print(f"{'columns size':<40} {history.nbytes / 1024 / 1024:.1f} MB")
+
+    if size <= args.load_max:
+        db = get_bench_database()
+        collection = db[expense_store.COLLECTION]
+        buckets = expense_store.make_buckets(
+            "bench@example.com",
+            [
+                expense_store.new_expense(
+                    expense_store.parse_date(e["date"]), e["amount"], e["title"], e["category"]
+                )
+                for e in expenses
+            ],
+        )
+        for start in range(0, len(buckets), 1000):
+            collection.insert_many(buckets[start : start + 1000])
+        print(summary("load", measure(lambda: analytics.load(collection, "bench@example.com"), 3)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--load-max", type=int, default=100000)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args)
+
+
+if __name__ == "__main__":
+    main()
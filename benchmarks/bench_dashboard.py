@@ -0,0 +1,120 @@
+# DASHBOARD PAGE VIEWS PER SECOND WITH AND WITHOUT THE SUMMARY CACHE, AND HOW LONG
+# A WRITE OF ANOTHER WORKER TAKES TO SHOW UP ON THE DASHBOARD
+#
+#   python benchmarks/bench_dashboard.py [--users 50] [--threads 4] [--seconds 5]
+#                                        [--poll-seconds 0.5] [--writes 20]
+#
+# "cached" SERVES /homePage FROM THE SUMMARY CACHE, "uncached" READS THE SUMMARY
+# FROM MONGODB ON EVERY VIEW (A CACHE OF SIZE 0). THEN A USER IS WRITTEN DIRECTLY IN
+# THE DATABASE, AS ANOTHER WORKER WOULD, AND /homePage IS VIEWED UNTIL IT SHOWS THE
+# NEW REVISION: THE TIME IT TOOK IS THE STALENESS. ON MONGOMOCK (AND A STANDALONE
+# MONGOD) THE INVALIDATOR POLLS, ON A REPLICA SET IT FOLLOWS THE CHANGE STREAM
+import os
+import time
+import uuid
+import random
+import argparse
+import threading
+from common import summary
+
+os.environ["mongo_url"] = os.environ.get("bench_mongo_url", "mongomock://")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+os.environ.setdefault("LOGIN_MAX_PER_IP", "1000")
+import application
+import summary_cache
+import user_store
+
+
+def make_clients(users):
+    clients = []
+    for n in range(users):
+        email = f"dashboard{n}@example.com"
+        client = application.app.test_client()
+        client.post(
+            "/register",
+            data={"name": "Bench", "email": email, "password": "pw", "confirm_password": "pw"},
+        )
+        client.post("/", data={"email": email, "password": "pw"})
+        clients.append((email, client))
+    return clients
+
+
+def page_views(label, clients, args):
+    stop = threading.Event()
+    timings = []
+    lock = threading.Lock()
+
+    def view_loop(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            _, client = rng.choice(clients)
+            start = time.perf_counter()
+            client.get("/homePage")
+            with lock:
+                timings.append((time.perf_counter() - start) * 1000)
+
+    cache = application.summaryCache
+    hits, misses = cache.hits, cache.misses
+    threads = [threading.Thread(target=view_loop, args=(n,)) for n in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    lookups = (cache.hits - hits) + (cache.misses - misses)
+    hitRate = (cache.hits - hits) / lookups if lookups else 0
+    print(f"{label:<9} {len(timings) / args.seconds:9.1f} views/s  hit rate {hitRate:.1%}")
+    print(summary(f"{label} /homePage", timings))
+
+
+# WRITE A USER BEHIND THE BACK OF THIS WORKER AND VIEW ITS DASHBOARD UNTIL THE
+# CACHE HOLDS THE NEW REVISION
+def staleness(clients, args):
+    cache = application.summaryCache
+    delays, timedOut = [], 0
+    for n in range(args.writes):
+        email, client = clients[n % len(clients)]
+        client.get("/homePage")
+        user, _ = user_store.add_budget(
+            application.userCollection, email, 1, key=uuid.uuid4().hex
+        )
+        written = time.perf_counter()
+        deadline = written + args.poll_seconds * 10 + 5
+        while time.perf_counter() < deadline:
+            client.get("/homePage")
+            entry = cache._entries.get(email)
+            if entry is not None and entry[1] is not None and entry[0] >= user["rev"]:
+                delays.append((time.perf_counter() - written) * 1000)
+                break
+            time.sleep(0.005)
+        else:
+            timedOut += 1
+    print(summary("staleness", delays) + f"  ({timedOut} never refreshed)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--poll-seconds", type=float, default=0.5)
+    parser.add_argument("--writes", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SUMMARY_CACHE_POLL_SECONDS", str(args.poll_seconds))
+    application.create_app()
+    clients = make_clients(args.users)
+
+    cached = application.summaryCache
+    page_views("cached", clients, args)
+    application.summaryCache = summary_cache.SummaryCache(max_size=0)
+    page_views("uncached", clients, args)
+    application.summaryCache = cached
+    staleness(clients, args)
+
+
+if __name__ == "__main__":
+    main()
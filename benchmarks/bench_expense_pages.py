@@ -0,0 +1,85 @@
+# LATENCY OF THE EXPENSE HISTORY PAGES DEEP INTO A LONG HISTORY
+#
+#   python benchmarks/bench_expense_pages.py [--expenses 500000] [--limit 20] [--pages 1 10 100 1000 10000]
+#
+# A USER IS FILLED WITH "--expenses" EXPENSES, THEN PAGE N OF THE HISTORY IS FETCHED
+# WITH THE "after" KEY OF PAGE N - 1, LIKE THE "Load More" BUTTON DOES. WITH KEYSET
+# PAGINATION PAGE 10000 COSTS THE SAME AS PAGE 1. THE FILTERED AND THE TITLE SEARCH
+# PAGES ARE TIMED TOO (THE SEARCH NEEDS A REAL MONGOD, MONGOMOCK HAS NO $text)
+#
+# MONGOMOCK SCANS AND COPIES EVERY MATCHING DOCUMENT IN PYTHON, SO THE ABSOLUTE
+# NUMBERS ONLY MEAN SOMETHING AGAINST A REAL MONGOD ("bench_mongo_url")
+import os
+import argparse
+from common import get_bench_database, synthetic_expenses, measure, summary
+import expense_store
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--expenses", type=int, default=500000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    db = get_bench_database()
+    collection = db[expense_store.COLLECTION]
+    expense_store.ensure_indexes(collection)
+    email = "bench@example.com"
+
+    expenses = [
+        expense_store.new_expense(
+            expense_store.parse_date(e["date"]), e["amount"], e["title"], e["category"]
+        )
+        for e in synthetic_expenses(args.expenses)
+    ]
+    buckets = expense_store.make_buckets(email, expenses)
+    for i in range(0, len(buckets), 1000):
+        collection.insert_many(buckets[i : i + 1000])
+
+    # THE "after" KEY OF EVERY PAGE IS THE LAST EXPENSE OF THE PAGE BEFORE IT
+    newest = sorted(expenses, key=expense_store._position, reverse=True)
+    for page in args.pages:
+        if (page - 1) * args.limit >= len(newest):
+            break
+        after = expense_store.page_key(newest[(page - 1) * args.limit - 1]) if page > 1 else None
+        print(
+            summary(
+                f"page {page} of {args.expenses}",
+                measure(
+                    lambda: expense_store.history_page(
+                        collection, email, limit=args.limit, after=after
+                    ),
+                    args.repeat,
+                ),
+            )
+        )
+
+    print(
+        summary(
+            "page 1 category=Food amount>=4000",
+            measure(
+                lambda: expense_store.history_page(
+                    collection, email, limit=args.limit, category="Food", min_amount=4000
+                ),
+                args.repeat,
+            ),
+        )
+    )
+    if os.environ.get("bench_mongo_url"):
+        print(
+            summary(
+                'page 1 search "Expense 4242"',
+                measure(
+                    lambda: expense_store.history_page(
+                        collection, email, limit=args.limit, search="4242"
+                    ),
+                    args.repeat,
+                ),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# READ AND WRITE LATENCY OF THE EXPENSE BUCKETS AS THE HISTORY GROWS
+#
+#   python benchmarks/bench_expense_store.py [--sizes 1000 10000 100000]
+#
+# FOR EVERY HISTORY SIZE A USER IS FILLED WITH THAT MANY EXPENSES AND THE
+# WRITE OF ONE MORE EXPENSE AND THE READ OF THE LAST 30 EXPENSES ARE TIMED, BOTH
+# FOR THE BUCKETS (THE FIRST PAGE OF /api/expenses) AND FOR THE OLD EMBEDDED
+# "expenses" ARRAY ON THE USER DOCUMENT
+#
+# MONGOMOCK SCANS AND COPIES EVERY MATCHING DOCUMENT IN PYTHON, SO THE ABSOLUTE
+# READ NUMBERS ONLY MEAN SOMETHING AGAINST A REAL MONGOD ("bench_mongo_url")
+import argparse
+import pymongo
+from common import get_bench_database, synthetic_expenses, measure, summary
+import expense_store
+
+
+def run(size, repeat):
+    db = get_bench_database()
+    collection = db[expense_store.COLLECTION]
+    expense_store.ensure_indexes(collection)
+    email = "bench@example.com"
+
+    expenses = [
+        expense_store.new_expense(
+            expense_store.parse_date(e["date"]), e["amount"], e["title"], e["category"]
+        )
+        for e in synthetic_expenses(size)
+    ]
+    buckets = expense_store.make_buckets(email, expenses)
+    if buckets:
+        collection.insert_many(buckets)
+
+    last = expenses[-1]["date"]
+
+    def write():
+        expense_store.add_expense(
+            collection, email, expense_store.new_expense(last, 100, "Bench", "Food")
+        )
+
+    def read():
+        expense_store.history_page(collection, email, limit=30)
+
+    print(summary(f"bucket write history={size}", measure(write, repeat)))
+    print(summary(f"bucket read last 30 history={size}", measure(read, repeat)))
+
+    # THE OLD LAYOUT: ONE USER DOCUMENT HOLDING THE WHOLE HISTORY
+    users = db["User"]
+    users.insert_one(
+        {
+            "email": email,
+            "budget": 0,
+            "spent": 0,
+            "expenses": [expense_store.public(e) for e in expenses],
+        }
+    )
+
+    def embedded_write():
+        users.find_one_and_update(
+            {"email": email},
+            {"$push": {"expenses": expense_store.public(expenses[-1])}, "$inc": {"spent": 1}},
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+
+    def embedded_read():
+        user = users.find_one({"email": email})
+        sorted(user["expenses"], key=lambda e: e["date"])[-30:]
+
+    print(summary(f"embedded write history={size}", measure(embedded_write, repeat)))
+    print(summary(f"embedded read last 30 history={size}", measure(embedded_read, repeat)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# PEAK MEMORY AND TIME OF THE EXPENSE EXPORTS
+#
+#   python benchmarks/bench_export_memory.py [--rows 1000000]
+#
+# THE ROWS COME FROM A GENERATOR STANDING IN FOR THE MONGODB CURSOR, SO ONLY THE
+# MEMORY HELD BY THE EXPORTER ITSELF IS MEASURED. "pandas" IS THE OLD EXPORT:
+# THE WHOLE LIST, A DATAFRAME AND THE FULL CSV TEXT IN A StringIO
+import argparse
+import time
+import tracemalloc
+from io import StringIO
+from common import synthetic_expenses
+import expense_store
+import exporters
+
+
+def rows(n):
+    for expense in synthetic_expenses(n):
+        expense["date"] = expense_store.parse_date(expense["date"])
+        yield expense
+
+
+def old_pandas_csv(expenses):
+    import pandas as pd
+
+    data = [dict(e, date=expense_store.format_date(e["date"])) for e in expenses]
+    df = pd.DataFrame(data, columns=expense_store.EXPENSE_FIELDS)
+    buffer = StringIO()
+    df.to_csv(buffer, index=False)
+    buffer.seek(0)
+    yield buffer.getvalue()
+
+
+def run(label, exporter, n):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in exporter(rows(n)):
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<10} peak={peak / 2**20:8.1f}MiB total={elapsed:6.2f}s "
+        f"first byte={first * 1000:8.1f}ms size={size / 2**20:7.1f}MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--skip-pandas", action="store_true")
+    args = parser.parse_args()
+    if not args.skip_pandas:
+        run("pandas", old_pandas_csv, args.rows)
+    for name, (_, _, exporter) in exporters.FORMATS.items():
+        try:
+            run(name, exporter, args.rows)
+        except ImportError as e:
+            print(f"{name:<10} skipped ({e})")
+
+
+if __name__ == "__main__":
+    main()
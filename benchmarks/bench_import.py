@@ -0,0 +1,92 @@
+# TIME TO IMPORT A LARGE CSV THROUGH THE BATCHED IMPORTER
+#
+#   python benchmarks/bench_import.py [--rows 100000] [--batch-size 1000] [--shuffle]
+#
+# "--shuffle" WRITES THE ROWS OUT OF DATE ORDER, LIKE A MERGED BANK STATEMENT. THE
+# BUCKETS LINE SHOWS HOW FULL THE IMPORTED BUCKETS ARE (AT MOST BUCKET_SIZE)
+# "per expense" REPLAYS THE OLD PATH FOR A SAMPLE OF THE ROWS: ONE BUCKET WRITE
+# AND ONE find_one_and_update PER EXPENSE, SCALED UP TO THE FULL ROW COUNT.
+# "re-import" IMPORTS THE SAME FILE AGAIN, SO EVERY ROW IS CHECKED AGAINST THE
+# DATABASE (MONGOMOCK MATCHES "$in" WITHOUT AN INDEX, A REAL MONGOD USES ONE)
+import io
+import csv
+import time
+import random
+import argparse
+from common import get_bench_database, synthetic_expenses
+import expense_store
+import user_store
+import importer
+
+
+def make_csv(rows, shuffle=False):
+    expenses = list(synthetic_expenses(rows))
+    if shuffle:
+        random.Random(7).shuffle(expenses)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=expense_store.EXPENSE_FIELDS)
+    writer.writeheader()
+    writer.writerows(expenses)
+    return buffer.getvalue().encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=importer.BATCH_SIZE)
+    parser.add_argument("--sample", type=int, default=1000)
+    parser.add_argument("--shuffle", action="store_true")
+    args = parser.parse_args()
+
+    db = get_bench_database()
+    users = db[user_store.COLLECTION]
+    expenses = db[expense_store.COLLECTION]
+    expense_store.ensure_indexes(expenses)
+    users.insert_one({"name": "Bench", "email": "bench@example.com", "budget": 0, "spent": 0})
+    data = make_csv(args.rows, args.shuffle)
+
+    start = time.perf_counter()
+    result = importer.import_expenses(
+        users,
+        expenses,
+        "bench@example.com",
+        importer.parse_csv(io.BytesIO(data)),
+        batch_size=args.batch_size,
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"batched     {result['imported']} rows in {elapsed:.2f}s "
+        f"({result['imported'] / elapsed:,.0f} rows/s)"
+    )
+    buckets = expenses.count_documents({"user": "bench@example.com"})
+    print(f"buckets     {buckets} ({result['imported'] / buckets:.0f} expenses per bucket)")
+
+    start = time.perf_counter()
+    result = importer.import_expenses(
+        users,
+        expenses,
+        "bench@example.com",
+        importer.parse_csv(io.BytesIO(data)),
+        batch_size=args.batch_size,
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"re-import   {result['duplicates']} duplicates skipped in {elapsed:.2f}s"
+    )
+
+    users.insert_one({"name": "Old", "email": "old@example.com", "budget": 0, "spent": 0})
+    sample = list(importer.parse_csv(io.BytesIO(data)))[: args.sample]
+    start = time.perf_counter()
+    for row in sample:
+        expense = importer.validate(row)
+        expense_store.add_expense(expenses, "old@example.com", expense)
+        user_store.record_expense(users, "old@example.com", expense_store.public(expense))
+    elapsed = time.perf_counter() - start
+    print(
+        f"per expense {len(sample)} rows in {elapsed:.2f}s "
+        f"(~{elapsed * args.rows / len(sample):.0f}s for {args.rows} rows)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# REQUEST LATENCY WITH THE OLD SYNCHRONOUS FILE LOGGING AND WITH THE QUEUED JSON LOGGING
+#
+#   python benchmarks/bench_logging.py [--requests 500]
+#
+# "before" IS logging.basicConfig WRITING EVERY LINE TO THE FILE INSIDE THE REQUEST,
+# "after" IS log_pipeline (QUEUE + LISTENER THREAD, PAGE LOADS SAMPLED PER ROUTE).
+# EACH MODE TIMES THE LOGIN PAGE, THE HOME PAGE AND /add_budget (A WRITE THAT
+# LOGS THE UPDATED SUMMARY) THROUGH THE FLASK TEST CLIENT
+# AND REPORTS THE BYTES WRITTEN TO ITS LOG FILE
+import os
+import logging
+import argparse
+import tempfile
+from common import measure, summary
+
+os.environ["mongo_url"] = os.environ.get("bench_mongo_url", "mongomock://")
+import application
+import log_pipeline
+
+
+def run(label, requests, path):
+    # A FRESH SESSION PER MODE (/add_budget FLASHES A MESSAGE INTO THE SESSION)
+    client = application.app.test_client()
+    client.post("/", data={"email": "log@example.com", "password": "pw"})
+    print(summary(f"{label} GET /", measure(lambda: client.get("/"), requests)))
+    print(summary(f"{label} GET /homePage", measure(lambda: client.get("/homePage"), requests)))
+    print(
+        summary(
+            f"{label} POST /add_budget",
+            measure(lambda: client.post("/add_budget", data={"budget_amount": "1"}), requests),
+        )
+    )
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+    log_pipeline.shutdown()
+    print(f"{label} log file: {os.path.getsize(path)} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    application.create_app().test_client().post(
+        "/register",
+        data={"name": "Bench", "email": "log@example.com", "password": "pw", "confirm_password": "pw"},
+    )
+    directory = tempfile.mkdtemp()
+
+    log_pipeline.shutdown()
+    before = os.path.join(directory, "before.log")
+    logging.basicConfig(
+        filename=before,
+        filemode="a",
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+        force=True,
+    )
+    run("before", args.requests, before)
+
+    after = os.path.join(directory, "after.log")
+    log_pipeline.setup(path=after)
+    run("after", args.requests, after)
+
+
+if __name__ == "__main__":
+    main()
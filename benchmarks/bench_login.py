@@ -0,0 +1,99 @@
+# LOGINS PER SECOND AND /homePage LATENCY UNDER A MIXED LOAD
+#
+#   python benchmarks/bench_login.py [--seconds 10] [--login-threads 8] [--page-threads 4]
+#
+# LOGIN THREADS POST THE LOGIN FORM IN A LOOP WHILE PAGE THREADS OF LOGGED IN USERS
+# FETCH /homePage. "inline" HASHES IN THE REQUEST THREAD (PASSWORD_WORKERS=0),
+# "pool" ON THE PASSWORD PROCESS POOL. LOGINS TURNED AWAY WITH A 429 ARE COUNTED
+# SEPARATELY. THE APP RUNS IN PROCESS THROUGH THE FLASK TEST CLIENT
+import os
+import time
+import argparse
+import threading
+from common import summary
+
+os.environ["mongo_url"] = os.environ.get("bench_mongo_url", "mongomock://")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("LOGIN_MAX_PER_IP", "1000")
+import application
+import passwords
+
+
+def run(label, workers, args):
+    application.passwordHasher = passwords.PasswordHasher(
+        method=os.environ.get("PASSWORD_METHOD", passwords.METHOD),
+        max_workers=workers,
+        max_pending=args.max_pending,
+    )
+    # START THE POOL BEFORE THE CLOCK
+    application.passwordHasher.hash("warm up")
+
+    stop = threading.Event()
+    logins = {"ok": 0, "busy": 0}
+    pageTimings = []
+    lock = threading.Lock()
+
+    def login_loop(n):
+        client = application.app.test_client()
+        email = f"login{n}@example.com"
+        while not stop.is_set():
+            status = client.post("/", data={"email": email, "password": "pw"}).status_code
+            with lock:
+                logins["ok" if status == 302 else "busy"] += 1
+
+    def page_loop(n):
+        client = application.app.test_client()
+        client.post("/", data={"email": f"page{n}@example.com", "password": "pw"})
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get("/homePage")
+            with lock:
+                pageTimings.append((time.perf_counter() - start) * 1000)
+
+    threads = [
+        threading.Thread(target=login_loop, args=(n,)) for n in range(args.login_threads)
+    ] + [threading.Thread(target=page_loop, args=(n,)) for n in range(args.page_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    application.passwordHasher.shutdown()
+
+    print(
+        f"{label:<8} {logins['ok'] / args.seconds:8.1f} logins/s "
+        f"({logins['busy']} turned away)"
+    )
+    print(summary(f"{label} /homePage", pageTimings))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--login-threads", type=int, default=8)
+    parser.add_argument("--page-threads", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--max-pending", type=int, default=passwords.default_max_pending())
+    args = parser.parse_args()
+
+    application.create_app()
+    client = application.app.test_client()
+    for n in range(args.login_threads):
+        email = f"login{n}@example.com"
+        client.post(
+            "/register",
+            data={"name": "Bench", "email": email, "password": "pw", "confirm_password": "pw"},
+        )
+    for n in range(args.page_threads):
+        email = f"page{n}@example.com"
+        client.post(
+            "/register",
+            data={"name": "Bench", "email": email, "password": "pw", "confirm_password": "pw"},
+        )
+    run("inline", 0, args)
+    run("pool", args.workers, args)
+
+
+if __name__ == "__main__":
+    main()
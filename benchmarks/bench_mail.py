@@ -0,0 +1,64 @@
+# REQUEST PATH LATENCY OF SENDING AN OTP MAIL
+#
+#   python benchmarks/bench_mail.py [--messages 200] [--delay 0.05]
+#
+# A LOCAL aiosmtpd SERVER STANDS IN FOR GMAIL ("pip install aiosmtpd"), --delay
+# ADDS A PAUSE TO EVERY MESSAGE LIKE A REMOTE SERVER WOULD. "inline" IS THE OLD
+# send_mail: CONNECT, SEND AND QUIT INSIDE THE REQUEST. "queued" IS THE TIME
+# mailer.enqueue TAKES, FOLLOWED BY HOW LONG THE QUEUE TAKES TO DELIVER EVERYTHING
+import time
+import asyncio
+import smtplib
+import argparse
+from common import measure, summary
+from mailer import Mailer
+
+
+class SlowHandler:
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+def main():
+    from aiosmtpd.controller import Controller
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    handler = SlowHandler(args.delay)
+    controller = Controller(handler, hostname="127.0.0.1", port=8025)
+    controller.start()
+    try:
+        def inline():
+            server = smtplib.SMTP("127.0.0.1", 8025)
+            server.sendmail("bench@example.com", "user@example.com", "Subject: OTP\n\n1234")
+            server.quit()
+
+        print(summary("inline send_mail", measure(inline, args.messages)))
+
+        mailer = Mailer(
+            host="127.0.0.1", port=8025, sender="bench@example.com", starttls=False
+        )
+        queued = lambda: mailer.enqueue("user@example.com", "OTP", "1234")
+        print(summary("queued send_mail", measure(queued, args.messages)))
+        start = time.perf_counter()
+        mailer.join()
+        print(
+            f"queue delivered {mailer.sent} messages ({mailer.failed} failed) "
+            f"{time.perf_counter() - start:.2f}s after the last enqueue"
+        )
+        mailer.stop()
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# RECURRING RULES WRITTEN BY THE BATCHED SCHEDULER AGAINST ONE WRITE PER OCCURRENCE
+#
+#   python benchmarks/bench_recurring.py [--users 1000] [--rules 3] [--days 45]
+#                                        [--batch-size 1000] [--naive-users 100]
+#
+# EVERY USER GETS "--rules" RULES (A MONTHLY RENT, A WEEKLY BUDGET TOP UP AND DAILY
+# EXPENSES) STARTED "--days" DAYS BEFORE A FAKE CLOCK, AS IF THE SCHEDULER HAD BEEN
+# DOWN THAT LONG. "scheduler" CATCHES UP EVERYTHING IN ONE RUN, "naive" WRITES EVERY
+# OCCURRENCE LIKE THE add_expense AND add_budget ROUTES DO (FOR "--naive-users"
+# USERS). IT PRINTS THE RULES/S, THE DATABASE CALLS AND CHECKS THAT THE TOTALS OF THE
+# USERS, THE BUCKETS AND THE ROLLUPS ADD UP. THE CLOCK IS THEN MOVED A DAY AHEAD FOR
+# A STEADY STATE RUN
+import time
+import argparse
+from datetime import datetime, timedelta
+from common import get_bench_database
+import expense_store
+import user_store
+import rollups
+import recurring
+
+
+class FakeClock:
+    # A CLOCK THAT ONLY MOVES WHEN TOLD TO
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += timedelta(**kwargs)
+
+
+class Counted:
+    # A COLLECTION COUNTING THE CALLS MADE THROUGH IT (ONE CALL, ONE ROUND TRIP OR
+    # MORE FOR A LONG CURSOR)
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            self._counter[0] += 1
+            return attribute(*args, **kwargs)
+
+        return call
+
+
+def setup(db, users, rules, start):
+    emails = [f"recurring{n}@example.com" for n in range(users)]
+    db[user_store.COLLECTION].insert_many(
+        [
+            {"name": "Bench", "email": email, "password": "x", "recent": [], "budget": 0,
+             "spent": 0, "rev": 0, "ops": []}
+            for email in emails
+        ]
+    )
+    user_store.ensure_indexes(db[user_store.COLLECTION])
+    expense_store.ensure_indexes(db[expense_store.COLLECTION])
+    rollups.ensure_indexes(db[rollups.COLLECTION])
+    recurring.ensure_indexes(db[recurring.COLLECTION])
+    templates = [
+        ("expense", 12000, "monthly", "Rent", "Home"),
+        ("budget", 5000, "weekly", "", ""),
+        ("expense", 150, "daily", "Coffee", "Food"),
+    ]
+    documents = []
+    for email in emails:
+        for n in range(rules):
+            kind, amount, every, title, category = templates[n % len(templates)]
+            documents.append(
+                recurring.new_rule(email, kind, amount + n, every, start, title, category)
+            )
+    for first in range(0, len(documents), 10000):
+        db[recurring.COLLECTION].insert_many(documents[first : first + 10000])
+    return emails, documents
+
+
+# THE SAME OCCURRENCES WRITTEN ONE BY ONE THROUGH THE ROUTE HELPERS
+def naive(db, documents, now):
+    for rule in documents:
+        dates, _ = recurring.occurrences(rule, rule["next"], now, limit=10**6)
+        for date in dates:
+            if rule["kind"] == "budget":
+                user_store.add_budget(db[user_store.COLLECTION], rule["user"], rule["amount"])
+                continue
+            expense = expense_store.new_expense(date, rule["amount"], rule["title"], rule["category"])
+            user_store.record_expense(db[user_store.COLLECTION], rule["user"], expense_store.public(expense))
+            expense_store.add_expense(db[expense_store.COLLECTION], rule["user"], expense)
+            rollups.record(db[rollups.COLLECTION], rule["user"], [expense])
+
+
+def check(db, emails):
+    spent = {e: 0 for e in emails}
+    for bucket in db[expense_store.COLLECTION].find({}, {"user": 1, "expenses.amount": 1}):
+        spent[bucket["user"]] += sum(e["amount"] for e in bucket["expenses"])
+    wrong = [
+        user["email"]
+        for user in db[user_store.COLLECTION].find({}, {"email": 1, "spent": 1})
+        if user["spent"] != spent[user["email"]]
+    ]
+    sample = emails[:: max(1, len(emails) // 20)]
+    offRollups = [e for e in sample if rollups.check(db[expense_store.COLLECTION], db[rollups.COLLECTION], e)]
+    return f"users off: {len(wrong)}, rollups off: {len(offRollups)} of {len(sample)} checked"
+
+
+def scheduler_run(label, scheduler, counter):
+    counter[0] = 0
+    start = time.perf_counter()
+    result = scheduler.run()
+    seconds = time.perf_counter() - start
+    print(
+        f"{label:<20} {result['rules'] / seconds:10.1f} rules/s {seconds:8.2f}s "
+        f"{counter[0]:6d} db calls  {result}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rules", type=int, default=3)
+    parser.add_argument("--days", type=int, default=45)
+    parser.add_argument("--batch-size", type=int, default=recurring.BATCH_SIZE)
+    parser.add_argument("--naive-users", type=int, default=100)
+    args = parser.parse_args()
+
+    clock = FakeClock(datetime(2025, 3, 1))
+    start = clock() - timedelta(days=args.days)
+
+    db = get_bench_database()
+    emails, _ = setup(db, args.users, args.rules, start)
+    counter = [0]
+    scheduler = recurring.Scheduler(
+        *(Counted(db[name], counter) for name in [
+            recurring.COLLECTION, user_store.COLLECTION, expense_store.COLLECTION,
+            rollups.COLLECTION, recurring.LOCK_COLLECTION,
+        ]),
+        clock=clock,
+        batch_size=args.batch_size,
+    )
+    scheduler_run("scheduler catch up", scheduler, counter)
+    print(check(db, emails))
+    clock.advance(days=1)
+    scheduler_run("scheduler next day", scheduler, counter)
+    print(check(db, emails))
+
+    db = get_bench_database("ExpenseTrackerBenchNaive")
+    emails, documents = setup(db, args.naive_users, args.rules, start)
+    started = time.perf_counter()
+    naive(db, documents, clock())
+    seconds = time.perf_counter() - started
+    print(f"{'naive catch up':<20} {len(documents) / seconds:10.1f} rules/s {seconds:8.2f}s")
+    print(check(db, emails))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# BYTES SENT AND SERVER TIME OF A /homePage VIEW: FRAGMENT CACHE, COMPRESSION,
+# FINGERPRINTED ASSETS AND THE TEMPLATE BYTECODE CACHE
+#
+#   python benchmarks/bench_render.py [--users 20] [--expenses 5] [--views 500]
+#
+# "bytes" PRINTS THE PAGE AS SENT PLAIN, GZIP AND BROTLI (WHEN INSTALLED), THE CSS
+# AND JS A FIRST VISIT DOWNLOADS AND THE OLD LAYOUT (THE SAME CSS AND JS INLINE IN
+# EVERY PAGE). A LATER VISIT ONLY SENDS THE PAGE, THE ASSETS ARE KEPT BY THE
+# BROWSER. "render" TIMES THE VIEWS WITH AND WITHOUT THE FRAGMENT CACHE (A CACHE OF
+# SIZE 0) FOR EVERY ENCODING. "templates" COMPILES ALL THE TEMPLATES IN A NEW
+# ENVIRONMENT, AS A NEW WORKER DOES, WITH AND WITHOUT THE BYTECODE CACHE
+import os
+import re
+import random
+import argparse
+import tempfile
+from common import measure, summary
+
+os.environ["mongo_url"] = os.environ.get("bench_mongo_url", "mongomock://")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+os.environ.setdefault("LOGIN_MAX_PER_IP", "1000")
+os.environ.setdefault("RECURRING_SCHEDULER", "0")
+from jinja2 import Environment, FileSystemBytecodeCache
+import application
+import compression
+import summary_cache
+
+
+def make_clients(users, expenses):
+    clients = []
+    for n in range(users):
+        email = f"render{n}@example.com"
+        client = application.app.test_client()
+        client.post(
+            "/register",
+            data={"name": "Bench", "email": email, "password": "pw", "confirm_password": "pw"},
+        )
+        client.post("/", data={"email": email, "password": "pw"})
+        client.post("/add_budget", data={"budget_amount": "100000"})
+        for i in range(expenses):
+            client.post(
+                "/add_expense",
+                data={"title": f"Expense {i}", "amount": "250", "category": "Food",
+                      "date": "2025-01-01"},
+            )
+        client.get("/homePage")
+        clients.append(client)
+    return clients
+
+
+def encodings():
+    return ["identity"] + compression.available()
+
+
+def page_bytes(client):
+    sizes = {}
+    for encoding in encodings():
+        response = client.get("/homePage", headers={"Accept-Encoding": encoding})
+        sizes[encoding] = len(response.data)
+    html = client.get("/homePage").get_data(as_text=True)
+    assetSizes = {encoding: 0 for encoding in encodings()}
+    plainAssets = ""
+    for url in re.findall(r'/assets/[^"]+', html):
+        for encoding in encodings():
+            response = client.get(url, headers={"Accept-Encoding": encoding})
+            assetSizes[encoding] += len(response.data)
+        plainAssets += client.get(url).get_data(as_text=True)
+    inline = html + plainAssets
+    print(f"{'encoding':<10} {'page':>8} {'assets':>8} {'first':>8} {'repeat':>8} {'old inline':>11}")
+    for encoding in encodings():
+        old = len(inline.encode()) if encoding == "identity" else len(
+            compression.compress(inline.encode(), encoding)
+        )
+        print(
+            f"{encoding:<10} {sizes[encoding]:8d} {assetSizes[encoding]:8d} "
+            f"{sizes[encoding] + assetSizes[encoding]:8d} {sizes[encoding]:8d} {old:11d}"
+        )
+
+
+def render_times(label, clients, views):
+    rng = random.Random(1)
+    for encoding in encodings():
+        headers = {"Accept-Encoding": encoding}
+        timings = measure(lambda: rng.choice(clients).get("/homePage", headers=headers), views)
+        print(summary(f"{label} {encoding}", timings))
+
+
+def template_compile(repeat=20):
+    loader = application.app.jinja_env.loader
+    names = application.app.jinja_env.list_templates()
+    folder = tempfile.mkdtemp(prefix="bench-jinja-")
+
+    def compile_all(cache):
+        env = Environment(loader=loader, bytecode_cache=cache)
+        for name in names:
+            env.get_template(name)
+
+    cache = FileSystemBytecodeCache(folder)
+    compile_all(cache)
+    print(summary(f"compile {len(names)} templates", measure(lambda: compile_all(None), repeat)))
+    print(summary(f"load {len(names)} from bytecode", measure(lambda: compile_all(cache), repeat)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--expenses", type=int, default=5)
+    parser.add_argument("--views", type=int, default=500)
+    args = parser.parse_args()
+
+    application.create_app()
+    clients = make_clients(args.users, args.expenses)
+
+    page_bytes(clients[0])
+    render_times("fragments cached", clients, args.views)
+    cached = application.fragmentCache
+    application.fragmentCache = summary_cache.SummaryCache(max_size=0, name="fragments")
+    render_times("fragments rendered", clients, args.views)
+    application.fragmentCache = cached
+    template_compile()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# DASHBOARD READS FROM THE ROLLUPS AGAINST THE SAME TOTALS AGGREGATED FROM THE BUCKETS
+#
+#   python benchmarks/bench_rollups.py [--sizes 1000 10000 100000]
+#
+# "scan" UNWINDS EVERY EXPENSE OF THE USER AND GROUPS THEM (WHAT THE CHART AND THE
+# TOTALS WIDGETS DID BEFORE), "rollup" READS ONE DOCUMENT PER MONTH. THE CHECKER
+# AND THE FULL REBUILD ARE TIMED TOO
+#
+# MONGOMOCK RUNS THE AGGREGATIONS IN PYTHON, SET "bench_mongo_url" FOR REAL NUMBERS
+import time
+import argparse
+import pymongo
+from common import get_bench_database, synthetic_expenses, measure, summary
+import expense_store
+import aggregations
+import rollups
+
+
+def run(size, repeat):
+    db = get_bench_database()
+    expenseCollection = db[expense_store.COLLECTION]
+    rollupCollection = db[rollups.COLLECTION]
+    expense_store.ensure_indexes(expenseCollection)
+    rollups.ensure_indexes(rollupCollection)
+    email = "bench@example.com"
+
+    expenses = [
+        expense_store.new_expense(
+            expense_store.parse_date(e["date"]), e["amount"], e["title"], e["category"]
+        )
+        for e in synthetic_expenses(size)
+    ]
+    expenseCollection.insert_many(expense_store.make_buckets(email, expenses))
+    start = time.perf_counter()
+    rollups.rebuild(expenseCollection, rollupCollection, email)
+    print(f"rebuilt the rollups of {size} expenses in {time.perf_counter() - start:.2f}s")
+
+    def scan():
+        pipeline = aggregations._expense_stages(email) + [
+            {"$group": {"_id": "$category", "amount": {"$sum": "$amount"}}},
+            {"$sort": {"amount": pymongo.DESCENDING}},
+        ]
+        list(expenseCollection.aggregate(pipeline, allowDiskUse=True))
+        pipeline = aggregations._expense_stages(email) + [
+            {"$sort": {"date": pymongo.DESCENDING}},
+            {"$limit": 30},
+            {"$group": {"_id": "$date", "amount": {"$sum": "$amount"}}},
+        ]
+        list(expenseCollection.aggregate(pipeline, allowDiskUse=True))
+
+    def rollup():
+        rollups.category_totals(rollupCollection, email)
+        rollups.daily_totals(rollupCollection, email, 30)
+        rollups.monthly_totals(rollupCollection, email, 12)
+
+    print(summary(f"scan history={size}", measure(scan, repeat)))
+    print(summary(f"rollup history={size}", measure(rollup, repeat)))
+    start = time.perf_counter()
+    mismatched = rollups.check(expenseCollection, rollupCollection, email)
+    print(
+        f"checked in {time.perf_counter() - start:.2f}s, "
+        f"{len(mismatched)} months out of date"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
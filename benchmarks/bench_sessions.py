@@ -0,0 +1,84 @@
+# COOKIE SIZE AND SESSION LOAD TIME PER REQUEST FOR EVERY SESSION BACKEND
+#
+#   python benchmarks/bench_sessions.py [--requests 2000]
+#
+# "cookie (before)" IS THE OLD SIGNED COOKIE HOLDING THE WHOLE DASHBOARD SUMMARY.
+# THE SERVER SIDE BACKENDS ONLY KEEP WHO THE USER IS AND SEND AN OPAQUE ID.
+# "redis" RUNS WHEN fakeredis (OR A REDIS AT SESSION_REDIS_URL) IS AVAILABLE
+import os
+import time
+import argparse
+from flask import Flask, session
+from werkzeug.test import EnvironBuilder
+from common import synthetic_expenses, percentile
+import sessions
+
+SUMMARY = {
+    "name": "Bench User",
+    "email": "bench@example.com",
+    "budget": 50000,
+    "spent": 12345,
+    "balance": 37655,
+    "expenses": list(synthetic_expenses(5)),
+}
+IDENTITY = {"email": "bench@example.com", "name": "Bench User", "stamp": time.time_ns()}
+
+
+def make_app(backend, payload):
+    app = Flask(__name__)
+    app.secret_key = "bench"
+    redis_client = None
+    if backend == "redis" and not os.environ.get("SESSION_REDIS_URL"):
+        import fakeredis
+
+        redis_client = fakeredis.FakeStrictRedis()
+    sessions.init_sessions(app, backend, redis_client=redis_client)
+
+    @app.route("/login")
+    def login():
+        session["user"] = payload
+        return "ok"
+
+    @app.route("/page")
+    def page():
+        return session["user"]["email"]
+
+    return app
+
+
+def run(label, backend, payload, requests):
+    try:
+        app = make_app(backend, payload)
+    except ImportError as e:
+        print(f"{label:<22} skipped ({e})")
+        return
+    client = app.test_client()
+    response = client.get("/login")
+    cookie = response.headers.get("Set-Cookie", "").split(";")[0]
+    environ = EnvironBuilder(path="/page", headers={"Cookie": cookie}).get_environ()
+    timings = []
+    with app.app_context():
+        for _ in range(requests):
+            start = time.perf_counter()
+            data = app.session_interface.open_session(app, app.request_class(environ))
+            data["user"]["email"]
+            timings.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{label:<22} cookie={len(cookie):5d} bytes "
+        f"load p50={percentile(timings, 50):.4f}ms p99={percentile(timings, 99):.4f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    run("cookie (before)", "cookie", SUMMARY, args.requests)
+    run("cookie (identity)", "cookie", IDENTITY, args.requests)
+    run("memory", "memory", IDENTITY, args.requests)
+    run("filesystem", "filesystem", IDENTITY, args.requests)
+    run("redis", "redis", IDENTITY, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# WORKER STARTUP COST: IMPORT TIME, APP SET UP, FIRST REQUEST AND MEMORY
+#
+#   python benchmarks/bench_startup.py [--runs 5] [--ref v1.0] [--record]
+#
+# EVERY RUN IS A FRESH PYTHON PROCESS THAT IMPORTS application, CALLS create_app
+# (WHEN THE VERSION HAS ONE) AND SERVES "GET /" THROUGH THE TEST CLIENT, LIKE A NEW
+# GUNICORN WORKER. THE MEDIAN OF THE RUNS IS PRINTED WITH THE PEAK RSS AND THE
+# HEAVY MODULES THAT GOT LOADED. THE DATABASE IS MONGOMOCK, SO ONLY THE PYTHON
+# SIDE IS MEASURED (create_app INCLUDES IMPORTING MONGOMOCK)
+#
+# --ref MEASURES ANOTHER GIT REVISION (E.G. THE PREVIOUS RELEASE) FROM A TEMPORARY
+# CHECKOUT. --record APPENDS THE RESULT TO benchmarks/startup_history.jsonl SO THE
+# NUMBERS CAN BE FOLLOWED FROM RELEASE TO RELEASE
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from common import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY = os.path.join(ROOT, "benchmarks", "startup_history.jsonl")
+
+# MODULES THAT SHOULD NOT BE LOADED BY A WORKER THAT ONLY SERVES PAGES
+HEAVY = ["pandas", "numpy", "matplotlib", "pyarrow", "smtplib"]
+
+# RUN INSIDE THE CHILD PROCESS
+PROBE = """
+import sys, time, json, resource
+start = time.perf_counter()
+import application
+imported = time.perf_counter()
+if hasattr(application, "create_app"):
+    application.create_app()
+created = time.perf_counter()
+application.app.test_client().get("/")
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (served - created) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": sorted({m.split(".")[0] for m in sys.modules} & set(%r)),
+}))
+"""
+
+
+def probe(tree):
+    env = dict(
+        os.environ,
+        mongo_url="mongomock://",
+        LOG_FILE=os.path.join(tempfile.gettempdir(), "bench_startup.log"),
+        SESSION_BACKEND="memory",
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE % HEAVY],
+        cwd=tree,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def checkout(ref):
+    tree = tempfile.mkdtemp(prefix="bench_startup_")
+    archive = subprocess.run(
+        ["git", "archive", ref], cwd=ROOT, capture_output=True, check=True
+    ).stdout
+    subprocess.run(["tar", "-x", "-C", tree], input=archive, check=True)
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ref", default=None)
+    parser.add_argument("--record", action="store_true")
+    args = parser.parse_args()
+
+    tree = checkout(args.ref) if args.ref else ROOT
+    try:
+        runs = [probe(tree) for _ in range(args.runs)]
+    finally:
+        if args.ref:
+            shutil.rmtree(tree, ignore_errors=True)
+
+    revision = args.ref or subprocess.run(
+        ["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True, text=True
+    ).stdout.strip()
+    result = {"revision": revision, "date": datetime.now(timezone.utc).isoformat()}
+    for key in ["import_ms", "create_app_ms", "first_request_ms", "rss_mb"]:
+        result[key] = round(percentile([run[key] for run in runs], 50), 1)
+    result["heavy_modules"] = runs[-1]["modules"]
+    for key, value in result.items():
+        print(f"{key:<18} {value}")
+    if args.record:
+        with open(HISTORY, "a") as history:
+            history.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
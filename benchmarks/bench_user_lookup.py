@@ -0,0 +1,77 @@
+# LOGIN AND REGISTER LOOKUPS BY EMAIL WITH AND WITHOUT THE UNIQUE EMAIL INDEX
+#
+#   python benchmarks/bench_user_lookup.py [--users 1000000] [--repeat 200]
+#
+# "before" RUNS THE LOOKUPS ON A COLLECTION WITHOUT AN EMAIL INDEX (A FULL
+# COLLECTION SCAN PER LOGIN), "after" CREATES THE "email_unique" INDEX FIRST.
+# REGISTERING AN EXISTING EMAIL IS ALSO TIMED: BEFORE IT WAS A find_one PLUS THE
+# INSERT, NOW THE INSERT ALONE FAILS ON THE INDEX
+#
+# MONGOMOCK DOES NOT USE INDEXES, SO SET "bench_mongo_url" FOR REAL NUMBERS AND
+# LOWER --users WHEN RUNNING WITHOUT A MONGOD
+import time
+import random
+import argparse
+import pymongo
+from common import get_bench_database, measure, summary
+import user_store
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    db = get_bench_database()
+    users = db[user_store.COLLECTION]
+    start = time.perf_counter()
+    for first in range(0, args.users, args.batch_size):
+        users.insert_many(
+            [
+                {
+                    "name": f"User {i}",
+                    "email": f"user{i}@example.com",
+                    "password": "hash",
+                    "budget": 0,
+                    "spent": 0,
+                    "recent": [],
+                }
+                for i in range(first, min(first + args.batch_size, args.users))
+            ],
+            ordered=False,
+        )
+    print(f"inserted {args.users} users in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(42)
+
+    def lookup():
+        email = f"user{rng.randrange(args.users)}@example.com"
+        user_store.find_for_login(users, email)
+
+    def register_before():
+        email = f"user{rng.randrange(args.users)}@example.com"
+        if users.find_one({"email": email}, {"_id": 1}) is None:
+            users.insert_one({"email": email})
+
+    def register_after():
+        email = f"user{rng.randrange(args.users)}@example.com"
+        try:
+            user_store.create_user(users, "Again", email, "hash")
+        except pymongo.errors.DuplicateKeyError:
+            pass
+
+    print(summary("before login lookup", measure(lookup, args.repeat)))
+    print(summary("before duplicate register", measure(register_before, args.repeat)))
+
+    start = time.perf_counter()
+    user_store.ensure_indexes(users)
+    print(f"built the email index in {time.perf_counter() - start:.1f}s")
+
+    print(summary("after login lookup", measure(lookup, args.repeat)))
+    print(summary("after duplicate register", measure(register_after, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
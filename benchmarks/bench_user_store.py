@@ -0,0 +1,92 @@
+# BYTES PER REQUEST AND LATENCY OF THE USER READS AND WRITES
+#
+#   python benchmarks/bench_user_store.py [--history 1000]
+#
+# "before" IS THE OLD ROUND TRIP: THE WHOLE USER DOCUMENT (WITH THE EMBEDDED
+# EXPENSE HISTORY, PASSWORD AND OTP) COMES BACK AND IS SLICED IN PYTHON.
+# "after" IS user_store, WHICH ONLY RECEIVES THE PROJECTED SUMMARY FIELDS
+import argparse
+import bson
+import pymongo
+from werkzeug.security import generate_password_hash
+from common import get_bench_database, synthetic_expenses, measure, summary
+import user_store
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    db = get_bench_database()
+    users = db[user_store.COLLECTION]
+    expenses = list(synthetic_expenses(args.history))
+    users.insert_one(
+        {
+            "name": "Old",
+            "email": "old@example.com",
+            "password": generate_password_hash("secret"),
+            "otp": "1234",
+            "budget": 10**9,
+            "spent": 0,
+            "expenses": expenses,
+        }
+    )
+    users.insert_one(
+        {
+            "name": "New",
+            "email": "new@example.com",
+            "password": generate_password_hash("secret"),
+            "otp": "1234",
+            "budget": 10**9,
+            "spent": 0,
+            "recent": expenses[-5:],
+        }
+    )
+    expense = expenses[-1]
+    received = {"before": 0, "after": 0}
+
+    def before_add_expense():
+        user = users.find_one_and_update(
+            {"email": "old@example.com"},
+            {"$inc": {"spent": expense["amount"]}},
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+        received["before"] = len(bson.encode(user))
+        for key in ["_id", "otp", "password"]:
+            user.pop(key, None)
+        user["balance"] = user["budget"] - user["spent"]
+        user["expenses"] = user["expenses"][-5:]
+
+    def after_add_expense():
+        user = users.find_one_and_update(
+            {"email": "new@example.com"},
+            {
+                "$push": {"recent": {"$each": [expense], "$slice": -5}},
+                "$inc": {"spent": expense["amount"]},
+            },
+            projection=user_store.SUMMARY_PROJECTION,
+            return_document=pymongo.ReturnDocument.AFTER,
+        )
+        received["after"] = len(bson.encode(user))
+        user_store.to_summary(user)
+
+    print(summary("before add_expense", measure(before_add_expense, args.repeat)))
+    print(summary("after add_expense", measure(after_add_expense, args.repeat)))
+    print(f"bytes per request: before={received['before']} after={received['after']}")
+
+    def before_login():
+        received["before"] = len(bson.encode(users.find_one({"email": "old@example.com"})))
+
+    def after_login():
+        user = user_store.find_for_login(users, "new@example.com")
+        received["after"] = len(bson.encode(user))
+
+    print(summary("before login fetch", measure(before_login, args.repeat)))
+    print(summary("after login fetch", measure(after_login, args.repeat)))
+    print(f"bytes per request: before={received['before']} after={received['after']}")
+
+
+if __name__ == "__main__":
+    main()
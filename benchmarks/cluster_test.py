@@ -0,0 +1,173 @@
+# MULTI PROCESS TEST OF THE STATELESS MODE
+#
+#   bench_mongo_url=mongodb://127.0.0.1:27017 python benchmarks/cluster_test.py [--nodes 3] [--workers 2] [--users 20] [--duration 30]
+#
+# STARTS "--nodes" GUNICORN SERVERS (ONE PER "MACHINE", "--workers" PROCESSES EACH)
+# WITH STATELESS=1, A SHARED SECRET_KEY AND THE SAME MONGODB. EVERY VIRTUAL USER
+# SENDS EACH REQUEST TO A RANDOM NODE WITH THE SAME COOKIE, SO ITS SESSION IS READ
+# AND WRITTEN BY ALL THE WORKERS. AT THE END:
+#   - NO LOGGED IN REQUEST MAY HAVE BEEN SENT BACK TO THE LOGIN PAGE
+#   - THE "spent" OF EVERY USER MUST BE THE SUM OF THE EXPENSES IT POSTED
+# EXITS WITH 1 WHEN ANY CHECK FAILS. NEEDS A REAL MONGOD, THE WORKERS CAN NOT SHARE
+# A MONGOMOCK DATABASE
+import os
+import sys
+import time
+import uuid
+import random
+import secrets
+import argparse
+import threading
+import subprocess
+import urllib.parse
+import urllib.request
+from common import percentile
+from load_test import VirtualUser
+import pymongo
+import user_store
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_node(port, workers, env):
+    node = subprocess.Popen(
+        ["gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=ROOT,
+        env=dict(env, WEB_BIND=f"127.0.0.1:{port}", WEB_WORKERS=str(workers)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return node
+        except OSError:
+            time.sleep(0.2)
+    node.kill()
+    raise RuntimeError(f"Node On Port {port} Did Not Start")
+
+
+class ClusterUser(VirtualUser):
+    # ONE BROWSER (ONE COOKIE JAR) TALKING TO A RANDOM NODE ON EVERY REQUEST
+    def __init__(self, urls, rng):
+        super().__init__(urls[0])
+        self.urls = urls
+        self.rng = rng
+
+    def request(self, path, data=None):
+        self.base_url = self.rng.choice(self.urls)
+        return super().request(path, data)
+
+    # THE PAGE A REQUEST ENDED ON AFTER THE REDIRECTS
+    def landing(self, path, data=None):
+        self.base_url = self.rng.choice(self.urls)
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        with self.opener.open(self.base_url + path, data=body, timeout=30) as response:
+            response.read()
+            return urllib.parse.urlparse(response.geturl()).path
+
+
+def worker(urls, deadline, results, lock):
+    rng = random.Random()
+    user = ClusterUser(urls, rng)
+    user.email = f"cluster-{uuid.uuid4().hex}@example.com"
+    user.request(
+        "/register",
+        {"name": "Cluster", "email": user.email, "password": "pw", "confirm_password": "pw"},
+    )
+    user.request("/", {"email": user.email, "password": "pw"})
+    user.request("/add_budget", {"budget_amount": "1000000", "op": uuid.uuid4().hex})
+    local = {"timings": [], "logged_out": 0, "errors": 0, "spent": 0}
+    while time.perf_counter() < deadline:
+        amount = rng.randint(1, 500)
+        steps = [
+            ("/homePage", None),
+            (
+                "/add_expense",
+                {
+                    "title": "Cluster",
+                    "amount": str(amount),
+                    "date": time.strftime("%Y-%m-%d"),
+                    "category": "Food",
+                    "op": uuid.uuid4().hex,
+                },
+            ),
+        ]
+        for path, data in steps:
+            start = time.perf_counter()
+            try:
+                if user.landing(path, data) != "/homePage":
+                    local["logged_out"] += 1
+                elif data is not None:
+                    local["spent"] += amount
+            except Exception:
+                local["errors"] += 1
+            local["timings"].append((time.perf_counter() - start) * 1000)
+    with lock:
+        results.append((user.email, local))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--base-port", type=int, default=8100)
+    args = parser.parse_args()
+
+    mongo_url = os.environ.get("bench_mongo_url")
+    if not mongo_url:
+        sys.exit("Set bench_mongo_url, The Nodes Need A Shared MongoDB")
+    env = dict(
+        os.environ,
+        STATELESS="1",
+        SECRET_KEY=secrets.token_hex(32),
+        mongo_url=mongo_url,
+        SESSION_BACKEND=os.environ.get("SESSION_BACKEND", "mongodb"),
+    )
+    ports = [args.base_port + n for n in range(args.nodes)]
+    nodes = []
+    try:
+        for port in ports:
+            nodes.append(start_node(port, args.workers, env))
+        urls = [f"http://127.0.0.1:{port}" for port in ports]
+
+        results, lock = [], threading.Lock()
+        deadline = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(target=worker, args=(urls, deadline, results, lock))
+            for _ in range(args.users)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        for node in nodes:
+            node.terminate()
+            node.wait()
+
+    timings = [t for _, local in results for t in local["timings"]]
+    loggedOut = sum(local["logged_out"] for _, local in results)
+    errors = sum(local["errors"] for _, local in results)
+    users = pymongo.MongoClient(mongo_url)["ExpenseTracker"][user_store.COLLECTION]
+    wrongTotals = [
+        email
+        for email, local in results
+        if users.find_one({"email": email}, {"spent": 1})["spent"] != local["spent"]
+    ]
+    print(
+        f"{args.nodes} nodes x {args.workers} workers: {len(timings)} requests in "
+        f"{elapsed:.1f}s = {len(timings) / elapsed:.1f} req/s "
+        f"p50={percentile(timings, 50):.1f}ms p99={percentile(timings, 99):.1f}ms"
+    )
+    print(f"sent back to login {loggedOut}, errors {errors}, wrong totals {len(wrongTotals)}")
+    sys.exit(1 if loggedOut or errors or wrongTotals else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# SHARED HELPERS FOR THE BENCHMARK SCRIPTS
+#
+# THE BENCHMARKS RUN AGAINST A REAL MONGOD WHEN "bench_mongo_url" IS SET,
+# OTHERWISE AGAINST AN IN MEMORY MONGOMOCK DATABASE
+import os
+import sys
+import time
+import random
+from datetime import date, timedelta
+
+# MAKE THE APP MODULES IMPORTABLE WHEN RUNNING "python benchmarks/<script>.py"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Bills", "Health"]
+
+
+# FRESH DATABASE FOR A BENCHMARK RUN
+def get_bench_database(name="ExpenseTrackerBench"):
+    mongo_url = os.environ.get("bench_mongo_url")
+    if mongo_url:
+        import pymongo
+
+        client = pymongo.MongoClient(mongo_url)
+        client.drop_database(name)
+        return client[name]
+    import mongomock
+
+    return mongomock.MongoClient()[name]
+
+
+# SYNTHETIC EXPENSES SPREAD OVER THE LAST FEW YEARS, OLDEST FIRST
+def synthetic_expenses(n, seed=42, days=3 * 365):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days)
+    for i in range(n):
+        day = start + timedelta(days=i * days // max(n, 1))
+        yield {
+            "date": day.strftime("%Y-%m-%d"),
+            "amount": rng.randint(10, 5000),
+            "title": f"Expense {i}",
+            "category": rng.choice(CATEGORIES),
+        }
+
+
+# CALL FN REPEATEDLY AND RETURN THE LATENCIES IN MILLISECONDS
+def measure(fn, repeat=200):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+# PERCENTILE OF A LIST OF NUMBERS
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+# ONE LINE SUMMARY OF A LIST OF LATENCIES
+def summary(label, timings):
+    return (
+        f"{label:<40} p50={percentile(timings, 50):8.3f}ms "
+        f"p99={percentile(timings, 99):8.3f}ms n={len(timings)}"
+    )
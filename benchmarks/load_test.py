@@ -0,0 +1,111 @@
+# LOAD TEST AGAINST A RUNNING SERVER
+#
+#   python application.py                                  (DEVELOPMENT SERVER)
+#   gunicorn -c gunicorn.conf.py wsgi:app                  (PRODUCTION SERVER)
+#   WEB_WORKER_CLASS=gevent gunicorn -c gunicorn.conf.py wsgi:app   (GEVENT WORKERS)
+#   python benchmarks/load_test.py --url http://127.0.0.1:8000 --users 20 --duration 30
+#
+# EVERY VIRTUAL USER REGISTERS, LOGS IN AND THEN LOOPS OVER THE HOME PAGE, THE
+# LOGIN PAGE AND ADDING AN EXPENSE. RUN IT ONCE PER SERVER MODE AND COMPARE THE
+# REQUESTS PER SECOND. THE SERVER NEEDS A SHARED DATABASE (A REAL MONGOD) WHEN IT
+# RUNS MORE THAN ONE PROCESS
+import time
+import uuid
+import random
+import argparse
+import threading
+import urllib.parse
+import urllib.request
+import http.cookiejar
+from common import percentile
+
+
+class VirtualUser:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        jar = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+    def request(self, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        with self.opener.open(self.base_url + path, data=body, timeout=30) as response:
+            response.read()
+            return response.status
+
+    def setup(self):
+        email = f"load-{uuid.uuid4().hex}@example.com"
+        form = {"name": "Load", "email": email, "password": "pw", "confirm_password": "pw"}
+        self.request("/register", form)
+        self.request("/", {"email": email, "password": "pw"})
+        self.request("/add_budget", {"budget_amount": "1000000"})
+
+
+def worker(base_url, deadline, results, lock):
+    user = VirtualUser(base_url)
+    user.setup()
+    rng = random.Random()
+    steps = [
+        ("GET /homePage", lambda: user.request("/homePage")),
+        ("GET /", lambda: user.request("/")),
+        (
+            "POST /add_expense",
+            lambda: user.request(
+                "/add_expense",
+                {
+                    "title": "Load",
+                    "amount": str(rng.randint(1, 500)),
+                    "date": time.strftime("%Y-%m-%d"),
+                    "category": "Food",
+                },
+            ),
+        ),
+    ]
+    local = {}
+    while time.perf_counter() < deadline:
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                step()
+                ok = True
+            except Exception:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            local.setdefault(name, []).append((elapsed, ok))
+    with lock:
+        for name, timings in local.items():
+            results.setdefault(name, []).extend(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    args = parser.parse_args()
+
+    results, lock = {}, threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args.url, deadline, results, lock))
+        for _ in range(args.users)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(timings) for timings in results.values())
+    print(f"{total} requests in {elapsed:.1f}s = {total / elapsed:.1f} req/s")
+    for name, timings in sorted(results.items()):
+        latencies = [t for t, _ in timings]
+        errors = sum(1 for _, ok in timings if not ok)
+        print(
+            f"{name:<20} n={len(timings):6d} errors={errors:4d} "
+            f"p50={percentile(latencies, 50):8.1f}ms p99={percentile(latencies, 99):8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
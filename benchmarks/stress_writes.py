@@ -0,0 +1,110 @@
+# CONCURRENCY STRESS TEST OF THE WRITE PATH
+#
+#   python benchmarks/stress_writes.py [--writers 8] [--posts 200] [--retry 0.3]
+#
+# "--writers" CLIENTS (TABS OR DEVICES OF THE SAME USER) POST EXPENSES AND BUDGETS AT
+# THE SAME TIME. A SHARE ("--retry") OF THE POSTS IS SENT TWICE WITH THE SAME
+# IDEMPOTENCY KEY, LIKE A BROWSER RETRY. AT THE END THE TOTALS MUST ADD UP:
+#   spent == SUM OF THE EXPENSE BUCKETS == SUM OF THE ROLLUPS == SUM OF THE POSTS
+#   budget == SUM OF THE BUDGET POSTS, rev == NUMBER OF POSTS (RETRIES NOT COUNTED)
+# AND THE CACHED SUMMARY MUST BE THE STORED ONE. EXITS WITH 1 WHEN
+# ANY CHECK FAILS. THE APP RUNS IN PROCESS, ON MONGOMOCK OR "bench_mongo_url"
+import os
+import sys
+import uuid
+import random
+import argparse
+import threading
+import common
+
+os.environ["mongo_url"] = os.environ.get("bench_mongo_url", "mongomock://")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+import application
+import user_store
+
+EMAIL = "stress@example.com"
+
+
+def writer(n, client, args, sent, lock):
+    rng = random.Random(n)
+    spent = budget = posts = 0
+    for i in range(args.posts):
+        key = uuid.uuid4().hex
+        if rng.random() < 0.2:
+            amount = rng.randint(100, 1000)
+            path, form = "/add_budget", {"budget_amount": str(amount), "op": key}
+            budget += amount
+        else:
+            amount = rng.randint(1, 500)
+            expense = next(common.synthetic_expenses(1, seed=n * args.posts + i))
+            path, form = "/add_expense", dict(expense, amount=str(amount), op=key)
+            spent += amount
+        posts += 1
+        for _ in range(2 if rng.random() < args.retry else 1):
+            client.post(path, data=form)
+    with lock:
+        sent["spent"] += spent
+        sent["budget"] += budget
+        sent["posts"] += posts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--retry", type=float, default=0.3)
+    args = parser.parse_args()
+
+    application.create_app()
+    application.app.test_client().post(
+        "/register",
+        data={"name": "Stress", "email": EMAIL, "password": "pw", "confirm_password": "pw"},
+    )
+    # ONE LOGGED IN SESSION PER WRITER
+    clients = []
+    for _ in range(args.writers):
+        client = application.app.test_client()
+        client.post("/", data={"email": EMAIL, "password": "pw"})
+        clients.append(client)
+
+    sent = {"spent": 0, "budget": 0, "posts": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=writer, args=(n, client, args, sent, lock))
+        for n, client in enumerate(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    user = application.userCollection.find_one({"email": EMAIL})
+    buckets = sum(
+        b["total"] for b in application.expenseCollection.find({"user": EMAIL}, {"total": 1})
+    )
+    rollup = sum(
+        r["total"] for r in application.rollupCollection.find({"user": EMAIL}, {"total": 1})
+    )
+    checks = {
+        "spent == posted": (user["spent"], sent["spent"]),
+        "buckets == posted": (buckets, sent["spent"]),
+        "rollups == posted": (rollup, sent["spent"]),
+        "budget == posted": (user["budget"], sent["budget"]),
+        "rev == posts": (user["rev"], sent["posts"]),
+        "cached summary == stored": (
+            application.summaryCache.get(EMAIL, user["rev"])
+            == user_store.find_summary(application.userCollection, EMAIL),
+            True,
+        ),
+    }
+    failed = False
+    for label, (got, expected) in checks.items():
+        ok = got == expected
+        failed |= not ok
+        print(f"{label:<26} {'ok' if ok else 'FAILED'} ({got} / {expected})")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# BENCHMARK SUITE OF THE ROUTES, COMPARED AGAINST A STORED BASELINE
+#
+#   python benchmarks/suite.py                        (RUN AND COMPARE WITH benchmarks/baseline.json)
+#   python benchmarks/suite.py --save-baseline        (RUN AND SAVE THE RESULTS AS THE BASELINE)
+#   python benchmarks/suite.py --sizes 10 10000 1000000 --only add_expense chart_day
+#
+# EVERY SCENARIO RUNS THROUGH THE FLASK TEST CLIENT FOR A USER WITH 10 AND 10K
+# EXPENSES (1M WITH --sizes, IT TAKES A WHILE TO FILL) FOR "--requests" REQUESTS OR
+# "--seconds", WHICHEVER COMES FIRST (AT LEAST ONE). FOR EVERY SCENARIO IT REPORTS:
+#   req/s, p50, p99    LATENCY OF THE REQUESTS
+#   kb/req             PEAK PYTHON MEMORY OF ONE REQUEST (tracemalloc)
+#   db/req             MONGODB CALLS OF ONE REQUEST (THE Server-Timing HEADER)
+#   errors             RESPONSES WITH ANOTHER STATUS THAN EXPECTED
+# MONGOMOCK DOES NOT SEND PYMONGO COMMAND EVENTS, SO ON MONGOMOCK THE CALLS ARE
+# COUNTED ON ITS COLLECTION METHODS INSTEAD. THE OTP MAILS GO TO A LOCAL aiosmtpd
+# SERVER WHEN IT IS INSTALLED
+#
+# A RESULT IS A REGRESSION WHEN p50 OR kb/req GROW OR req/s DROPS BY MORE THAN
+# "--tolerance" (p99 BY MORE THAN TWICE IT) COMPARED TO THE BASELINE, OR WHEN
+# db/req GROWS AT ALL. REGRESSIONS
+# MAKE THE SCRIPT EXIT WITH 1. A BASELINE IS ONLY COMPARABLE ON THE SAME MACHINE
+# AND DATABASE ("bench_mongo_url" OR MONGOMOCK)
+import os
+import sys
+import json
+import time
+import uuid
+import platform
+import tempfile
+import argparse
+import threading
+import tracemalloc
+import pymongo
+from datetime import datetime, timezone
+import common
+
+os.environ["mongo_url"] = os.environ.get("bench_mongo_url", "mongomock://")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("PASSWORD_WORKERS", "0")
+os.environ.setdefault("LOGIN_MAX_PER_IP", "1000")
+# EVERY REQUEST ISSUES AND MAILS A NEW CODE FOR THE SAME USER
+os.environ.setdefault("OTP_MAX_PER_IP", "1000000")
+os.environ.setdefault("OTP_COOLDOWN", "0")
+os.environ.setdefault("SECRET_KEY", "bench-suite")
+os.environ.setdefault("SMTP_HOST", "127.0.0.1")
+os.environ.setdefault("SMTP_PORT", "8026")
+os.environ.setdefault("SMTP_STARTTLS", "0")
+os.environ.setdefault("sender_email", "suite@example.com")
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "bench_suite.log"))
+import application
+import expense_store
+import user_store
+import rollups
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# (NAME, METHOD, PATH, FORM BUILDER OR None, EXPECTED STATUS)
+# THE READS RUN FIRST, BEFORE add_expense GROWS THE HISTORY OF THE USER
+SCENARIOS = [
+    ("login", "POST", "/", lambda user: {"email": user, "password": "pw"}, 302),
+    ("home", "GET", "/homePage", None, 200),
+    (
+        "download_expense",
+        "POST",
+        "/download_expense",
+        lambda user: {"category": "all", "format": "csv"},
+        200,
+    ),
+    ("chart_day", "GET", "/api/chart_data?group=day", None, 200),
+    ("chart_month", "GET", "/api/chart_data?group=month&limit=12", None, 200),
+    ("expense_page", "GET", "/api/expenses?limit=20", None, 200),
+    ("forgot_password", "POST", "/forgot_password", lambda user: {"email": user}, 200),
+    (
+        "add_expense",
+        "POST",
+        "/add_expense",
+        lambda user: {
+            "title": "Suite",
+            "amount": "100",
+            "date": time.strftime("%Y-%m-%d"),
+            "category": "Food",
+            "op": uuid.uuid4().hex,
+        },
+        302,
+    ),
+    (
+        "add_budget",
+        "POST",
+        "/add_budget",
+        lambda user: {"budget_amount": "1", "op": uuid.uuid4().hex},
+        302,
+    ),
+    ("reset_all", "GET", "/reset_all", None, 302),
+]
+
+# (METRIC, True WHEN HIGHER IS BETTER, SHARE OF --tolerance ALLOWED)
+# THE p99 OF A FEW DOZEN REQUESTS IS NOISY, IT GETS TWICE THE TOLERANCE
+METRICS = [("rps", True, 1), ("p50", False, 1), ("p99", False, 2), ("kb", False, 1)]
+
+
+# COUNT THE MONGOMOCK COLLECTION CALLS OF A REQUEST IN g.db_calls, LIKE
+# metrics.CommandTimer DOES FOR PYMONGO (ONLY THE OUTERMOST CALL, MONGOMOCK CALLS
+# ITS OWN METHODS INTERNALLY)
+def count_mongomock_calls():
+    import mongomock.collection
+    from flask import g, has_request_context
+
+    local = threading.local()
+
+    def wrap(fn):
+        def wrapper(*args, **kwargs):
+            depth = getattr(local, "depth", 0)
+            if depth == 0 and has_request_context() and "db_calls" in g:
+                g.db_calls += 1
+            local.depth = depth + 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                local.depth = depth
+
+        return wrapper
+
+    for name in [
+        "find", "find_one", "insert_one", "insert_many", "update_one", "update_many",
+        "replace_one", "delete_one", "delete_many", "find_one_and_update",
+        "find_one_and_delete", "find_one_and_replace", "aggregate", "bulk_write",
+        "count_documents", "distinct",
+    ]:
+        setattr(
+            mongomock.collection.Collection,
+            name,
+            wrap(getattr(mongomock.collection.Collection, name)),
+        )
+
+
+# START A LOCAL SMTP SERVER FOR THE OTP MAILS (None WITHOUT aiosmtpd)
+def start_smtp():
+    try:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.handlers import Sink
+    except ImportError:
+        return None
+    controller = Controller(
+        Sink(), hostname=os.environ["SMTP_HOST"], port=int(os.environ["SMTP_PORT"])
+    )
+    controller.start()
+    return controller
+
+
+# A LOGGED IN USER WITH "size" EXPENSES, THEIR ROLLUPS AND TOTALS
+def make_user(size):
+    email = f"suite{size}@example.com"
+    client = application.app.test_client()
+    client.post(
+        "/register",
+        data={"name": "Suite", "email": email, "password": "pw", "confirm_password": "pw"},
+    )
+    expenses = [
+        expense_store.new_expense(
+            expense_store.parse_date(e["date"]), e["amount"], e["title"], e["category"]
+        )
+        for e in common.synthetic_expenses(size)
+    ]
+    buckets = expense_store.make_buckets(email, expenses)
+    for start in range(0, len(buckets), 1000):
+        application.expenseCollection.insert_many(buckets[start : start + 1000])
+    rollups.rebuild(application.expenseCollection, application.rollupCollection, email)
+    application.userCollection.update_one(
+        {"email": email},
+        {
+            "$set": {
+                "budget": 10**12,
+                "spent": sum(e["amount"] for e in expenses),
+                "recent": [expense_store.public(e) for e in expenses[-user_store.RECENT_SIZE :]],
+            }
+        },
+    )
+    client.post("/", data={"email": email, "password": "pw"})
+    return email, client
+
+
+def db_calls(response):
+    timing = response.headers.get("Server-Timing", "")
+    marker = 'db;desc="'
+    if marker not in timing:
+        return 0
+    return int(timing.split(marker, 1)[1].split(" ", 1)[0])
+
+
+def run_scenario(client, email, scenario, args):
+    name, method, path, form, status = scenario
+
+    def call():
+        data = form(email) if form else None
+        response = client.open(path, method=method, data=data)
+        # READ STREAMED RESPONSES (THE EXPORT) TO THE END
+        response.get_data()
+        return response
+
+    # THE FIRST REQUEST PAYS FOR LAZY IMPORTS AND CONNECTIONS, IT IS NOT COUNTED
+    call()
+    timings, calls, errors = [], [], 0
+    deadline = time.perf_counter() + args.seconds
+    while len(timings) < args.requests and (not timings or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        response = call()
+        timings.append((time.perf_counter() - start) * 1000)
+        calls.append(db_calls(response))
+        errors += response.status_code != status
+
+    peaks = []
+    for _ in range(args.memory_samples):
+        tracemalloc.start()
+        call()
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+
+    return {
+        "rps": round(len(timings) / (sum(timings) / 1000), 2),
+        "p50": round(common.percentile(timings, 50), 3),
+        "p99": round(common.percentile(timings, 99), 3),
+        "kb": round(common.percentile(peaks, 50), 1),
+        "db": round(sum(calls) / len(calls), 2),
+        "errors": errors,
+        "n": len(timings),
+    }
+
+
+# REGRESSIONS OF ONE RESULT AGAINST ITS BASELINE
+def regressions(result, base, tolerance):
+    found = []
+    for metric, higherIsBetter, share in METRICS:
+        if metric not in base or not base[metric]:
+            continue
+        change = result[metric] / base[metric] - 1
+        if (-change if higherIsBetter else change) > tolerance * share:
+            found.append(f"{metric} {base[metric]} -> {result[metric]}")
+    if result["db"] > base.get("db", result["db"]):
+        found.append(f"db {base['db']} -> {result['db']}")
+    if result["errors"] > base.get("errors", 0):
+        found.append(f"errors {base.get('errors', 0)} -> {result['errors']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 10000])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--memory-samples", type=int, default=1)
+    parser.add_argument("--only", nargs="+", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    if not os.environ.get("bench_mongo_url"):
+        count_mongomock_calls()
+    smtp = start_smtp()
+    application.create_app()
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)["results"]
+
+    results, failed = {}, False
+    print(
+        f"{'scenario':<28} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'kb/req':>9} "
+        f"{'db/req':>7} {'errors':>6}"
+    )
+    try:
+        for size in args.sizes:
+            email, client = make_user(size)
+            for scenario in SCENARIOS:
+                if args.only and scenario[0] not in args.only:
+                    continue
+                key = f"{scenario[0]}@{size}"
+                result = results[key] = run_scenario(client, email, scenario, args)
+                found = regressions(result, baseline[key], args.tolerance) if key in baseline else []
+                failed |= bool(found)
+                print(
+                    f"{key:<28} {result['rps']:9.1f} {result['p50']:9.3f} {result['p99']:9.3f} "
+                    f"{result['kb']:9.1f} {result['db']:7.2f} {result['errors']:6d}"
+                    + (f"  REGRESSION: {', '.join(found)}" if found else "")
+                )
+    finally:
+        if smtp is not None:
+            smtp.stop()
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as stream:
+            json.dump(
+                {
+                    "date": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "database": "mongodb" if os.environ.get("bench_mongo_url") else "mongomock",
+                    "pymongo": pymongo.version,
+                    "results": results,
+                },
+                stream,
+                indent=2,
+                sort_keys=True,
+            )
+        print(f"baseline saved to {args.baseline}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
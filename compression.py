@@ -0,0 +1,98 @@
+# COMPRESSION OF THE TEXT RESPONSES (PAGES, JSON, CSV, CSS, JS)
+# THE BODY IS SENT BROTLI ("br") OR GZIP ENCODED WHEN THE BROWSER ACCEPTS IT. BROTLI
+# IS ONLY USED WHEN THE OPTIONAL "brotli" PACKAGE IS INSTALLED. STREAMED RESPONSES
+# (THE EXPORTS) AND RESPONSES THAT ARE ALREADY ENCODED (THE /assets FILES) ARE SENT
+# AS THEY ARE
+#
+# CONFIGURED FROM THE ENV FILE:
+#   COMPRESSION            0 TURNS IT OFF
+#   COMPRESSION_MIN_SIZE   SMALLER BODIES ARE NOT WORTH IT (BYTES)
+#   GZIP_LEVEL             1 (FASTEST) TO 9 (SMALLEST)
+#   BROTLI_QUALITY         0 (FASTEST) TO 11 (SMALLEST)
+import os
+import gzip
+import importlib.util
+from flask import current_app, request
+
+COMPRESSIBLE = {
+    "text/html",
+    "text/css",
+    "text/csv",
+    "text/plain",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/x-ndjson",
+}
+MIN_SIZE = 500
+GZIP_LEVEL = 6
+# 11 IS FOR FILES COMPRESSED ONCE (THE ASSETS), PAGES ARE COMPRESSED ON EVERY REQUEST
+BROTLI_QUALITY = 5
+BROTLI = importlib.util.find_spec("brotli") is not None
+
+
+# ENCODINGS THIS PROCESS CAN PRODUCE, PREFERRED FIRST
+def available():
+    return ["br", "gzip"] if BROTLI else ["gzip"]
+
+
+# THE BEST OF "encodings" THE BROWSER ACCEPTS, None FOR THE PLAIN BODY
+def negotiate(encodings):
+    accepted = request.accept_encodings
+    for encoding in encodings:
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=None):
+    if encoding == "br":
+        import brotli
+
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    # mtime=0 KEEPS THE SAME BODY FOR THE SAME DATA
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def _after_request(response):
+    config = current_app.config
+    if (
+        not config["COMPRESSION"]
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE
+    ):
+        return response
+    # CACHES MUST KEEP ONE COPY PER ENCODING
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate(available())
+    if encoding is None or request.method == "HEAD":
+        return response
+    data = response.get_data()
+    if len(data) < config["COMPRESSION_MIN_SIZE"]:
+        return response
+    level = config["BROTLI_QUALITY"] if encoding == "br" else config["GZIP_LEVEL"]
+    response.set_data(compress(data, encoding, level))
+    response.headers["Content-Encoding"] = encoding
+    # THE ENCODED BODY IS NOT BYTE FOR BYTE THE ONE THE ETAG WAS MADE FOR, A WEAK
+    # ETAG STILL MATCHES THE "If-None-Match" OF THE NEXT REQUEST (make_conditional)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# REGISTER THE HOOK ON THE APP, REGISTERED BEFORE THE OTHER HOOKS SO IT RUNS LAST
+# (FLASK RUNS THE after_request HOOKS IN REVERSE ORDER)
+def init_compression(app):
+    app.config.setdefault("COMPRESSION", os.environ.get("COMPRESSION", "1") != "0")
+    app.config.setdefault(
+        "COMPRESSION_MIN_SIZE", int(os.environ.get("COMPRESSION_MIN_SIZE", MIN_SIZE))
+    )
+    app.config.setdefault("GZIP_LEVEL", int(os.environ.get("GZIP_LEVEL", GZIP_LEVEL)))
+    app.config.setdefault(
+        "BROTLI_QUALITY", int(os.environ.get("BROTLI_QUALITY", BROTLI_QUALITY))
+    )
+    app.after_request(_after_request)
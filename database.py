@@ -0,0 +1,75 @@
+import os
+import logging
+import pymongo
+from dotenv import load_dotenv
+import expense_store
+import user_store
+import rollups
+import otp_store
+import recurring
+
+# LOAD THE ENV FILE DATAS
+load_dotenv()
+
+
+# CONNECT WITH MONGO DB AND RETURN THE EXPENSE TRACKER DATABASE
+# "event_listeners" ARE PYMONGO MONITORING LISTENERS (E.G. metrics.CommandTimer)
+def get_database(mongo_url=None, event_listeners=None):
+    # MONGO DB URL
+    mongo_url = mongo_url or os.environ.get("mongo_url")
+    # "mongomock://" GIVES AN IN MEMORY STAND-IN FOR LOCAL RUNS AND BENCHMARKS
+    if mongo_url and mongo_url.startswith("mongomock://"):
+        import mongomock
+
+        return mongomock.MongoClient()["ExpenseTracker"]
+    # CONNECT WITH MONGO DB
+    client = pymongo.MongoClient(mongo_url, event_listeners=event_listeners or [])
+    # CREATING A DATABASE
+    return client["ExpenseTracker"]
+
+
+# COLLECTION NAME -> JSON SCHEMA ENFORCED BY MONGODB
+VALIDATORS = {
+    user_store.COLLECTION: user_store.SCHEMA,
+    expense_store.COLLECTION: expense_store.SCHEMA,
+    rollups.COLLECTION: rollups.SCHEMA,
+    otp_store.COLLECTION: otp_store.SCHEMA,
+    recurring.COLLECTION: recurring.SCHEMA,
+}
+
+
+# ATTACH THE SCHEMA TO THE COLLECTION, CREATING IT WHEN IT DOES NOT EXIST YET
+# "moderate" ONLY CHECKS NEW DOCUMENTS AND DOCUMENTS THAT ARE ALREADY VALID, SO
+# DATA WRITTEN BEFORE THE SCHEMA EXISTED CAN STILL BE UPDATED AND MIGRATED
+def apply_validator(db, name, schema):
+    validator = {"$jsonSchema": schema}
+    if name in db.list_collection_names():
+        db.command(
+            "collMod", name, validator=validator, validationLevel="moderate"
+        )
+    else:
+        db.create_collection(name, validator=validator, validationLevel="moderate")
+
+
+# MAKE SURE ALL THE COLLECTIONS HAVE THE INDEXES AND THE SCHEMA THE APP DEPENDS ON
+# RUNS ONCE AT STARTUP INSTEAD OF CHECKING ON EVERY REQUEST
+def bootstrap(db):
+    for name, schema in VALIDATORS.items():
+        try:
+            apply_validator(db, name, schema)
+        except Exception as e:
+            logging.error(f"Error Occured During Setting The Schema Of {name} : {e}")
+    try:
+        expense_store.ensure_indexes(db[expense_store.COLLECTION])
+        rollups.ensure_indexes(db[rollups.COLLECTION])
+        otp_store.ensure_indexes(db[otp_store.COLLECTION])
+        recurring.ensure_indexes(db[recurring.COLLECTION])
+    except Exception as e:
+        logging.error(f"Error Occured During Creating Indexes : {e}")
+    try:
+        user_store.ensure_indexes(db[user_store.COLLECTION])
+    except pymongo.errors.DuplicateKeyError as e:
+        # THE SAME EMAIL IS REGISTERED MORE THAN ONCE, MERGE THOSE USERS FIRST
+        logging.error(f"Duplicate Emails Found, Unique Email Index Not Created : {e}")
+    except Exception as e:
+        logging.error(f"Error Occured During Creating Indexes : {e}")
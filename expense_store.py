@@ -0,0 +1,273 @@
+# EXPENSE STORAGE LAYER
+# EXPENSES ARE KEPT OUT OF THE USER DOCUMENT IN BUCKETS, ONE BUCKET PER USER PER MONTH
+#   {"user": EMAIL, "month": "YYYY-MM", "count": N, "total": SUM, "expenses": [...]}
+# A BUSY MONTH OVERFLOWS INTO ANOTHER BUCKET WITH THE SAME MONTH ONCE BUCKET_SIZE IS REACHED
+import pymongo
+from datetime import datetime as dt
+from bson import ObjectId
+
+# NAME OF THE COLLECTION HOLDING THE EXPENSE BUCKETS
+COLLECTION = "Expense"
+
+# MAXIMUM NUMBER OF EXPENSES KEPT IN A SINGLE BUCKET DOCUMENT
+BUCKET_SIZE = 200
+
+# FIELDS OF AN EXPENSE THAT ARE SHOWN TO THE USER
+EXPENSE_FIELDS = ["date", "amount", "title", "category"]
+
+# FORMAT OF THE DATES COMING FROM THE FORMS AND GOING TO THE USER
+DATE_FORMAT = "%Y-%m-%d"
+
+
+# SHAPE EVERY BUCKET MUST HAVE (ENFORCED BY MONGODB)
+SCHEMA = {
+    "bsonType": "object",
+    "required": ["user", "month", "count", "total", "expenses"],
+    "properties": {
+        "user": {"bsonType": "string"},
+        "month": {"bsonType": "string", "pattern": "^[0-9]{4}-[0-9]{2}$"},
+        "count": {"bsonType": ["int", "long"], "minimum": 0},
+        "total": {"bsonType": ["int", "long", "double"]},
+        "expenses": {
+            "bsonType": "array",
+            "items": {
+                "bsonType": "object",
+                "required": ["_id", "date", "amount", "title", "category"],
+                "properties": {
+                    "date": {"bsonType": "date"},
+                    "amount": {"bsonType": ["int", "long", "double"]},
+                    "title": {"bsonType": "string"},
+                    "category": {"bsonType": "string"},
+                },
+            },
+        },
+    },
+}
+
+
+# CREATE THE INDEXES USED BY THE BUCKET QUERIES
+def ensure_indexes(collection):
+    collection.create_index(
+        [("user", pymongo.ASCENDING), ("month", pymongo.DESCENDING)],
+        name="user_month",
+    )
+    # FINGERPRINTS OF THE IMPORTED EXPENSES, USED TO SKIP DUPLICATE IMPORTS
+    collection.create_index(
+        [("user", pymongo.ASCENDING), ("expenses.fp", pymongo.ASCENDING)],
+        name="user_fingerprint",
+        partialFilterExpression={"expenses.fp": {"$exists": True}},
+    )
+    # FULL TEXT SEARCH ON THE TITLES OF ONE USER'S EXPENSES
+    collection.create_index(
+        [("user", pymongo.ASCENDING), ("expenses.title", pymongo.TEXT)],
+        name="user_title_text",
+    )
+
+
+# PARSE A "%Y-%m-%d" STRING INTO THE DATETIME SAVED IN MONGODB
+def parse_date(value):
+    return dt.strptime(value, DATE_FORMAT)
+
+
+# "%Y-%m-%d" STRING OF A STORED DATE (OLD STRING DATES ARE RETURNED AS THEY ARE)
+def format_date(value):
+    return value.strftime(DATE_FORMAT) if isinstance(value, dt) else value
+
+
+# MONTH KEY OF A DATE
+def month_of(date):
+    return date.strftime("%Y-%m")
+
+
+# BUILD A NEW EXPENSE DOCUMENT
+def new_expense(date, amount, title, category):
+    return {
+        "_id": ObjectId(),
+        "date": date,
+        "amount": amount,
+        "title": title,
+        "category": category,
+    }
+
+
+# COPY OF THE EXPENSE WITHOUT THE INTERNAL FIELDS (_id AND THE IMPORT FINGERPRINT)
+def public(expense):
+    return {key: expense.get(key) for key in EXPENSE_FIELDS}
+
+
+# ADD ONE EXPENSE TO THE CURRENT BUCKET OF THE MONTH
+def add_expense(collection, email, expense):
+    # THE COUNT FILTER MAKES THE UPSERT OPEN A NEW BUCKET ONCE THE OLD ONE IS FULL
+    collection.update_one(
+        {
+            "user": email,
+            "month": month_of(expense["date"]),
+            "count": {"$lt": BUCKET_SIZE},
+        },
+        {
+            "$push": {"expenses": expense},
+            "$inc": {"count": 1, "total": expense["amount"]},
+        },
+        upsert=True,
+    )
+
+
+# TAKE ONE EXPENSE (BY ITS _id) OUT OF ITS BUCKET
+def remove_expense(collection, email, expense):
+    collection.update_one(
+        {
+            "user": email,
+            "month": month_of(expense["date"]),
+            "expenses._id": expense["_id"],
+        },
+        {
+            "$pull": {"expenses": {"_id": expense["_id"]}},
+            "$inc": {"count": -1, "total": -expense["amount"]},
+        },
+    )
+
+
+# SPLIT A LIST OF EXPENSES INTO FULL BUCKET DOCUMENTS
+def make_buckets(email, expenses):
+    months = {}
+    for expense in expenses:
+        months.setdefault(month_of(expense["date"]), []).append(expense)
+    buckets = []
+    for month, items in months.items():
+        for start in range(0, len(items), BUCKET_SIZE):
+            chunk = items[start : start + BUCKET_SIZE]
+            buckets.append(
+                {
+                    "user": email,
+                    "month": month,
+                    "count": len(chunk),
+                    "total": sum(e["amount"] for e in chunk),
+                    "expenses": chunk,
+                }
+            )
+    return buckets
+
+
+# bulk_write REQUESTS ADDING EXPENSES TO THE CURRENT BUCKETS OF THEIR MONTHS, LIKE
+# add_expense: A CHUNK THAT DOES NOT FIT IN THE CURRENT BUCKET OPENS A NEW ONE
+def bucket_requests(email, expenses):
+    return [
+        pymongo.UpdateOne(
+            {
+                "user": email,
+                "month": bucket["month"],
+                "count": {"$lte": BUCKET_SIZE - bucket["count"]},
+            },
+            {
+                "$push": {"expenses": {"$each": bucket["expenses"]}},
+                "$inc": {"count": bucket["count"], "total": bucket["total"]},
+            },
+            upsert=True,
+        )
+        for bucket in make_buckets(email, expenses)
+    ]
+
+
+# OPAQUE POSITION OF AN EXPENSE IN THE HISTORY, "<ISO DATE>_<ID>"
+def page_key(expense):
+    return f"{expense['date'].isoformat()}_{expense['_id']}"
+
+
+def parse_page_key(key):
+    date, _, expenseId = key.partition("_")
+    return dt.fromisoformat(date), ObjectId(expenseId)
+
+
+def _position(expense):
+    return (expense["date"], expense["_id"])
+
+
+# ONE PAGE OF THE HISTORY OF A USER, NEWEST FIRST (BY DATE, THEN BY ID), AND THE
+# KEY OF THE NEXT PAGE (None ON THE LAST PAGE)
+#
+# THE BUCKETS ARE READ NEWEST MONTH FIRST THROUGH THE user_month INDEX, STARTING AT
+# THE MONTH OF THE "after" KEY, AND THE READ STOPS AS SOON AS THE PAGE IS FULL, SO
+# A PAGE DEEP IN THE HISTORY COSTS THE SAME AS THE FIRST ONE. ONLY THE MONTHS OF
+# ONE PAGE ARE SORTED, IN PYTHON
+def history_page(
+    collection,
+    email,
+    limit=20,
+    after=None,
+    category=None,
+    start=None,
+    end=None,
+    min_amount=None,
+    max_amount=None,
+    search=None,
+):
+    months = {}
+    if start is not None:
+        months["$gte"] = month_of(start)
+    if end is not None:
+        months["$lte"] = month_of(end)
+    if after is not None:
+        afterKey = parse_page_key(after)
+        months["$lte"] = min(months.get("$lte", "9999-99"), month_of(afterKey[0]))
+    query = {"user": email}
+    if months:
+        query["month"] = months
+
+    # SKIP THE BUCKETS WITHOUT ANY MATCHING EXPENSE INSIDE MONGODB
+    elemMatch = {}
+    if category is not None:
+        elemMatch["category"] = category
+    if min_amount is not None or max_amount is not None:
+        elemMatch["amount"] = {}
+        if min_amount is not None:
+            elemMatch["amount"]["$gte"] = min_amount
+        if max_amount is not None:
+            elemMatch["amount"]["$lte"] = max_amount
+    if elemMatch:
+        query["expenses"] = {"$elemMatch": elemMatch}
+    terms = []
+    if search:
+        query["$text"] = {"$search": search}
+        terms = [term.lower() for term in search.split()]
+
+    def matches(expense):
+        if after is not None and _position(expense) >= afterKey:
+            return False
+        if category is not None and expense["category"] != category:
+            return False
+        if start is not None and expense["date"] < start:
+            return False
+        if end is not None and expense["date"] > end:
+            return False
+        if min_amount is not None and expense["amount"] < min_amount:
+            return False
+        if max_amount is not None and expense["amount"] > max_amount:
+            return False
+        if terms and not any(term in expense["title"].lower() for term in terms):
+            return False
+        return True
+
+    page = []
+    month = None
+    monthExpenses = []
+    cursor = (
+        collection.find(query, {"_id": 0, "month": 1, "expenses": 1})
+        .sort("month", pymongo.DESCENDING)
+        .batch_size(8)
+    )
+    for bucket in cursor:
+        if bucket["month"] != month:
+            # A MONTH IS COMPLETE ONCE THE NEXT ONE STARTS
+            page.extend(sorted(monthExpenses, key=_position, reverse=True))
+            monthExpenses = []
+            month = bucket["month"]
+            if len(page) > limit:
+                break
+        monthExpenses.extend(e for e in bucket["expenses"] if matches(e))
+    else:
+        page.extend(sorted(monthExpenses, key=_position, reverse=True))
+    cursor.close()
+
+    if len(page) > limit:
+        return page[:limit], page_key(page[limit - 1])
+    return page, None
@@ -0,0 +1,121 @@
+# STREAMING EXPENSE EXPORTS
+# EVERY EXPORTER READS THE EXPENSES FROM A CURSOR AND YIELDS THE FILE PIECE BY PIECE,
+# SO THE MEMORY USED DOES NOT GROW WITH THE NUMBER OF EXPENSES
+import io
+import csv
+import json
+import expense_store
+
+# NUMBER OF ROWS WRITTEN BEFORE A PIECE OF THE FILE IS SENT
+CHUNK_ROWS = 1000
+
+# NUMBER OF ROWS IN ONE PARQUET ROW GROUP
+PARQUET_ROWS = 50000
+
+
+# ONE EXPORTED ROW OF AN EXPENSE
+def _row(expense):
+    return {
+        "date": expense_store.format_date(expense["date"]),
+        "amount": expense["amount"],
+        "title": expense["title"],
+        "category": expense["category"],
+    }
+
+
+# CSV FILE WITH A HEADER LINE
+def csv_stream(expenses, chunk_rows=CHUNK_ROWS):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=expense_store.EXPENSE_FIELDS)
+    writer.writeheader()
+    rows = 0
+    for expense in expenses:
+        writer.writerow(_row(expense))
+        rows += 1
+        if rows % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+# ONE JSON OBJECT PER LINE
+def ndjson_stream(expenses, chunk_rows=CHUNK_ROWS):
+    lines = []
+    for expense in expenses:
+        lines.append(json.dumps(_row(expense), ensure_ascii=False))
+        if len(lines) == chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+class _ChunkSink(io.RawIOBase):
+    # FILE LIKE OBJECT KEEPING ONLY THE BYTES WRITTEN SINCE THE LAST DRAIN
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# PARQUET FILE, ONE ROW GROUP PER BATCH OF EXPENSES (NEEDS PYARROW)
+def parquet_stream(expenses, batch_rows=PARQUET_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("date", pa.date32()),
+            ("amount", pa.int64()),
+            ("title", pa.string()),
+            ("category", pa.string()),
+        ]
+    )
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    columns = {name: [] for name in expense_store.EXPENSE_FIELDS}
+
+    def flush():
+        writer.write_table(pa.table(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+        return sink.drain()
+
+    for expense in expenses:
+        date = expense["date"]
+        if isinstance(date, str):
+            date = expense_store.parse_date(date)
+        columns["date"].append(date.date())
+        columns["amount"].append(expense["amount"])
+        columns["title"].append(expense["title"])
+        columns["category"].append(expense["category"])
+        if len(columns["date"]) == batch_rows:
+            yield flush()
+    if columns["date"]:
+        yield flush()
+    writer.close()
+    yield sink.drain()
+
+
+# FORMAT NAME -> (MIMETYPE, FILE EXTENSION, EXPORTER)
+FORMATS = {
+    "csv": ("text/csv", "csv", csv_stream),
+    "ndjson": ("application/x-ndjson", "ndjson", ndjson_stream),
+    "parquet": ("application/vnd.apache.parquet", "parquet", parquet_stream),
+}
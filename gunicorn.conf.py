@@ -0,0 +1,56 @@
+# GUNICORN SETTINGS FOR THE PRODUCTION SERVER
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# WEB_WORKER_CLASS=gevent (NEEDS "pip install -r requirements-gevent.txt") TURNS
+# EVERY REQUEST INTO A GREENLET: PYMONGO AND SMTPLIB SOCKETS BECOME COOPERATIVE, SO
+# A SLOW DATABASE OR SMTP CALL WAITS WITHOUT HOLDING A WORKER THREAD. THE LOG,
+# MAILER, CACHE AND RECURRING THREADS BECOME GREENLETS TOO, THE PASSWORD HASHES
+# STILL RUN IN THEIR SPAWNED PROCESSES (A REQUEST WAITING FOR ONE YIELDS)
+import os
+import multiprocessing
+
+# ADDRESS TO LISTEN ON
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+
+# ONE PROCESS PER CORE PLUS ONE, THE USUAL GUNICORN STARTING POINT
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+
+# "gthread" BY DEFAULT, "gevent" FOR COOPERATIVE I/O
+worker_class = os.environ.get("WEB_WORKER_CLASS", "gthread")
+if worker_class == "gevent":
+    # PATCH BEFORE THE APP IS IMPORTED: WITH WEB_PRELOAD=1 THE MASTER IMPORTS IT
+    # (AND PYMONGO'S ssl) BEFORE THE WORKER WOULD PATCH, AND THE THREADS STARTED IN
+    # post_fork MUST ALREADY BE GREENLETS
+    from gevent import monkey
+
+    monkey.patch_all()
+
+# THREADS PER PROCESS FOR gthread, OPEN CONNECTIONS PER PROCESS FOR gevent
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_connections = int(os.environ.get("WEB_WORKER_CONNECTIONS", 1000))
+
+# KILL A WORKER STUCK ON ONE REQUEST, KEEP IDLE CONNECTIONS OPEN A LITTLE
+timeout = int(os.environ.get("WEB_TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
+
+# RECYCLE THE WORKERS NOW AND THEN SO A SLOW LEAK NEVER GROWS UNBOUNDED
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+
+# WEB_PRELOAD=1 IMPORTS THE APP ONCE IN THE MASTER AND FORKS THE WORKERS FROM IT
+preload_app = os.environ.get("WEB_PRELOAD") == "1"
+
+# ACCESS LOG ON STDOUT, ERRORS ON STDERR
+accesslog = "-"
+errorlog = "-"
+
+
+# A PRELOADED MASTER ONLY WARMED THE APP UP, EVERY WORKER CONNECTS TO MONGODB AND
+# STARTS ITS LOG THREAD ITSELF (CONNECTIONS AND THREADS DO NOT SURVIVE A FORK)
+def post_fork(server, worker):
+    if preload_app:
+        from application import create_app
+
+        create_app()
@@ -0,0 +1,297 @@
+# BULK EXPENSE IMPORT
+# THE UPLOAD IS PARSED AND VALIDATED ROW BY ROW, DUPLICATES ARE DROPPED AND THE
+# EXPENSES ARE WRITTEN IN BATCHES: ONE bulk_write FILLING THE CURRENT BUCKET OF
+# EVERY MONTH (A FULL ONE OPENS A NEW BUCKET, LIKE add_expense) AND ONE UPDATE OF
+# "spent" AND THE LAST FIVE EXPENSES PER BATCH INSTEAD OF TWO ROUND TRIPS PER EXPENSE
+#
+# THE UPDATE OF THE USER IS KEYED ON THE FINGERPRINTS OF THE BATCH AND WRITTEN
+# BEFORE THE BUCKETS: IMPORTING THE SAME FILE AGAIN AFTER A FAILED WRITE SKIPS THE
+# TOTALS ALREADY COUNTED AND ONLY WRITES THE EXPENSES THE BUCKETS ARE MISSING.
+# DUPLICATES ARE FOUND INSIDE A BATCH AND AGAINST THE BUCKETS (user_fingerprint
+# INDEX), SO AN EARLIER BATCH OF THE SAME UPLOAD COUNTS AS ALREADY IMPORTED
+#
+#   python importer.py EMAIL FILE [--format csv|json] [--batch-size 1000]
+import io
+import csv
+import json
+import time
+import hashlib
+import logging
+import argparse
+import database
+import expense_store
+import user_store
+import rollups
+
+# NUMBER OF EXPENSES WRITTEN PER BATCH
+BATCH_SIZE = 1000
+
+# NUMBER OF INVALID ROWS REPORTED BACK TO THE USER
+MAX_ERRORS = 20
+
+# SIZE OF THE PIECES READ FROM A JSON ARRAY
+READ_SIZE = 64 * 1024
+
+
+# ROWS OF A CSV FILE WITH A HEADER LINE
+def parse_csv(stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    yield from csv.DictReader(text)
+
+
+# ROWS OF A JSON ARRAY OR OF A NEWLINE DELIMITED JSON FILE
+def parse_json(stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    buffer = text.read(READ_SIZE)
+    stripped = buffer.lstrip()
+    if not stripped.startswith("["):
+        # NEWLINE DELIMITED JSON
+        rest = buffer + text.readline()
+        for line in rest.splitlines():
+            if line.strip():
+                yield json.loads(line)
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+        return
+
+    # JSON ARRAY: DECODE ONE ELEMENT AT A TIME FROM A ROLLING BUFFER
+    decoder = json.JSONDecoder()
+    buffer = stripped[1:]
+    position = 0
+    eof = False
+    while True:
+        # SKIP THE SEPARATORS BETWEEN THE ELEMENTS
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # THE ELEMENT IS CUT AT THE END OF THE BUFFER, READ THE NEXT PIECE
+            if eof:
+                raise ValueError("Invalid JSON Array")
+            chunk = text.read(READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+PARSERS = {"csv": parse_csv, "json": parse_json}
+
+
+# TURN A PARSED ROW INTO AN EXPENSE OR RAISE ValueError
+def validate(row):
+    if not isinstance(row, dict):
+        raise ValueError("Row Is Not An Object")
+    title = str(row.get("title") or "").strip()
+    category = str(row.get("category") or "").strip()
+    date = str(row.get("date") or "").strip()
+    if len(title) == 0 or len(category) == 0 or len(date) == 0:
+        raise ValueError("Missing Title, Category Or Date")
+    amount = int(str(row.get("amount")).strip())
+    expense = expense_store.new_expense(
+        expense_store.parse_date(date), amount, title, category
+    )
+    expense["fp"] = fingerprint(expense)
+    return expense
+
+
+# SAME DATE, AMOUNT, TITLE AND CATEGORY MEANS THE SAME EXPENSE
+def fingerprint(expense):
+    key = "|".join(
+        [
+            expense_store.format_date(expense["date"]),
+            str(expense["amount"]),
+            expense["title"].lower(),
+            expense["category"].lower(),
+        ]
+    )
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+# DID THE USER IMPORT ANY EXPENSES BEFORE
+def _has_imports(expenseCollection, email):
+    return (
+        expenseCollection.find_one(
+            {"user": email, "expenses.fp": {"$exists": True}}, {"_id": 1}
+        )
+        is not None
+    )
+
+
+# FINGERPRINTS OF THE BATCH THAT WERE ALREADY IMPORTED BEFORE
+def _existing(expenseCollection, email, fps):
+    existing = set()
+    cursor = expenseCollection.find(
+        {"user": email, "expenses.fp": {"$in": fps}}, {"_id": 0, "expenses.fp": 1}
+    )
+    for bucket in cursor:
+        existing.update(e.get("fp") for e in bucket["expenses"])
+    return existing.intersection(fps)
+
+
+# IDEMPOTENCY KEY OF A BATCH: THE SAME ROWS GIVE THE SAME KEY
+def batch_key(batch):
+    digest = hashlib.sha1("".join(sorted(e["fp"] for e in batch)).encode())
+    return f"import:{digest.hexdigest()}"
+
+
+# DATE ("%Y-%m-%d") OF THE NEWEST OF THE LAST FIVE EXPENSES OF THE USER
+def _newest_recent(userCollection, email):
+    summary = user_store.find_summary(userCollection, email)
+    dates = [e["date"] for e in (summary or {}).get("expenses", [])]
+    return max(dates, default="")
+
+
+# WRITE ONE BATCH AND RETURN THE NUMBER OF EXPENSES WRITTEN AND THE DATE OF THE
+# NEWEST OF THE LAST FIVE EXPENSES AFTER IT. ONLY ROWS AS NEW AS "newest" GO INTO
+# THE LAST FIVE, AN OLD STATEMENT DOES NOT PUSH OUT THE USER'S LATEST EXPENSES
+def _write_batch(
+    userCollection,
+    expenseCollection,
+    email,
+    batch,
+    check_existing=True,
+    rollupCollection=None,
+    newest="",
+):
+    key = batch_key(batch)
+    if check_existing:
+        existing = _existing(expenseCollection, email, [e["fp"] for e in batch])
+        batch = [e for e in batch if e["fp"] not in existing]
+    if not batch:
+        return 0, newest
+    recent = sorted(
+        (e for e in batch if expense_store.format_date(e["date"]) >= newest),
+        key=lambda e: e["date"],
+    )[-user_store.RECENT_SIZE :]
+    userCollection.bulk_write(
+        [
+            user_store.totals_request(
+                email,
+                spent=sum(e["amount"] for e in batch),
+                recent=[expense_store.public(e) for e in recent],
+                key=key,
+            )
+        ]
+    )
+    expenseCollection.bulk_write(expense_store.bucket_requests(email, batch), ordered=False)
+    if rollupCollection is not None:
+        rollups.record(rollupCollection, email, batch)
+    if recent:
+        newest = expense_store.format_date(recent[-1]["date"])
+    return len(batch), newest
+
+
+# IMPORT THE ROWS FOR THE USER AND RETURN THE COUNTS
+def import_expenses(
+    userCollection,
+    expenseCollection,
+    email,
+    rows,
+    batch_size=BATCH_SIZE,
+    on_progress=None,
+    rollupCollection=None,
+):
+    result = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    # FINGERPRINTS OF THE CURRENT BATCH ONLY, THE EARLIER BATCHES ARE IN THE BUCKETS
+    seen = set()
+    batch = []
+    # A FIRST IMPORT HAS NOTHING TO BE A DUPLICATE OF IN THE DATABASE UNTIL ITS
+    # FIRST BATCH IS WRITTEN
+    state = {
+        "check_existing": _has_imports(expenseCollection, email),
+        "newest": _newest_recent(userCollection, email),
+    }
+
+    def flush():
+        written, state["newest"] = _write_batch(
+            userCollection,
+            expenseCollection,
+            email,
+            batch,
+            state["check_existing"],
+            rollupCollection,
+            state["newest"],
+        )
+        state["check_existing"] = state["check_existing"] or written > 0
+        result["imported"] += written
+        result["duplicates"] += len(batch) - written
+        batch.clear()
+        seen.clear()
+        if on_progress:
+            on_progress(result)
+
+    try:
+        for line, row in enumerate(rows, start=1):
+            result["read"] += 1
+            try:
+                expense = validate(row)
+            except (ValueError, TypeError) as e:
+                result["invalid"] += 1
+                if len(result["errors"]) < MAX_ERRORS:
+                    result["errors"].append(f"Row {line}: {e}")
+                continue
+            # DUPLICATES INSIDE THE SAME BATCH
+            if expense["fp"] in seen:
+                result["duplicates"] += 1
+                continue
+            seen.add(expense["fp"])
+            batch.append(expense)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        # EVERY BATCH BUMPED "rev" BEFORE ITS BUCKETS WERE WRITTEN, A LAST BUMP SO
+        # NOTHING CACHED IN BETWEEN (THE ANALYTICS HISTORY) IS SERVED AFTERWARDS
+        if result["imported"]:
+            user_store.touch(userCollection, email)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import expenses for a user")
+    parser.add_argument("email")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=sorted(PARSERS), default=None)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--mongo-url", default=None)
+    args = parser.parse_args()
+
+    fileFormat = args.format or ("json" if args.file.endswith("json") else "csv")
+    db = database.get_database(args.mongo_url)
+    database.bootstrap(db)
+    start = time.perf_counter()
+
+    def progress(result):
+        print(
+            f"\rRead: {result['read']} Imported: {result['imported']} "
+            f"Duplicates: {result['duplicates']} Invalid: {result['invalid']}",
+            end="",
+            flush=True,
+        )
+
+    with open(args.file, "rb") as stream:
+        result = import_expenses(
+            db[user_store.COLLECTION],
+            db[expense_store.COLLECTION],
+            args.email,
+            PARSERS[fileFormat](stream),
+            batch_size=args.batch_size,
+            on_progress=progress,
+            rollupCollection=db[rollups.COLLECTION],
+        )
+    progress(result)
+    print(f"\nFinished In {time.perf_counter() - start:.2f}s")
+    for error in result["errors"]:
+        print(error)
+    logging.info(f"Imported Expenses For {args.email} : {result}")
+
+
+if __name__ == "__main__":
+    main()
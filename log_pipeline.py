@@ -0,0 +1,202 @@
+# NON BLOCKING LOGGING
+# A REQUEST ONLY PUTS THE LOG RECORD ON A QUEUE. A BACKGROUND LISTENER THREAD
+# WRITES THE RECORDS AS ONE JSON OBJECT PER LINE INTO THE LOG FILE.
+# HIGH VOLUME INFO LINES OF THE PAGE LOADS ARE SAMPLED PER ROUTE AND LONG MESSAGES
+# ARE CUT, SO A BIG PAYLOAD NEVER ENDS UP IN THE LOG AS A WHOLE
+#
+# ALL THE GUNICORN WORKERS APPEND TO THE SAME FILE AND NONE OF THEM ROTATES IT:
+# logrotate (OR THE PLATFORM) MOVES IT AWAY AND EVERY WORKER REOPENS IT. A WORKER
+# ROTATING A SHARED FILE WOULD RENAME IT UNDER THE OTHERS AND LOSE THEIR LINES, SO
+# WITH LOG_MAX_BYTES OR LOG_ROTATE_WHEN EVERY PROCESS WRITES AND ROTATES ITS OWN
+# FILE (Logs.<pid>.log)
+#
+# CONFIGURED FROM THE ENV FILE:
+#   LOG_FILE          PATH OF THE LOG FILE ("-" WRITES TO STDERR)
+#   LOG_LEVEL         MINIMUM LEVEL (INFO)
+#   LOG_MAX_BYTES     ROTATE THE FILE OF THE PROCESS OVER THIS SIZE
+#   LOG_ROTATE_WHEN   ROTATE IT BY TIME INSTEAD ("midnight", "H", ...)
+#   LOG_BACKUPS       NUMBER OF ROTATED FILES KEPT PER PROCESS (5)
+#   LOG_MAX_LENGTH    LONGEST MESSAGE KEPT IN CHARACTERS (2048)
+#   LOG_SAMPLE        ROUTE=RATE PAIRS, E.G. "login=0.1,homePage=0.05"
+import os
+import sys
+import json
+import copy
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from flask import g, has_request_context, request
+
+# DEFAULT LOG FILE OF THE APP
+LOG_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "allLog", "Logs.log"
+)
+
+# LONGEST MESSAGE WRITTEN TO THE LOG
+MAX_LENGTH = 2048
+
+# SHARE OF THE PAGE LOAD (GET) REQUESTS WHOSE INFO LINES ARE KEPT, PER ROUTE
+SAMPLE_RATES = {
+    "login": 0.1,
+    "register": 0.1,
+    "homePage": 0.1,
+    "forgot_password": 0.1,
+    "api_totals": 0.1,
+}
+
+# THE RUNNING LISTENER (ONE PER PROCESS)
+_listener = None
+
+
+# "login=0.1,homePage=0.05" -> {"login": 0.1, "homePage": 0.05}
+def parse_rates(text):
+    rates = {}
+    for pair in (text or "").split(","):
+        if "=" in pair:
+            route, rate = pair.split("=", 1)
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+class RequestFilter(logging.Filter):
+    # ADDS THE ROUTE OF THE CURRENT REQUEST TO THE RECORD AND DROPS THE INFO LINES
+    # OF THE PAGE LOADS THAT WERE NOT SAMPLED. THE DECISION IS MADE ONCE PER
+    # REQUEST, SO A SAMPLED REQUEST KEEPS ALL ITS LINES
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = SAMPLE_RATES if rates is None else rates
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        record.route = request.endpoint
+        record.method = request.method
+        if record.levelno > logging.INFO or request.method != "GET":
+            return True
+        rate = self.rates.get(request.endpoint)
+        if rate is None:
+            return True
+        if "log_sampled" not in g:
+            g.log_sampled = random.random() < rate
+        return g.log_sampled
+
+
+class TruncatingQueueHandler(logging.handlers.QueueHandler):
+    # BUILDS THE MESSAGE IN THE CALLING THREAD (SO LATER CHANGES TO THE ARGUMENTS
+    # DO NOT SHOW UP IN THE LOG) AND CUTS IT. THE JSON ENCODING AND THE FILE WRITE
+    # HAPPEN IN THE LISTENER THREAD
+    def __init__(self, log_queue, max_length=MAX_LENGTH):
+        super().__init__(log_queue)
+        self.max_length = max_length
+
+    def prepare(self, record):
+        message = record.getMessage()
+        record = copy.copy(record)
+        if len(message) > self.max_length:
+            record.truncated = len(message)
+            message = message[: self.max_length]
+        record.msg = message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    # ONE JSON OBJECT PER LINE
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ["route", "method", "truncated"]:
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+# "allLog/Logs.log" -> "allLog/Logs.<pid>.log"
+def process_path(path):
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{extension}"
+
+
+# FILE HANDLER OF THE SHARED FILE, REOPENED WHEN logrotate MOVED IT. WITH
+# "max_bytes" OR "when" A FILE OF THIS PROCESS ROTATING BY SIZE OR BY TIME
+def file_handler(path, max_bytes=None, when=None, backups=5):
+    if path == "-":
+        return logging.StreamHandler(sys.stderr)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if not max_bytes and not when:
+        return logging.handlers.WatchedFileHandler(path, encoding="utf-8")
+    path = process_path(path)
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backups, encoding="utf-8"
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+    )
+
+
+# SEND THE ROOT LOGGER THROUGH THE QUEUE (ONLY ONCE PER PROCESS)
+def setup(
+    path=None,
+    level=None,
+    max_bytes=None,
+    when=None,
+    backups=None,
+    max_length=None,
+    rates=None,
+):
+    global _listener
+    if _listener is not None:
+        return _listener
+    handler = file_handler(
+        path or os.environ.get("LOG_FILE", LOG_FILE),
+        max_bytes=max_bytes or int(os.environ.get("LOG_MAX_BYTES", 0)),
+        when=when or os.environ.get("LOG_ROTATE_WHEN"),
+        backups=backups or int(os.environ.get("LOG_BACKUPS", 5)),
+    )
+    handler.setFormatter(JsonFormatter())
+    if rates is None:
+        rates = dict(SAMPLE_RATES, **parse_rates(os.environ.get("LOG_SAMPLE")))
+
+    log_queue = queue.SimpleQueue()
+    queueHandler = TruncatingQueueHandler(
+        log_queue, max_length or int(os.environ.get("LOG_MAX_LENGTH", MAX_LENGTH))
+    )
+    queueHandler.addFilter(RequestFilter(rates))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(queueHandler)
+    root.setLevel(level or os.environ.get("LOG_LEVEL", "INFO"))
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown)
+    return _listener
+
+
+# WRITE WHAT IS STILL ON THE QUEUE AND STOP THE LISTENER
+def shutdown():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        logging.getLogger().handlers.clear()
+        _listener = None
@@ -0,0 +1,181 @@
+# OUTBOUND MAIL QUEUE
+# REQUESTS ONLY PUT THE MESSAGE ON A QUEUE. A BACKGROUND THREAD KEEPS ONE SMTP
+# CONNECTION OPEN, SENDS THE QUEUED MESSAGES IN BATCHES OVER IT AND RETRIES A
+# FAILED MESSAGE WITH AN EXPONENTIAL BACKOFF, RECONNECTING WHEN NEEDED
+# (smtplib AND email ARE ONLY IMPORTED WHEN THE FIRST MAIL IS SENT)
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+
+
+class Mailer:
+    def __init__(
+        self,
+        host="smtp.gmail.com",
+        port=587,
+        username=None,
+        password=None,
+        sender=None,
+        starttls=True,
+        batch_size=20,
+        max_retries=3,
+        backoff=1.0,
+        idle_timeout=60,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.starttls = starttls
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # MAILER CONFIGURED FROM THE ENV FILE
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.environ.get("SMTP_HOST", "smtp.gmail.com"),
+            port=int(os.environ.get("SMTP_PORT", 587)),
+            username=os.environ.get("sender_email"),
+            password=os.environ.get("sender_password"),
+            starttls=os.environ.get("SMTP_STARTTLS", "1") != "0",
+            batch_size=int(os.environ.get("SMTP_BATCH_SIZE", 20)),
+            max_retries=int(os.environ.get("SMTP_MAX_RETRIES", 3)),
+        )
+
+    # PUT A MESSAGE ON THE QUEUE AND RETURN RIGHT AWAY
+    # "check" (OPTIONAL) RUNS ON THE SENDER THREAD, THE MESSAGE IS DROPPED WHEN IT
+    # RETURNS FALSE (E.G. NO USER WITH THAT EMAIL), SO THE REQUEST DOES NOT WAIT FOR IT
+    def enqueue(self, to, subject, body, check=None):
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
+        message = MIMEMultipart()
+        message["From"] = f"ExpenseTracker <{self.sender}>"
+        message["To"] = to
+        message["Subject"] = subject
+        message.attach(MIMEText(body, "plain"))
+        self._start()
+        self._queue.put((to, message.as_string(), check))
+
+    # NUMBER OF MESSAGES WAITING TO BE SENT
+    def pending(self):
+        return self._queue.qsize()
+
+    # WAIT UNTIL EVERY QUEUED MESSAGE WAS SENT OR GAVE UP
+    def join(self):
+        self._queue.join()
+
+    # SEND WHAT IS LEFT AND STOP THE BACKGROUND THREAD
+    def stop(self, timeout=10):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # START THE SENDER THREAD ON FIRST USE (AFTER GUNICORN FORKED THE WORKER)
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="mailer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                # NOTHING TO SEND FOR A WHILE, DO NOT HOLD THE CONNECTION OPEN
+                self._disconnect()
+                continue
+            if item is None:
+                self._queue.task_done()
+                self._disconnect()
+                return
+            # TAKE WHATEVER ELSE IS ALREADY WAITING, UP TO ONE BATCH
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            for to, text, check in batch:
+                if check is None or self._check(to, check):
+                    self._send(to, text)
+                self._queue.task_done()
+            if stop:
+                self._disconnect()
+                return
+
+    def _check(self, to, check):
+        try:
+            if check():
+                return True
+            logging.info(f"Mail To {to} Dropped By Its Check")
+        except Exception as e:
+            logging.error(f"Mail To {to} Dropped, Its Check Failed : {e}")
+        return False
+
+    # SEND ONE MESSAGE, RECONNECTING AND BACKING OFF ON FAILURE
+    def _send(self, to, text):
+        import smtplib
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._connect().sendmail(self.sender, to, text)
+                self.sent += 1
+                logging.info(f"Mail Sent To Email : {to}")
+                return True
+            except (smtplib.SMTPException, OSError) as e:
+                logging.info(f"Failed To Send The Email To {to} (Attempt {attempt + 1}) : {e}")
+                self._disconnect()
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff * 2**attempt)
+        self.failed += 1
+        logging.error(f"Giving Up Sending The Email To {to}")
+        return False
+
+    # OPEN THE SMTP CONNECTION ONCE AND REUSE IT FOR THE NEXT MESSAGES
+    def _connect(self):
+        import smtplib
+
+        if self._server is None:
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+            if self.starttls:
+                # SECURE THE CONNECTION
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+            self._server = server
+        return self._server
+
+    def _disconnect(self):
+        import smtplib
+
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
@@ -0,0 +1,266 @@
+# REQUEST, DATABASE AND FUNCTION TIMINGS
+# EVERY REQUEST IS TIMED PER ROUTE, EVERY MONGODB COMMAND IS TIMED THROUGH A PYMONGO
+# COMMAND LISTENER AND COUNTED FOR THE REQUEST THAT SENT IT, AND FUNCTIONS MARKED
+# WITH @timed ARE TIMED BY NAME. THE NUMBERS ARE SERVED IN THE PROMETHEUS TEXT
+# FORMAT ON /metrics AND A REQUEST SLOWER THAN SLOW_REQUEST_MS IS LOGGED WITH THE
+# DATABASE COMMANDS IT RAN
+#
+# WITH PROFILING=1 A REQUEST SENT WITH THE HEADER "X-Profile: 1" IS RUN UNDER
+# cProfile ("X-Profile: pyinstrument" USES PYINSTRUMENT IF INSTALLED) AND THE
+# PROFILE IS RETURNED INSTEAD OF THE PAGE
+#
+# THE NUMBERS ARE KEPT PER PROCESS, EVERY GUNICORN WORKER SERVES ITS OWN (LABELLED
+# WITH ITS PID)
+import io
+import os
+import time
+import logging
+import threading
+import functools
+from bisect import bisect_left
+from pymongo import monitoring
+from flask import Response, g, has_request_context, request, abort, current_app
+
+# A REQUEST SLOWER THAN THIS IS LOGGED WITH ITS DATABASE COMMANDS
+SLOW_REQUEST_MS = 500
+
+# NUMBER OF DATABASE COMMANDS KEPT FOR THE SLOW REQUEST TRACE
+TRACE_SIZE = 50
+
+# UPPER BOUNDS (SECONDS) OF THE LATENCY BUCKETS
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# UPPER BOUNDS OF THE DATABASE COMMANDS PER REQUEST BUCKETS
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    # CUMULATIVE BUCKET COUNTS, SUM AND COUNT PER LABEL SET
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = list(labels) + ["pid"]
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        key = tuple(labels) + (os.getpid(),)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(c), s, n) for key, (c, s, n) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            labels = _labels(self.labels, key)
+            cumulative = 0
+            for bound, bucketCount in zip(self.buckets, counts):
+                cumulative += bucketCount
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = list(labels) + ["pid"]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels):
+        key = tuple(labels) + (os.getpid(),)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, key)}}} {value}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time spent serving a request",
+    ["route", "method", "status"],
+)
+REQUEST_DB_CALLS = Histogram(
+    "http_request_mongo_commands",
+    "MongoDB commands sent by one request",
+    ["route"],
+    buckets=COUNT_BUCKETS,
+)
+DB_SECONDS = Histogram(
+    "mongo_command_duration_seconds",
+    "Time spent in one MongoDB command",
+    ["command", "outcome"],
+)
+FUNCTION_SECONDS = Histogram(
+    "function_duration_seconds",
+    "Time spent in an instrumented function",
+    ["function"],
+)
+SLOW_REQUESTS = Counter(
+    "http_slow_requests_total",
+    "Requests slower than SLOW_REQUEST_MS",
+    ["route"],
+)
+SUMMARY_CACHE_LOOKUPS = Counter(
+    "summary_cache_lookups_total",
+    "Per user cache lookups by cache and result (hit, miss, stale, expired)",
+    ["cache", "result"],
+)
+SUMMARY_CACHE_LAG = Histogram(
+    "summary_cache_invalidation_lag_seconds",
+    "Time from a write of a cached user to its invalidation in this worker",
+    [],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+METRICS = [
+    REQUEST_SECONDS,
+    REQUEST_DB_CALLS,
+    DB_SECONDS,
+    FUNCTION_SECONDS,
+    SLOW_REQUESTS,
+    SUMMARY_CACHE_LOOKUPS,
+    SUMMARY_CACHE_LAG,
+]
+
+
+class CommandTimer(monitoring.CommandListener):
+    # TIMES EVERY MONGODB COMMAND AND ADDS IT TO THE REQUEST THAT SENT IT
+    # (PYMONGO CALLS THE LISTENER IN THE THREAD THAT RUNS THE COMMAND)
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "success")
+
+    def failed(self, event):
+        self._record(event, "failure")
+
+    def _record(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        DB_SECONDS.observe(seconds, event.command_name, outcome)
+        if has_request_context() and "db_calls" in g:
+            g.db_calls += 1
+            if len(g.db_trace) < TRACE_SIZE:
+                g.db_trace.append(f"{event.command_name}:{seconds * 1000:.1f}ms")
+
+
+# TIME A FUNCTION, USED AS @timed OR @timed("name")
+def timed(name=None):
+    def decorate(fn, label):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                FUNCTION_SECONDS.observe(time.perf_counter() - start, label)
+
+        return wrapper
+
+    if callable(name):
+        return decorate(name, name.__name__)
+    return lambda fn: decorate(fn, name or fn.__name__)
+
+
+# ALL THE METRICS IN THE PROMETHEUS TEXT FORMAT
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _before_request():
+    g.request_start = time.perf_counter()
+    g.db_calls = 0
+    g.db_trace = []
+    mode = request.headers.get("X-Profile")
+    if mode and current_app.config["PROFILING"]:
+        if mode == "pyinstrument":
+            from pyinstrument import Profiler
+
+            g.profiler = Profiler()
+            g.profiler.start()
+        else:
+            import cProfile
+
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+
+def _after_request(response):
+    if "request_start" not in g:
+        return response
+    seconds = time.perf_counter() - g.request_start
+    route = request.endpoint or "unknown"
+    REQUEST_SECONDS.observe(seconds, route, request.method, response.status_code)
+    REQUEST_DB_CALLS.observe(g.db_calls, route)
+    response.headers["Server-Timing"] = (
+        f'app;dur={seconds * 1000:.1f}, db;desc="{g.db_calls} mongo commands"'
+    )
+    if seconds * 1000 >= current_app.config["SLOW_REQUEST_MS"]:
+        SLOW_REQUESTS.inc(route)
+        logging.warning(
+            f"Slow Request {request.method} {request.path} : {seconds * 1000:.0f}ms, "
+            f"{g.db_calls} Mongo Commands {g.db_trace}"
+        )
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        return _profile_response(profiler)
+    return response
+
+
+# THE PROFILE OF THE REQUEST INSTEAD OF THE PAGE
+def _profile_response(profiler):
+    if hasattr(profiler, "disable"):
+        import pstats
+
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        return Response(out.getvalue(), mimetype="text/plain")
+    profiler.stop()
+    return Response(profiler.output_html(), mimetype="text/html")
+
+
+def _metrics():
+    token = current_app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        abort(401)
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+# REGISTER THE HOOKS AND THE /metrics ROUTE ON THE APP
+# METRICS_TOKEN (IF SET) MUST BE SENT AS "Authorization: Bearer <token>"
+def init_metrics(app):
+    app.config.setdefault("PROFILING", os.environ.get("PROFILING", "0") == "1")
+    app.config.setdefault(
+        "SLOW_REQUEST_MS", float(os.environ.get("SLOW_REQUEST_MS", SLOW_REQUEST_MS))
+    )
+    app.config.setdefault("METRICS_TOKEN", os.environ.get("METRICS_TOKEN"))
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", _metrics)
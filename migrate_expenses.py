@@ -0,0 +1,154 @@
+# ONE SHOT MIGRATION OF THE EMBEDDED "expenses" ARRAY INTO THE EXPENSE BUCKETS
+#
+#   python migrate_expenses.py            MIGRATE EVERY USER STILL HOLDING AN EXPENSES ARRAY
+#   python migrate_expenses.py --dry-run  ONLY REPORT WHAT WOULD BE MOVED
+#
+# THE OLD "%Y-%m-%d" STRING DATES ARE SAVED AS REAL DATES, BOTH FOR THE MOVED
+# EXPENSES AND FOR BUCKETS WRITTEN BEFORE THE DATES WERE CONVERTED
+#
+# EVERY MIGRATED BUCKET GETS A FIXED _id (EMAIL:MONTH:N) SO RE-RUNNING AFTER A CRASH
+# REPLACES THE HALF WRITTEN BUCKETS INSTEAD OF DUPLICATING THE EXPENSES
+#
+# IT CAN RUN WHILE THE APP IS UP: THE LAST FIVE EXPENSES THE APP ALREADY SAVED ON THE
+# USER STAY THE NEWEST ONES, AND A USER WITH A BAD DATE OR AMOUNT IN ITS ARRAY IS
+# LOGGED AND LEFT AS IT IS WHILE THE OTHERS ARE MIGRATED
+import argparse
+import logging
+import pymongo
+from bson import ObjectId
+import database
+import expense_store
+import rollups
+import user_store
+
+
+# MOVE THE EXPENSES OF ONE USER INTO THE BUCKET COLLECTION
+def migrate_user(userCollection, expenseCollection, user, dry_run=False):
+    email = user["email"]
+    expenses = []
+    for item in user.get("expenses", []):
+        date = item["date"]
+        if isinstance(date, str):
+            date = expense_store.parse_date(date)
+        expense = expense_store.new_expense(
+            date, item["amount"], item["title"], item["category"]
+        )
+        # KEEP THE ID IF THE EXPENSE ALREADY HAD ONE
+        expense["_id"] = item.get("_id", ObjectId())
+        expenses.append(expense)
+    buckets = expense_store.make_buckets(email, expenses)
+    if dry_run:
+        return len(expenses), len(buckets)
+
+    # NUMBER THE BUCKETS OF EVERY MONTH TO BUILD A STABLE ID
+    seq = {}
+    requests = []
+    for bucket in buckets:
+        n = seq.get(bucket["month"], 0)
+        seq[bucket["month"]] = n + 1
+        bucket["_id"] = f"{email}:{bucket['month']}:{n}"
+        requests.append(
+            pymongo.ReplaceOne({"_id": bucket["_id"]}, bucket, upsert=True)
+        )
+    if requests:
+        expenseCollection.bulk_write(requests, ordered=False)
+
+    # KEEP THE LAST FIVE EXPENSES (IN INSERTION ORDER) FOR THE HOME PAGE, IN FRONT
+    # OF THE ONES THE APP ADDED SINCE IT WRITES TO THE BUCKETS
+    recent = [expense_store.public(e) for e in expenses[-user_store.RECENT_SIZE :]]
+    userCollection.update_one(
+        {"_id": user["_id"]},
+        {
+            "$push": {
+                "recent": {
+                    "$each": recent,
+                    "$position": 0,
+                    "$slice": -user_store.RECENT_SIZE,
+                }
+            },
+            "$unset": {"expenses": ""},
+        },
+    )
+    return len(expenses), len(buckets)
+
+
+# TURN THE STRING DATES LEFT IN THE BUCKETS INTO REAL DATES INSIDE MONGODB
+def convert_bucket_dates(expenseCollection):
+    result = expenseCollection.update_many(
+        {"expenses.date": {"$type": "string"}},
+        [
+            {
+                "$set": {
+                    "expenses": {
+                        "$map": {
+                            "input": "$expenses",
+                            "in": {
+                                "$mergeObjects": [
+                                    "$$this",
+                                    {
+                                        "date": {
+                                            "$cond": [
+                                                {"$eq": [{"$type": "$$this.date"}, "string"]},
+                                                {
+                                                    "$dateFromString": {
+                                                        "dateString": "$$this.date",
+                                                        "format": expense_store.DATE_FORMAT,
+                                                    }
+                                                },
+                                                "$$this.date",
+                                            ]
+                                        }
+                                    },
+                                ]
+                            },
+                        }
+                    }
+                }
+            }
+        ],
+    )
+    return result.modified_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move embedded expenses into buckets")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    db = database.get_database(args.mongo_url)
+    database.bootstrap(db)
+    userCollection = db["User"]
+    expenseCollection = db[expense_store.COLLECTION]
+
+    users = expenses = buckets = failed = 0
+    for user in userCollection.find(
+        {"expenses": {"$exists": True}}, {"email": 1, "expenses": 1}
+    ):
+        try:
+            moved, created = migrate_user(
+                userCollection, expenseCollection, user, dry_run=args.dry_run
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            # A BAD LEGACY EXPENSE, NOTHING OF THIS USER WAS WRITTEN YET
+            failed += 1
+            logging.error(f"Expenses Of {user['email']} Not Migrated : {e!r}")
+            continue
+        users += 1
+        expenses += moved
+        buckets += created
+        logging.info(f"Migrated {moved} Expenses Of {user['email']}")
+    converted = 0 if args.dry_run else convert_bucket_dates(expenseCollection)
+    if not args.dry_run:
+        # BACKFILL THE ROLLUPS OF EVERY USER FROM THE MIGRATED BUCKETS
+        rollupCollection = db[rollups.COLLECTION]
+        for email in expenseCollection.distinct("user"):
+            rollups.rebuild(expenseCollection, rollupCollection, email)
+    print(
+        f"Users: {users} Expenses: {expenses} Buckets: {buckets} "
+        f"Converted Buckets: {converted} Failed Users: {failed}"
+    )
+
+
+if __name__ == "__main__":
+    main()
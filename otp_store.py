@@ -0,0 +1,162 @@
+# ONE TIME PASSWORDS OF THE PASSWORD RESET
+# ONE DOCUMENT PER EMAIL IN THEIR OWN COLLECTION INSTEAD OF A FIELD ON THE USER
+#   {"email": EMAIL, "code": HMAC OF THE CODE, "attempts": N, "issued": DATETIME,
+#    "expires": DATETIME}
+# ONLY THE HMAC OF THE CODE IS SAVED, KEYED ON SECRET_KEY: EVERY WORKER MUST HAVE
+# THE SAME KEY TO CHECK A CODE ANOTHER ONE SAVED (THE APP TURNS THE RESET OFF
+# WITHOUT IT), AND A COPY OF THE COLLECTION ALONE CAN NOT BE TRIED AGAINST THE
+# 10**6 CODES. A TTL INDEX ON "expires" LETS MONGODB DELETE THE EXPIRED CODES
+# ITSELF; ITS TTL MONITOR ONLY RUNS ABOUT ONCE A MINUTE, SO THE CHECK ALSO FILTERS
+# ON "expires". A NEW CODE REPLACES THE OLD ONE, A CODE WORKS
+# ONCE AND STOPS WORKING AFTER MAX_ATTEMPTS WRONG GUESSES
+#
+# A NEW CODE KEEPS THE WRONG GUESSES OF THE OLD ONE AND IS ONLY ISSUED ONCE PER
+# COOLDOWN PER EMAIL, SO ASKING FOR CODES AGAIN AND AGAIN DOES NOT GIVE MORE
+# GUESSES. IssueLimiter ALSO LIMITS THE CODES ONE IP ASKS FOR (PER WORKER)
+#
+# CONFIGURED FROM THE ENV FILE:
+#   OTP_MAX_PER_IP        CODES ONE IP CAN ASK FOR IN OTP_IP_WINDOW
+#   OTP_IP_WINDOW         SECONDS
+#   OTP_COOLDOWN          SECONDS BEFORE THE SAME EMAIL GETS A NEW CODE
+import os
+import hmac
+import time
+import threading
+import hashlib
+import secrets
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+
+# NAME OF THE COLLECTION HOLDING THE CODES
+COLLECTION = "Otp"
+
+# HOW LONG A CODE CAN BE USED (THE MAIL PROMISES IT)
+LIFETIME = timedelta(minutes=10)
+
+# TIME BEFORE THE SAME EMAIL CAN GET A NEW CODE
+COOLDOWN = timedelta(minutes=1)
+
+# WRONG CODES ALLOWED BEFORE THE CODE STOPS WORKING
+MAX_ATTEMPTS = 5
+
+# LENGTH OF A CODE
+DIGITS = 6
+
+# SHAPE EVERY CODE MUST HAVE (ENFORCED BY MONGODB)
+SCHEMA = {
+    "bsonType": "object",
+    "required": ["email", "code", "attempts", "expires"],
+    "properties": {
+        "email": {"bsonType": "string"},
+        "code": {"bsonType": "string"},
+        "attempts": {"bsonType": ["int", "long"], "minimum": 0},
+        "issued": {"bsonType": "date"},
+        "expires": {"bsonType": "date"},
+    },
+}
+
+
+# ONE CODE PER EMAIL, AND THE TTL INDEX REMOVING THE EXPIRED ONES
+def ensure_indexes(collection):
+    collection.create_index("email", unique=True, name="email_unique")
+    collection.create_index("expires", expireAfterSeconds=0, name="expires_ttl")
+
+
+# A NEW RANDOM CODE, E.G. "048213"
+def new_code():
+    return f"{secrets.randbelow(10**DIGITS):0{DIGITS}d}"
+
+
+# MONGODB SAVES THE DATES IN UTC WITHOUT A TIMEZONE
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _digest(secret, email, code):
+    return hmac.new(secret.encode(), f"{email}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+# SAVE A NEW CODE FOR THE EMAIL IN PLACE OF THE OLDER ONE (ONE WRITE). RETURNS
+# False WITHOUT SAVING IT WHEN THE OLDER ONE IS YOUNGER THAN COOLDOWN: THE FILTER
+# THEN MATCHES NOTHING AND THE UPSERT RUNS INTO THE UNIQUE INDEX ON "email"
+def issue(collection, secret, email, code, now=None, cooldown=COOLDOWN):
+    now = now or _now()
+    try:
+        collection.update_one(
+            {
+                "email": email,
+                "$or": [
+                    {"issued": {"$lte": now - cooldown}},
+                    {"issued": {"$exists": False}},
+                ],
+            },
+            {
+                "$set": {
+                    "code": _digest(secret, email, code),
+                    "issued": now,
+                    "expires": now + LIFETIME,
+                },
+                # THE WRONG GUESSES COUNT UNTIL THE LAST CODE EXPIRES
+                "$setOnInsert": {"attempts": 0},
+            },
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+# USE THE CODE. A RIGHT CODE IS CHECKED AND DELETED BY ONE find_one_and_delete,
+# A WRONG ONE COSTS ONE MORE WRITE TO COUNT THE ATTEMPT
+def redeem(collection, secret, email, code, now=None):
+    matched = collection.find_one_and_delete(
+        {
+            "email": email,
+            "code": _digest(secret, email, code),
+            "attempts": {"$lt": MAX_ATTEMPTS},
+            "expires": {"$gt": now or _now()},
+        },
+        projection={"_id": 1},
+    )
+    if matched is not None:
+        return True
+    collection.update_one({"email": email}, {"$inc": {"attempts": 1}})
+    return False
+
+
+class IssueLimiter:
+    # LIMITS THE CODES ONE IP ASKS FOR IN A SLIDING WINDOW (IN THIS WORKER), AND
+    # HOLDS THE COOLDOWN OF AN EMAIL GIVEN TO issue()
+    def __init__(self, per_ip=5, window=600, cooldown=COOLDOWN):
+        self.per_ip = per_ip
+        self.window = window
+        self.cooldown = cooldown
+        self._issued = {}
+        self._lock = threading.Lock()
+
+    # LIMITER CONFIGURED FROM THE ENV FILE
+    @classmethod
+    def from_env(cls):
+        return cls(
+            per_ip=int(os.environ.get("OTP_MAX_PER_IP", 5)),
+            window=float(os.environ.get("OTP_IP_WINDOW", 600)),
+            cooldown=timedelta(
+                seconds=float(os.environ.get("OTP_COOLDOWN", COOLDOWN.total_seconds()))
+            ),
+        )
+
+    # COUNT A REQUEST OF THE IP, False WHEN IT ALREADY ASKED FOR per_ip CODES
+    def allow(self, ip, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            issued = self._issued.setdefault(ip, deque())
+            while issued and issued[0] <= now - self.window:
+                issued.popleft()
+            if len(issued) >= self.per_ip:
+                return False
+            issued.append(now)
+            # FORGET THE IPS WITH NOTHING LEFT IN THE WINDOW
+            for other in [k for k, v in self._issued.items() if not v or v[-1] <= now - self.window]:
+                del self._issued[other]
+            return True
@@ -0,0 +1,139 @@
+# PASSWORD HASHING OFF THE REQUEST THREADS
+# THE HASHES ARE SLOW ON PURPOSE, SO THEY RUN ON A SMALL PROCESS POOL. A REQUEST
+# THREAD WAITS FOR ITS HASH, SO AT MOST "max_pending" HASHES RUN OR WAIT AT ONCE,
+# FEWER THAN THE THREADS OF A WORKER: A BURST OF LOGINS BEYOND THAT IS TURNED AWAY
+# RIGHT AWAY (Busy) AND AT LEAST ONE THREAD IS ALWAYS LEFT FOR THE OTHER ROUTES
+#
+# CONFIGURED FROM THE ENV FILE:
+#   PASSWORD_METHOD       WERKZEUG HASH METHOD AND COST, E.G. "scrypt:32768:8:1"
+#                         OR "pbkdf2:sha256:600000" (CHANGING IT REHASHES ON LOGIN)
+#   PASSWORD_WORKERS      PROCESSES HASHING PASSWORDS (0 HASHES IN THE REQUEST)
+#   PASSWORD_MAX_PENDING  HASHES ALLOWED AT ONCE PER WORKER (WEB_THREADS - 1, WITH
+#                         GEVENT 8 PER PASSWORD_WORKERS)
+#   LOGIN_MAX_PER_IP      LOGINS RUNNING AT THE SAME TIME FROM ONE IP
+#   LOGIN_MAX_PER_EMAIL   LOGINS RUNNING AT THE SAME TIME FOR ONE EMAIL
+import os
+import hmac
+import atexit
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# WERKZEUG'S DEFAULT METHOD
+METHOD = "scrypt:32768:8:1"
+
+
+class Busy(Exception):
+    # TOO MANY HASHES OR LOGINS ARE ALREADY RUNNING
+    pass
+
+
+# HASHES ALLOWED AT ONCE: ONE LESS THAN THE REQUEST THREADS OF A GUNICORN WORKER.
+# A GEVENT WORKER HAS NO THREADS TO KEEP FREE (A WAITING REQUEST ONLY HOLDS A
+# GREENLET), THERE IT IS THE HASHES ALLOWED TO QUEUE: 8 PER HASHING PROCESS
+def default_max_pending():
+    if os.environ.get("WEB_WORKER_CLASS") == "gevent":
+        return 8 * max(1, int(os.environ.get("PASSWORD_WORKERS", 2)))
+    return max(1, int(os.environ.get("WEB_THREADS", 4)) - 1)
+
+
+class PasswordHasher:
+    def __init__(self, method=METHOD, max_workers=2, max_pending=None, timeout=10):
+        self.method = method
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending or default_max_pending())
+        self._pool = None
+        self._prefix = None
+        self._lock = threading.Lock()
+
+    # HASHER CONFIGURED FROM THE ENV FILE
+    @classmethod
+    def from_env(cls):
+        return cls(
+            method=os.environ.get("PASSWORD_METHOD", METHOD),
+            max_workers=int(os.environ.get("PASSWORD_WORKERS", 2)),
+            max_pending=int(os.environ.get("PASSWORD_MAX_PENDING", default_max_pending())),
+        )
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # SPAWN SO THE WORKERS DO NOT INHERIT THE THREADS OF THE WEB SERVER
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                atexit.register(self.shutdown)
+            return self._pool
+
+    # RUN ONE HASH ON THE POOL (OR INLINE WITHOUT WORKERS)
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise Busy()
+        try:
+            if self.max_workers == 0:
+                return fn(*args)
+            return self._get_pool().submit(fn, *args).result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    # HASH A NEW PASSWORD WITH THE CONFIGURED METHOD
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    # CHECK A PASSWORD AGAINST THE SAVED HASH
+    def verify(self, password_hash, password):
+        if "$" not in password_hash:
+            # A PLAIN TEXT PASSWORD SAVED BY THE OLD RESET PASSWORD PAGE
+            return hmac.compare_digest(password_hash.encode(), password.encode())
+        return self._run(check_password_hash, password_hash, password)
+
+    # WAS THE HASH MADE WITH ANOTHER METHOD OR COST THAN THE CONFIGURED ONE
+    def needs_rehash(self, password_hash):
+        if self._prefix is None:
+            # WERKZEUG FILLS IN THE DEFAULT COST, ASK IT ONCE WHAT THE PREFIX LOOKS LIKE
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0] + "$"
+        return not password_hash.startswith(self._prefix)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+class LoginLimiter:
+    # LIMITS THE LOGINS RUNNING AT THE SAME TIME PER IP AND PER EMAIL
+    def __init__(self, per_ip=4, per_email=2):
+        self.per_ip = per_ip
+        self.per_email = per_email
+        self._active = {}
+        self._lock = threading.Lock()
+
+    # LIMITER CONFIGURED FROM THE ENV FILE
+    @classmethod
+    def from_env(cls):
+        return cls(
+            per_ip=int(os.environ.get("LOGIN_MAX_PER_IP", 4)),
+            per_email=int(os.environ.get("LOGIN_MAX_PER_EMAIL", 2)),
+        )
+
+    @contextlib.contextmanager
+    def hold(self, ip, email):
+        keys = [(("ip", ip), self.per_ip), (("email", email), self.per_email)]
+        with self._lock:
+            if any(self._active.get(key, 0) >= limit for key, limit in keys):
+                raise Busy()
+            for key, _ in keys:
+                self._active[key] = self._active.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for key, _ in keys:
+                    self._active[key] -= 1
+                    if self._active[key] == 0:
+                        del self._active[key]
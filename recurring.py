@@ -0,0 +1,451 @@
+# RECURRING EXPENSES AND BUDGET TOP UPS
+# A RULE REPEATS AN EXPENSE (RENT, A SUBSCRIPTION) OR A BUDGET TOP UP EVERY DAY, WEEK
+# OR MONTH FROM ITS START DATE, UNTIL ITS OPTIONAL END DATE
+#   {"user": EMAIL, "kind": "expense"|"budget", "title", "category", "amount",
+#    "every": "daily"|"weekly"|"monthly", "day": DAY OF MONTH, "next": DATETIME,
+#    "until": DATETIME, "pending": {"key", "from", "count"}}
+# "next" IS THE NEXT OCCURRENCE STILL TO WRITE (None ONCE THE RULE ENDED). A MONTHLY
+# RULE STARTED ON THE 31ST FALLS ON THE LAST DAY OF THE SHORTER MONTHS
+#
+# THE Scheduler WRITES THE DUE OCCURRENCES OF ALL THE USERS IN BATCHES OF RULES,
+# EVERY BATCH IS A FIXED NUMBER OF ROUND TRIPS WHATEVER ITS SIZE:
+#   1. CLAIM    ONE bulk_write MOVING "next" OF EVERY RULE PAST "now" AND SAVING WHAT
+#               IS BEING WRITTEN IN "pending", THEN THE CLAIMED RULES ARE READ BACK
+#               (A RULE DELETED MEANWHILE IS NOT CLAIMED)
+#   2. APPLY    ONE bulk_write ON THE USERS (spent, budget AND THE LAST FIVE EXPENSES,
+#               ONCE PER USER AND ONCE PER BATCH KEY), ONE ON THE EXPENSE BUCKETS
+#               AND ONE ON THE ROLLUPS
+#   3. SETTLE   ONE update_many CLEARING "pending"
+# THE DUE RULES OF THE USERS OF A BATCH ARE ALL TAKEN INTO IT, SO A USER IS UPDATED
+# ONCE PER RUN. A RULE BEHIND BY SEVERAL OCCURRENCES (THE SCHEDULER WAS DOWN) GETS
+# THEM ALL, UP TO CATCH_UP PER RUN: A RULE STILL DUE AFTER ITS CLAIM (AND THE OTHER
+# RULES OF ITS USER) WAIT FOR THE NEXT RUN. A BATCH LEFT "pending" BY A CRASH IS APPLIED
+# AGAIN BY THE NEXT RUN: THE USER UPDATE IS SKIPPED WHEN ITS KEY IS ALREADY IN "ops"
+# AND THE EXPENSES ALREADY WRITTEN (SAME "fp") ARE SKIPPED WITH THEIR ROLLUPS, A
+# CRASH BETWEEN THE BUCKETS AND THE ROLLUPS IS LEFT TO "python rollups.py --repair"
+#
+# ONE SCHEDULER RUNS AT A TIME: EVERY WORKER STARTS ONE, A LEASE IN THE "Scheduler"
+# COLLECTION LETS ONLY ONE OF THEM RUN. THE CLOCK IS A PARAMETER, A FAKE ONE CAN BE
+# MOVED BY HAND
+#
+# CONFIGURED FROM THE ENV FILE:
+#   RECURRING_SCHEDULER   0 TO NOT START THE SCHEDULER IN THE WEB WORKERS
+#   RECURRING_INTERVAL    SECONDS BETWEEN TWO RUNS
+#   RECURRING_BATCH_SIZE  RULES CLAIMED PER BATCH
+#   RECURRING_CATCH_UP    OCCURRENCES WRITTEN PER RULE AND RUN
+#
+#   python recurring.py           RUN THE SCHEDULER IN THE FOREGROUND
+#   python recurring.py --once    RUN ONCE AND PRINT WHAT WAS WRITTEN
+import os
+import uuid
+import socket
+import logging
+import argparse
+import threading
+import calendar
+from datetime import datetime, timedelta, timezone
+import pymongo
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+import expense_store
+import user_store
+import rollups
+
+# NAME OF THE COLLECTION HOLDING THE RULES
+COLLECTION = "Recurring"
+
+# NAME OF THE COLLECTION HOLDING THE LEASE OF THE SCHEDULER
+LOCK_COLLECTION = "Scheduler"
+
+KINDS = ("expense", "budget")
+PERIODS = ("daily", "weekly", "monthly")
+
+# RULES CLAIMED PER BATCH
+BATCH_SIZE = 1000
+
+# OCCURRENCES WRITTEN PER RULE AND RUN (A YEAR OF A DAILY RULE)
+CATCH_UP = 366
+
+# HOW LONG A RUN HOLDS THE LEASE WITHOUT RENEWING IT
+LEASE = timedelta(minutes=5)
+
+# SHAPE EVERY RULE MUST HAVE (ENFORCED BY MONGODB)
+SCHEMA = {
+    "bsonType": "object",
+    "required": ["user", "kind", "amount", "every", "day", "next"],
+    "properties": {
+        "user": {"bsonType": "string"},
+        "kind": {"enum": list(KINDS)},
+        "title": {"bsonType": "string"},
+        "category": {"bsonType": "string"},
+        "amount": {"bsonType": ["int", "long", "double"], "minimum": 0},
+        "every": {"enum": list(PERIODS)},
+        "day": {"bsonType": "int", "minimum": 1, "maximum": 31},
+        "next": {"bsonType": ["date", "null"]},
+        "until": {"bsonType": ["date", "null"]},
+        "pending": {"bsonType": "object"},
+    },
+}
+
+# FIELDS THE SCHEDULER READS
+RULE_FIELDS = {
+    "user": 1,
+    "kind": 1,
+    "title": 1,
+    "category": 1,
+    "amount": 1,
+    "every": 1,
+    "day": 1,
+    "next": 1,
+    "until": 1,
+    "pending": 1,
+}
+
+
+# THE DUE RULES BY DATE, THE RULES OF A USER, AND THE BATCHES LEFT PENDING
+def ensure_indexes(collection):
+    collection.create_index("next", name="next_due")
+    collection.create_index(
+        [("user", pymongo.ASCENDING), ("next", pymongo.ASCENDING)], name="user_next"
+    )
+    collection.create_index("pending.key", name="pending_key", sparse=True)
+
+
+# MONGODB SAVES THE DATES IN UTC WITHOUT A TIMEZONE
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# BUILD A NEW RULE, RAISES ValueError ON AN UNKNOWN KIND OR PERIOD
+def new_rule(email, kind, amount, every, start, title="", category="", until=None):
+    if kind not in KINDS or every not in PERIODS:
+        raise ValueError("Unknown Kind Or Period")
+    if amount < 0 or (until is not None and until < start):
+        raise ValueError("Invalid Amount Or End Date")
+    if kind == "expense" and (not title or not category):
+        raise ValueError("Missing Title Or Category")
+    return {
+        "_id": ObjectId(),
+        "user": email,
+        "kind": kind,
+        "title": title,
+        "category": category,
+        "amount": amount,
+        "every": every,
+        "day": start.day,
+        "next": start,
+        "until": until,
+    }
+
+
+def add_rule(collection, rule):
+    collection.insert_one(rule)
+
+
+# THE RULES OF A USER, THE ENDED ONES LAST
+def list_rules(collection, email):
+    rules = list(collection.find({"user": email}, {"pending": 0}))
+    rules.sort(key=lambda rule: (rule["next"] is None, rule["next"] or datetime.max))
+    return rules
+
+
+# DELETE A RULE OF THE USER, RETURNS True WHEN THERE WAS ONE
+def delete_rule(collection, email, rule_id):
+    return collection.delete_one({"_id": ObjectId(rule_id), "user": email}).deleted_count == 1
+
+
+# THE OCCURRENCE AFTER "current"
+def following(rule, current):
+    if rule["every"] == "daily":
+        return current + timedelta(days=1)
+    if rule["every"] == "weekly":
+        return current + timedelta(days=7)
+    year = current.year + current.month // 12
+    month = current.month % 12 + 1
+    return current.replace(
+        year=year, month=month, day=min(rule["day"], calendar.monthrange(year, month)[1])
+    )
+
+
+# OCCURRENCES FROM "start" THAT ARE DUE AT "now" (AT MOST "limit"), AND THE NEXT ONE
+# AFTER THEM (None WHEN THE RULE ENDED)
+def occurrences(rule, start, now, limit=CATCH_UP):
+    dates, current = [], start
+    until = rule.get("until")
+    while current is not None and current <= now and len(dates) < limit:
+        dates.append(current)
+        current = following(rule, current)
+        if until is not None and current > until:
+            current = None
+    return dates, current
+
+
+# THE SAME "count" OCCURRENCES FROM "start" AGAIN (TO APPLY A PENDING BATCH)
+def replay(rule, start, count):
+    dates, current = [], start
+    for _ in range(count):
+        dates.append(current)
+        current = following(rule, current)
+    return dates
+
+
+# FINGERPRINT OF ONE OCCURRENCE OF AN EXPENSE RULE
+def fingerprint(rule, date):
+    return f"recurring:{rule['_id']}:{date:%Y%m%d}"
+
+
+class Scheduler:
+    def __init__(
+        self,
+        collection,
+        userCollection,
+        expenseCollection,
+        rollupCollection,
+        lockCollection,
+        clock=utc_now,
+        interval=60,
+        batch_size=BATCH_SIZE,
+        catch_up=CATCH_UP,
+    ):
+        self.collection = collection
+        self.userCollection = userCollection
+        self.expenseCollection = expenseCollection
+        self.rollupCollection = rollupCollection
+        self.lockCollection = lockCollection
+        self.clock = clock
+        self.interval = interval
+        self.batch_size = batch_size
+        self.catch_up = catch_up
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread = None
+
+    # SCHEDULER OF A DATABASE CONFIGURED FROM THE ENV FILE
+    @classmethod
+    def from_env(cls, db, clock=utc_now):
+        return cls(
+            db[COLLECTION],
+            db[user_store.COLLECTION],
+            db[expense_store.COLLECTION],
+            db[rollups.COLLECTION],
+            db[LOCK_COLLECTION],
+            clock=clock,
+            interval=float(os.environ.get("RECURRING_INTERVAL", 60)),
+            batch_size=int(os.environ.get("RECURRING_BATCH_SIZE", BATCH_SIZE)),
+            catch_up=int(os.environ.get("RECURRING_CATCH_UP", CATCH_UP)),
+        )
+
+    # START THE BACKGROUND THREAD (AFTER GUNICORN FORKED THE WORKER), IT RUNS RIGHT
+    # AWAY TO CATCH UP AFTER A DOWNTIME AND THEN EVERY "interval" SECONDS
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="recurring", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run()
+            except Exception as e:
+                logging.error(f"Error Occured During The Recurring Run : {e}")
+            self._stop.wait(self.interval)
+
+    # TAKE OR RENEW THE LEASE, False WHEN ANOTHER SCHEDULER HOLDS IT
+    def _acquire(self, now):
+        try:
+            self.lockCollection.find_one_and_update(
+                {
+                    "_id": COLLECTION,
+                    "$or": [{"until": {"$lte": now}}, {"owner": self.owner}],
+                },
+                {"$set": {"owner": self.owner, "until": now + LEASE}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def _release(self, now):
+        self.lockCollection.update_one(
+            {"_id": COLLECTION, "owner": self.owner}, {"$set": {"until": now}}
+        )
+
+    # WRITE EVERYTHING DUE AT "now" (THE CLOCK BY DEFAULT), RETURNS THE COUNTS OR None
+    # WHEN ANOTHER SCHEDULER IS RUNNING
+    def run(self, now=None):
+        now = now or self.clock()
+        if not self._acquire(now):
+            return None
+        result = {"batches": 0, "rules": 0, "users": 0, "expenses": 0, "budgets": 0}
+        try:
+            # BATCHES A CRASHED RUN LEFT HALF WRITTEN
+            for key in self.collection.distinct("pending.key"):
+                self._apply(key, result, recovering=True)
+            # USERS WITH A RULE STILL DUE AFTER ITS CATCH_UP, DONE FOR THIS RUN
+            behind = set()
+            while True:
+                due = {"next": {"$lte": now}}
+                if behind:
+                    due["user"] = {"$nin": list(behind)}
+                rules = list(
+                    self.collection.find(due, RULE_FIELDS)
+                    .sort("next", pymongo.ASCENDING)
+                    .limit(self.batch_size)
+                )
+                if not rules:
+                    break
+                # THE OTHER DUE RULES OF THE SAME USERS
+                claimed = {rule["_id"] for rule in rules}
+                rules += [
+                    rule
+                    for rule in self.collection.find(
+                        {
+                            "user": {"$in": list({rule["user"] for rule in rules})},
+                            "next": {"$lte": now},
+                        },
+                        RULE_FIELDS,
+                    )
+                    if rule["_id"] not in claimed
+                ]
+                key, late = self._claim(rules, now)
+                behind.update(late)
+                self._apply(key, result)
+                if not self._acquire(self.clock()):
+                    # THE LEASE RAN OUT AND ANOTHER SCHEDULER TOOK OVER
+                    break
+        finally:
+            self._release(now)
+        if result["rules"]:
+            logging.info(f"Recurring Run Wrote {result}")
+        return result
+
+    # 1. MOVE "next" PAST "now" AND REMEMBER THE OCCURRENCES IN "pending", RETURNS THE
+    # KEY OF THE BATCH AND THE USERS WITH A RULE STILL DUE (MORE THAN CATCH_UP BEHIND)
+    def _claim(self, rules, now):
+        key = f"recurring:{uuid.uuid4().hex}"
+        requests = []
+        late = set()
+        for rule in rules:
+            dates, upcoming = occurrences(rule, rule["next"], now, self.catch_up)
+            if upcoming is not None and upcoming <= now:
+                late.add(rule["user"])
+            requests.append(
+                pymongo.UpdateOne(
+                    {"_id": rule["_id"], "next": rule["next"]},
+                    {
+                        "$set": {
+                            "next": upcoming,
+                            "pending": {"key": key, "from": rule["next"], "count": len(dates)},
+                        }
+                    },
+                )
+            )
+        self.collection.bulk_write(requests, ordered=False)
+        return key, late
+
+    # 2. WRITE THE USERS, THE BUCKETS AND THE ROLLUPS, 3. CLEAR "pending"
+    def _apply(self, key, result, recovering=False):
+        rules = list(self.collection.find({"pending.key": key}, RULE_FIELDS))
+        if not rules:
+            return
+        totals, expenses = {}, {}
+        for rule in rules:
+            pending = rule["pending"]
+            dates = replay(rule, pending["from"], pending["count"])
+            spent, budget = totals.get(rule["user"], (0, 0))
+            if rule["kind"] == "budget":
+                totals[rule["user"]] = (spent, budget + rule["amount"] * len(dates))
+                result["budgets"] += len(dates)
+                continue
+            totals[rule["user"]] = (spent + rule["amount"] * len(dates), budget)
+            for date in dates:
+                expense = expense_store.new_expense(
+                    date, rule["amount"], rule["title"], rule["category"]
+                )
+                expense["fp"] = fingerprint(rule, date)
+                expenses.setdefault(rule["user"], []).append(expense)
+
+        if recovering and expenses:
+            # SKIP THE EXPENSES THE CRASHED RUN ALREADY WROTE
+            written = set()
+            for bucket in self.expenseCollection.find(
+                {
+                    "user": {"$in": list(expenses)},
+                    "expenses.fp": {"$in": [e["fp"] for items in expenses.values() for e in items]},
+                },
+                {"_id": 0, "expenses.fp": 1},
+            ):
+                written.update(e.get("fp") for e in bucket["expenses"])
+            expenses = {
+                email: [e for e in items if e["fp"] not in written]
+                for email, items in expenses.items()
+            }
+            expenses = {email: items for email, items in expenses.items() if items}
+
+        self.userCollection.bulk_write(
+            [
+                user_store.totals_request(
+                    email,
+                    spent=spent,
+                    budget=budget,
+                    recent=[
+                        expense_store.public(e)
+                        for e in sorted(expenses.get(email, []), key=lambda e: e["date"])[
+                            -user_store.RECENT_SIZE :
+                        ]
+                    ],
+                    key=key,
+                )
+                for email, (spent, budget) in totals.items()
+            ],
+            ordered=False,
+        )
+        if expenses:
+            self.expenseCollection.bulk_write(
+                [
+                    request
+                    for email, items in expenses.items()
+                    for request in expense_store.bucket_requests(email, items)
+                ],
+                ordered=False,
+            )
+            rollups.record_many(self.rollupCollection, expenses)
+        self.collection.update_many({"pending.key": key}, {"$unset": {"pending": ""}})
+
+        result["batches"] += 1
+        result["rules"] += len(rules)
+        result["users"] += len(totals)
+        result["expenses"] += sum(len(items) for items in expenses.values())
+
+
+def main():
+    import database
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    db = database.get_database()
+    ensure_indexes(db[COLLECTION])
+    scheduler = Scheduler.from_env(db)
+    if args.once:
+        print(scheduler.run())
+        return
+    scheduler.start()
+    try:
+        while scheduler._thread.is_alive():
+            scheduler._thread.join(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+# PRECOMPUTED TOTALS OF THE EXPENSES
+# ONE DOCUMENT PER USER AND MONTH HOLDS THE TOTAL, THE TOTAL OF EVERY DAY AND THE
+# TOTAL AND COUNT OF EVERY CATEGORY. EVERY EXPENSE WRITE ADDS ITSELF WITH ONE
+# $inc, SO THE DASHBOARD AND THE CHART READ A FEW MONTH DOCUMENTS INSTEAD OF
+# UNWINDING THE WHOLE EXPENSE HISTORY
+#
+#   { user, month: "YYYY-MM", total, count,
+#     days: {"DD": amount}, categories: {"<name>": {amount, count}} }
+#
+# THE BUCKET WRITE AND THE ROLLUP WRITE ARE TWO UPDATES, SO A CRASH BETWEEN THEM
+# LEAVES A MONTH BEHIND. THE CHECKER COMPARES THE ROLLUPS WITH THE BUCKETS AND
+# THE REPAIR JOB REBUILDS THE MONTHS THAT DO NOT MATCH (OR EVERYTHING, AS A BACKFILL)
+#
+#   python rollups.py                CHECK EVERY USER AND REPORT THE MONTHS OFF
+#   python rollups.py --repair       ALSO REBUILD THOSE MONTHS
+#   python rollups.py --backfill     REBUILD EVERY MONTH OF EVERY USER
+#   python rollups.py --email EMAIL  ONLY ONE USER
+import logging
+import argparse
+import pymongo
+import expense_store
+
+# NAME OF THE COLLECTION HOLDING THE ROLLUPS
+COLLECTION = "Rollup"
+
+# SHAPE EVERY ROLLUP MUST HAVE (ENFORCED BY MONGODB)
+SCHEMA = {
+    "bsonType": "object",
+    "required": ["user", "month", "total", "count"],
+    "properties": {
+        "user": {"bsonType": "string"},
+        "month": {"bsonType": "string", "pattern": "^[0-9]{4}-[0-9]{2}$"},
+        "total": {"bsonType": ["int", "long", "double"]},
+        "count": {"bsonType": ["int", "long"]},
+        "days": {"bsonType": "object"},
+        "categories": {"bsonType": "object"},
+    },
+}
+
+
+# ONE ROLLUP PER USER AND MONTH, READ NEWEST FIRST
+def ensure_indexes(collection):
+    collection.create_index(
+        [("user", pymongo.ASCENDING), ("month", pymongo.DESCENDING)],
+        name="user_month",
+        unique=True,
+    )
+
+
+# CATEGORY NAMES ARE FIELD NAMES INSIDE "categories", SO "." AND "$" ARE ESCAPED
+def category_key(category):
+    return category.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def category_name(key):
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+# THE $inc OF EVERY MONTH TOUCHED BY THE EXPENSES
+def _increments(expenses):
+    months = {}
+    for expense in expenses:
+        month = expense_store.month_of(expense["date"])
+        category = category_key(expense["category"])
+        inc = months.setdefault(month, {})
+        for field, value in [
+            ("total", expense["amount"]),
+            ("count", 1),
+            (f"days.{expense['date'].day:02d}", expense["amount"]),
+            (f"categories.{category}.amount", expense["amount"]),
+            (f"categories.{category}.count", 1),
+        ]:
+            inc[field] = inc.get(field, 0) + value
+    return months
+
+
+# ADD NEW EXPENSES TO THE ROLLUPS (ONE UPSERT PER MONTH)
+def record(collection, email, expenses):
+    record_many(collection, {email: expenses})
+
+
+# ADD THE NEW EXPENSES OF MANY USERS ({EMAIL: EXPENSES}) IN ONE bulk_write
+def record_many(collection, expenses_by_user):
+    requests = [
+        pymongo.UpdateOne({"user": email, "month": month}, {"$inc": inc}, upsert=True)
+        for email, expenses in expenses_by_user.items()
+        for month, inc in _increments(expenses).items()
+    ]
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+
+
+# ROLLUPS OF THE USER FOR THE MONTHS IN THE RANGE, NEWEST FIRST
+def _months(collection, email, start_month=None, end_month=None, projection=None):
+    query = {"user": email}
+    if start_month or end_month:
+        query["month"] = {}
+        if start_month:
+            query["month"]["$gte"] = start_month
+        if end_month:
+            query["month"]["$lte"] = end_month
+    return collection.find(query, projection).sort("month", pymongo.DESCENDING)
+
+
+# PER DATE TOTALS OF THE LAST N DAYS THAT HAVE EXPENSES, OLDEST FIRST,
+# AS [["%Y-%m-%d", AMOUNT]]
+def daily_totals(collection, email, days=30):
+    result = []
+    for rollup in _months(collection, email, projection={"_id": 0, "month": 1, "days": 1}):
+        for day in sorted(rollup.get("days", {}), reverse=True):
+            amount = rollup["days"][day]
+            if amount:
+                result.append([f"{rollup['month']}-{day}", amount])
+            if len(result) == days:
+                break
+        if len(result) == days:
+            break
+    result.reverse()
+    return result
+
+
+# PER DATE TOTALS BETWEEN TWO DATES (BOTH INCLUDED), OLDEST FIRST
+def daily_range(collection, email, start, end):
+    first = expense_store.format_date(start)
+    last = expense_store.format_date(end)
+    result = []
+    cursor = _months(
+        collection,
+        email,
+        expense_store.month_of(start),
+        expense_store.month_of(end),
+        projection={"_id": 0, "month": 1, "days": 1},
+    )
+    for rollup in cursor:
+        for day, amount in rollup.get("days", {}).items():
+            date = f"{rollup['month']}-{day}"
+            if amount and first <= date <= last:
+                result.append([date, amount])
+    result.sort()
+    return result
+
+
+# TOTAL AND NUMBER OF EXPENSES PER CATEGORY, BIGGEST FIRST
+def category_totals(collection, email, start=None, end=None):
+    totals = {}
+    cursor = _months(
+        collection,
+        email,
+        expense_store.month_of(start) if start else None,
+        expense_store.month_of(end) if end else None,
+        projection={"_id": 0, "categories": 1},
+    )
+    for rollup in cursor:
+        for key, value in rollup.get("categories", {}).items():
+            total = totals.setdefault(category_name(key), {"amount": 0, "count": 0})
+            total["amount"] += value["amount"]
+            total["count"] += value["count"]
+    result = [
+        {"category": name, "amount": total["amount"], "count": total["count"]}
+        for name, total in totals.items()
+        if total["count"]
+    ]
+    result.sort(key=lambda row: (-row["amount"], row["category"]))
+    return result
+
+
+# TOTAL PER MONTH FOR THE LAST N MONTHS (OLDEST FIRST), OF ONE CATEGORY IF GIVEN
+def monthly_totals(collection, email, months=12, category=None):
+    if category is None:
+        cursor = _months(collection, email, projection={"_id": 0, "month": 1, "total": 1})
+        result = [
+            {"month": rollup["month"], "amount": rollup["total"]}
+            for rollup in cursor.limit(months)
+        ]
+    else:
+        field = f"categories.{category_key(category)}"
+        cursor = _months(collection, email, projection={"_id": 0, "month": 1, field: 1})
+        result = [
+            {
+                "month": rollup["month"],
+                "amount": rollup.get("categories", {})
+                .get(category_key(category), {})
+                .get("amount", 0),
+            }
+            for rollup in cursor.limit(months)
+        ]
+    result.reverse()
+    return result
+
+
+# THE ROLLUPS THE BUCKETS OF THE USER ADD UP TO, MONTH -> ROLLUP
+def compute(expenseCollection, email):
+    pipeline = [
+        {"$match": {"user": email}},
+        {"$unwind": "$expenses"},
+        {
+            "$group": {
+                "_id": {
+                    "month": "$month",
+                    "day": {"$dayOfMonth": "$expenses.date"},
+                    "category": "$expenses.category",
+                },
+                "amount": {"$sum": "$expenses.amount"},
+                "count": {"$sum": 1},
+            }
+        },
+    ]
+    months = {}
+    for row in expenseCollection.aggregate(pipeline, allowDiskUse=True):
+        key = row["_id"]
+        rollup = months.setdefault(
+            key["month"],
+            {
+                "user": email,
+                "month": key["month"],
+                "total": 0,
+                "count": 0,
+                "days": {},
+                "categories": {},
+            },
+        )
+        day = f"{key['day']:02d}"
+        category = category_key(key["category"])
+        rollup["total"] += row["amount"]
+        rollup["count"] += row["count"]
+        rollup["days"][day] = rollup["days"].get(day, 0) + row["amount"]
+        total = rollup["categories"].setdefault(category, {"amount": 0, "count": 0})
+        total["amount"] += row["amount"]
+        total["count"] += row["count"]
+    return months
+
+
+# MONTHS WHOSE ROLLUP DOES NOT MATCH THE BUCKETS (MISSING, STALE OR LEFT OVER)
+def check(expenseCollection, collection, email, expected=None):
+    if expected is None:
+        expected = compute(expenseCollection, email)
+    actual = {
+        rollup["month"]: rollup for rollup in _months(collection, email, projection={"_id": 0})
+    }
+    mismatched = []
+    for month in sorted(set(expected) | set(actual)):
+        want = expected.get(month)
+        have = actual.get(month)
+        if want is None or have is None or _normalize(want) != _normalize(have):
+            mismatched.append(month)
+    return mismatched
+
+
+# IGNORE THE DAYS AND CATEGORIES WHOSE TOTALS WENT BACK TO ZERO
+def _normalize(rollup):
+    return (
+        rollup.get("total", 0),
+        rollup.get("count", 0),
+        {day: amount for day, amount in rollup.get("days", {}).items() if amount},
+        {
+            key: value
+            for key, value in rollup.get("categories", {}).items()
+            if value.get("count")
+        },
+    )
+
+
+# REBUILD THE ROLLUPS OF THE USER FROM THE BUCKETS (ONLY "months" IF GIVEN)
+def rebuild(expenseCollection, collection, email, months=None, expected=None):
+    if expected is None:
+        expected = compute(expenseCollection, email)
+    if months is None:
+        months = set(expected) | {
+            rollup["month"] for rollup in _months(collection, email, projection={"month": 1})
+        }
+    requests = []
+    for month in months:
+        if month in expected:
+            requests.append(
+                pymongo.ReplaceOne(
+                    {"user": email, "month": month}, expected[month], upsert=True
+                )
+            )
+        else:
+            requests.append(pymongo.DeleteOne({"user": email, "month": month}))
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and repair the expense rollups")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--email", default=None)
+    parser.add_argument("--repair", action="store_true")
+    parser.add_argument("--backfill", action="store_true")
+    args = parser.parse_args()
+
+    import database
+
+    db = database.get_database(args.mongo_url)
+    database.bootstrap(db)
+    expenseCollection = db[expense_store.COLLECTION]
+    collection = db[COLLECTION]
+    emails = [args.email] if args.email else sorted(
+        set(expenseCollection.distinct("user")) | set(collection.distinct("user"))
+    )
+
+    users = broken = rebuilt = 0
+    for email in emails:
+        expected = compute(expenseCollection, email)
+        if args.backfill:
+            rebuilt += rebuild(expenseCollection, collection, email, expected=expected)
+            users += 1
+            continue
+        mismatched = check(expenseCollection, collection, email, expected)
+        users += 1
+        if mismatched:
+            broken += 1
+            print(f"{email}: {', '.join(mismatched)}")
+            logging.info(f"Rollups Out Of Date For {email} : {mismatched}")
+            if args.repair:
+                rebuilt += rebuild(
+                    expenseCollection, collection, email, mismatched, expected
+                )
+    print(f"Users: {users} Out Of Date: {broken} Months Rebuilt: {rebuilt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# SERVER SIDE SESSIONS
+# THE COOKIE ONLY CARRIES AN OPAQUE SESSION ID, THE SESSION DATA STAYS ON THE SERVER
+#
+#   SESSION_BACKEND=filesystem  FILES UNDER flask_session/ (DEFAULT)
+#   SESSION_BACKEND=memory      IN PROCESS CACHE, ONLY FOR A SINGLE PROCESS
+#   SESSION_BACKEND=redis       REDIS (OR ANY REDIS COMPATIBLE SERVER) AT SESSION_REDIS_URL
+#   SESSION_BACKEND=mongodb     THE "Session" COLLECTION OF THE APP'S OWN DATABASE
+#   SESSION_BACKEND=cookie      THE OLD SIGNED COOKIE HOLDING THE WHOLE SESSION
+#
+# STATELESS WORKERS (STATELESS=1) CAN NOT USE THE BACKENDS THAT KEEP THE SESSIONS ON
+# ONE MACHINE, THEY DEFAULT TO mongodb
+import os
+import pymongo
+
+# FOLDER OF THE FILESYSTEM SESSIONS
+SESSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "flask_session")
+
+# MAXIMUM NUMBER OF SESSIONS KEPT BY THE FILESYSTEM AND MEMORY BACKENDS
+SESSION_THRESHOLD = int(os.environ.get("SESSION_THRESHOLD", 10000))
+
+# BACKENDS WHOSE SESSIONS ARE ONLY SEEN BY ONE PROCESS OR ONE MACHINE
+LOCAL_BACKENDS = ["filesystem", "memory"]
+
+# COLLECTION OF THE mongodb BACKEND
+COLLECTION = "Session"
+
+
+# CONFIGURE THE SESSION BACKEND OF THE APP AND RETURN ITS NAME
+# "mongo_db" IS THE APP'S DATABASE, USED BY THE mongodb BACKEND
+def init_sessions(app, backend=None, redis_client=None, mongo_db=None, stateless=False):
+    backend = (
+        backend
+        or app.config.get("SESSION_BACKEND")
+        or os.environ.get("SESSION_BACKEND", "mongodb" if stateless else "filesystem")
+    )
+    if stateless and backend in LOCAL_BACKENDS:
+        raise ValueError(f"The {backend} Session Backend Can Not Be Shared By Stateless Workers")
+    if backend == "cookie":
+        return backend
+
+    from flask_session import Session
+
+    if backend == "filesystem":
+        from cachelib import FileSystemCache
+
+        app.config["SESSION_TYPE"] = "cachelib"
+        app.config["SESSION_CACHELIB"] = FileSystemCache(
+            SESSION_DIR, threshold=SESSION_THRESHOLD
+        )
+    elif backend == "memory":
+        from cachelib import SimpleCache
+
+        app.config["SESSION_TYPE"] = "cachelib"
+        app.config["SESSION_CACHELIB"] = SimpleCache(threshold=SESSION_THRESHOLD)
+    elif backend == "redis":
+        # A CLIENT CAN BE PASSED IN, E.G. A fakeredis STAND-IN FOR LOCAL RUNS
+        if redis_client is None:
+            import redis
+
+            redis_client = redis.from_url(
+                os.environ.get("SESSION_REDIS_URL", "redis://127.0.0.1:6379/0")
+            )
+        app.config["SESSION_TYPE"] = "redis"
+        app.config["SESSION_REDIS"] = redis_client
+    elif backend == "mongodb":
+        # EXPIRED SESSIONS ARE REMOVED BY A TTL INDEX FLASK-SESSION CREATES
+        if mongo_db is None or not isinstance(mongo_db.client, pymongo.MongoClient):
+            raise ValueError("The mongodb Session Backend Needs A MongoDB Server")
+        app.config["SESSION_TYPE"] = "mongodb"
+        app.config["SESSION_MONGODB"] = mongo_db.client
+        app.config["SESSION_MONGODB_DB"] = mongo_db.name
+        app.config["SESSION_MONGODB_COLLECT"] = COLLECTION
+    else:
+        raise ValueError(f"Unknown Session Backend : {backend}")
+
+    # LIKE THE COOKIE SESSION, FORGET THE LOGIN WHEN THE BROWSER IS CLOSED
+    app.config.setdefault("SESSION_PERMANENT", False)
+    Session(app)
+    return backend
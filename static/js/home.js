@@ -0,0 +1,144 @@
+//DASHBOARD SCRIPTS, THE VALUES OF THE PAGE COME FROM THE data-* ATTRIBUTES OF <body>
+//(THIS FILE IS THE SAME FOR EVERY USER, SO THE BROWSER KEEPS IT)
+document.addEventListener("DOMContentLoaded", () => {
+  const page = document.body.dataset;
+
+  //FOR ALERT ON OVER SPENDING
+  const expenseForm = document.getElementById("expenseForm");
+  if (expenseForm) {
+    expenseForm.addEventListener("submit", function (e) {
+      const budget = Number(page.budget);
+      const spent = Number(page.spent);
+      const amount = parseInt(document.getElementById("amount").value);
+
+      if (!isNaN(amount) && spent + amount > budget) {
+        const confirmMsg = "This expense will exceed your budget. Are you sure you want to continue?";
+        if (!confirm(confirmMsg)) {
+          e.preventDefault();
+        }
+      }
+    });
+  }
+
+  //FOR POP UP MESSASGE SHOEING
+  setTimeout(() => {
+    const messages = document.querySelectorAll(".flash-message");
+    messages.forEach((msg) => {
+      msg.style.opacity = "0";
+      setTimeout(() => msg.remove(), 500); // fully remove after fade-out
+    });
+  }, 3000);
+
+  //THE REST OF THE DASHBOARD IS ONLY SHOWN ONCE THERE IS A BUDGET
+  if (!expenseForm) return;
+
+  //DRAW THE BAR CHART FROM /api/chart_data (THE BROWSER REVALIDATES IT WITH THE ETAG)
+  const drawChart = (data) => {
+    const canvas = document.getElementById("expenseChart");
+    const ctx = canvas.getContext("2d");
+    const empty = data.values.length === 0;
+    canvas.hidden = empty;
+    document.getElementById("chartEmpty").hidden = !empty;
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    if (empty) return;
+    const left = 60, bottom = 90, top = 20;
+    const height = canvas.height - bottom - top;
+    const width = canvas.width - left - 10;
+    const max = Math.max(...data.values, 1);
+    const step = width / data.values.length;
+    ctx.font = "11px sans-serif";
+    ctx.fillStyle = "#333";
+    ctx.fillText("₹" + max, 5, top + 4);
+    ctx.fillText("₹0", 5, top + height);
+    data.values.forEach((value, i) => {
+      const barHeight = (value / max) * height;
+      const x = left + i * step;
+      ctx.fillStyle = "skyblue";
+      ctx.fillRect(x + step * 0.1, top + height - barHeight, step * 0.8, barHeight);
+      ctx.save();
+      ctx.translate(x + step / 2, top + height + 6);
+      ctx.rotate(Math.PI / 2);
+      ctx.fillStyle = "#333";
+      ctx.fillText(data.labels[i], 0, 0);
+      ctx.restore();
+    });
+  };
+  const loadChart = () => {
+    const group = document.getElementById("chartGroup").value;
+    const limit = group === "month" ? 12 : 30;
+    fetch(`${page.chartUrl}?group=${group}&limit=${limit}`)
+      .then((res) => res.json())
+      .then(drawChart);
+  };
+  document.getElementById("chartGroup").addEventListener("change", loadChart);
+  loadChart();
+
+  //FILL THE DASHBOARD WIDGETS FROM THE SERVER SIDE TOTALS
+  fetch(`${page.totalsUrl}?months=6`)
+    .then((res) => res.json())
+    .then((data) => {
+      const fill = (id, rows) => {
+        const table = document.getElementById(id);
+        rows.forEach(([label, amount]) => {
+          const row = table.insertRow();
+          row.insertCell().textContent = label;
+          row.insertCell().textContent = "₹" + amount;
+        });
+      };
+      fill("categoryTotals", (data.categories || []).map((c) => [c.category, c.amount]));
+      fill("monthlyTotals", (data.months || []).map((m) => [m.month, m.amount]));
+    });
+
+  //PAGE THROUGH /api/expenses, "Load More" ASKS FOR THE PAGE AFTER THE LAST ONE
+  let historyNext = null;
+  const loadHistory = (more) => {
+    const params = new URLSearchParams(new FormData(document.getElementById("historyForm")));
+    if (more) params.set("after", historyNext);
+    fetch(`${page.expensesUrl}?${params}`)
+      .then((res) => res.json())
+      .then((data) => {
+        const body = document.querySelector("#history tbody");
+        if (!more) body.replaceChildren();
+        (data.expenses || []).forEach((e) => {
+          const row = body.insertRow();
+          [e.date, "₹" + e.amount, e.title, e.category].forEach((value) => {
+            row.insertCell().textContent = value;
+          });
+        });
+        historyNext = data.next || null;
+        document.getElementById("historyMore").hidden = !historyNext;
+      });
+  };
+  document.getElementById("historyForm").addEventListener("submit", (event) => {
+    event.preventDefault();
+    loadHistory(false);
+  });
+  document.getElementById("historyMore").addEventListener("click", () => loadHistory(true));
+  loadHistory(false);
+
+  //LIST THE RECURRING RULES, EVERY ROW HAS ITS OWN REMOVE FORM
+  fetch(page.recurringUrl)
+    .then((res) => res.json())
+    .then((data) => {
+      const body = document.querySelector("#recurring tbody");
+      (data.rules || []).forEach((rule) => {
+        const row = body.insertRow();
+        const title = rule.kind === "budget" ? "Budget Top Up" : `${rule.title} (${rule.category})`;
+        [rule.next || "Ended", "₹" + rule.amount, title, rule.every].forEach((value) => {
+          row.insertCell().textContent = value;
+        });
+        const form = document.createElement("form");
+        form.method = "POST";
+        form.action = page.deleteRecurringUrl;
+        const id = document.createElement("input");
+        id.type = "hidden";
+        id.name = "id";
+        id.value = rule.id;
+        const button = document.createElement("button");
+        button.type = "submit";
+        button.textContent = "Remove";
+        form.append(id, button);
+        row.insertCell().append(form);
+      });
+    });
+});
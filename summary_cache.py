@@ -0,0 +1,229 @@
+# READ THROUGH CACHE OF THE DASHBOARD SUMMARIES
+# THE SESSION ONLY KEEPS WHO THE USER IS AND THE REVISION ("rev") OF ITS LAST WRITE,
+# THE SUMMARY (BUDGET, SPENT, BALANCE, LAST FIVE EXPENSES) IS KEPT HERE. AN ENTRY
+# OLDER THAN THE REVISION IN THE SESSION MISSED A WRITE MADE BY ANOTHER PROCESS AND
+# IS READ AGAIN
+#
+# THE WRITES OF THE OTHER WORKERS (OR ANOTHER DEVICE OF THE SAME USER) REACH THE
+# CACHE THROUGH THE Invalidator: A MONGODB CHANGE STREAM ON THE USERS, OR ON A
+# STANDALONE SERVER (NO CHANGE STREAMS) A POLL OF THE USERS UPDATED SINCE THE LAST
+# POLL. AN ENTRY NOT REFRESHED FOR "ttl" SECONDS IS READ AGAIN ANYWAY
+#
+# CONFIGURED FROM THE ENV FILE:
+#   SUMMARY_CACHE_SIZE          SUMMARIES KEPT PER WORKER
+#   SUMMARY_CACHE_TTL           SECONDS A SUMMARY IS SERVED WITHOUT READING IT AGAIN
+#   SUMMARY_CACHE_INVALIDATION  auto (STREAM, ELSE POLL), stream, poll OR off
+#   SUMMARY_CACHE_POLL_SECONDS  SECONDS BETWEEN TWO POLLS
+#   SUMMARY_CACHE_POLL_OVERLAP  SECONDS EVERY POLL READS AGAIN BEFORE THE LAST ONE
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import pymongo
+from pymongo.errors import OperationFailure, PyMongoError
+import metrics
+
+
+class SummaryCache:
+    # LEAST RECENTLY USED CACHE OF AT MOST max_size SUMMARIES (ALSO USED FOR THE
+    # ANALYTICS HISTORIES, "name" LABELS ITS LOOKUPS ON /metrics)
+    # AN ENTRY IS (REV, SUMMARY, LOADED AT). A SUMMARY OF None ONLY REMEMBERS THE
+    # NEWEST REVISION SEEN BY THE INVALIDATOR, SO AN OLDER LOAD IS NOT PUT BACK
+    def __init__(self, max_size=10000, ttl=300, name="summary"):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email, stamp):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[1] is None:
+                result = "miss"
+            elif entry[0] < stamp:
+                result = "stale"
+            elif time.monotonic() - entry[2] > self.ttl:
+                result = "expired"
+            else:
+                result = "hit"
+                self._entries.move_to_end(email)
+                self.hits += 1
+            if result != "hit":
+                self.misses += 1
+        metrics.SUMMARY_CACHE_LOOKUPS.inc(self.name, result)
+        return entry[1] if result == "hit" else None
+
+    def put(self, email, stamp, summary):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None and entry[0] > stamp:
+                # A NEWER SUMMARY WAS PUT (OR SEEN) WHILE THIS ONE WAS LOADED
+                return
+            self._set(email, (stamp, summary, time.monotonic()))
+
+    def _set(self, email, entry):
+        self._entries[email] = entry
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, email):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    # THE USER WAS WRITTEN AT REVISION "rev" (BY ANY WORKER). "written" IS WHEN, TO
+    # MEASURE HOW LONG THIS WORKER COULD HAVE SERVED THE OLD SUMMARY
+    def observe(self, email, rev, written=None):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None and entry[0] >= rev:
+                return
+            self._set(email, (rev, None, time.monotonic()))
+            dropped = entry is not None and entry[1] is not None
+        if dropped and written is not None:
+            lag = (datetime.now(timezone.utc).replace(tzinfo=None) - written).total_seconds()
+            metrics.SUMMARY_CACHE_LAG.observe(max(lag, 0.0))
+
+    # READ THE SUMMARY, LOADING IT WITH loader() WHEN IT IS NOT CACHED
+    def get_or_load(self, email, stamp, loader):
+        summary = self.get(email, stamp)
+        if summary is None:
+            summary = loader()
+            if summary is not None:
+                self.put(email, summary["rev"], summary)
+        return summary
+
+
+class Invalidator:
+    # BACKGROUND THREAD FEEDING THE REVISIONS WRITTEN BY EVERY WORKER INTO THE CACHE
+    def __init__(self, cache, collection, mode="auto", interval=1.0, overlap=5.0):
+        self.cache = cache
+        self.collection = collection
+        self.mode = mode
+        self.interval = interval
+        self.overlap = timedelta(seconds=overlap)
+        self._stop = threading.Event()
+        self._thread = None
+
+    # INVALIDATOR CONFIGURED FROM THE ENV FILE
+    @classmethod
+    def from_env(cls, cache, collection):
+        return cls(
+            cache,
+            collection,
+            mode=os.environ.get("SUMMARY_CACHE_INVALIDATION", "auto"),
+            interval=float(os.environ.get("SUMMARY_CACHE_POLL_SECONDS", 1)),
+            overlap=float(os.environ.get("SUMMARY_CACHE_POLL_OVERLAP", 5)),
+        )
+
+    # START THE THREAD (AFTER GUNICORN FORKED THE WORKER)
+    def start(self):
+        if self.mode == "off" or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="summary-invalidator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # MONGOMOCK HAS NO CHANGE STREAMS (ITS COLLECTIONS HAVE NO watch METHOD)
+        streams = hasattr(type(self.collection), "watch")
+        if self.mode in ("auto", "stream") and streams:
+            try:
+                self._watch()
+                return
+            except OperationFailure as e:
+                # A STANDALONE SERVER, CHANGE STREAMS NEED A REPLICA SET
+                if self.mode == "stream":
+                    logging.error(f"Summary Cache Change Stream Not Available : {e}")
+                    return
+                logging.info(f"Summary Cache Falls Back To Polling : {e}")
+        elif self.mode == "stream":
+            logging.info("Summary Cache Falls Back To Polling : No Change Streams")
+        self._poll()
+
+    # FOLLOW THE CHANGES OF THE REVISIONS, RESUMING AFTER A LOST CONNECTION
+    def _watch(self):
+        pipeline = [
+            {
+                "$match": {
+                    "$or": [
+                        {"operationType": "replace"},
+                        {
+                            "operationType": "update",
+                            "updateDescription.updatedFields.rev": {"$exists": True},
+                        },
+                    ]
+                }
+            },
+            {"$project": {"fullDocument.email": 1, "fullDocument.rev": 1, "wallTime": 1}},
+        ]
+        token = None
+        opened = False
+        while not self._stop.is_set():
+            try:
+                with self.collection.watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=token,
+                    max_await_time_ms=int(self.interval * 1000),
+                ) as stream:
+                    opened = True
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is not None:
+                            user = change.get("fullDocument") or {}
+                            if "email" in user:
+                                self.cache.observe(user["email"], user.get("rev", 0), change.get("wallTime"))
+                        token = stream.resume_token
+            except OperationFailure:
+                if not opened:
+                    raise
+                logging.error("Summary Cache Change Stream Failed, Reopening It")
+                self._stop.wait(self.interval)
+            except PyMongoError as e:
+                logging.error(f"Summary Cache Change Stream Failed, Reopening It : {e}")
+                self._stop.wait(self.interval)
+
+    # NEWEST updatedAt OF THE USERS, THE TIMES ARE SET BY MONGOD ($currentDate)
+    def _newest(self):
+        user = self.collection.find_one(
+            {"updatedAt": {"$exists": True}},
+            {"_id": 0, "updatedAt": 1},
+            sort=[("updatedAt", pymongo.DESCENDING)],
+        )
+        return user["updatedAt"] if user else datetime(1970, 1, 1)
+
+    # READ THE USERS UPDATED SINCE THE LAST POLL (THROUGH THE updatedAt INDEX). THE
+    # TIMES ARE THE SERVER'S, NOT THIS MACHINE'S, AND EVERY POLL GOES "overlap" BACK:
+    # A WRITE STAMPED BEFORE A NEWER ONE BUT COMMITTED AFTER IT IS STILL SEEN (THE
+    # USERS SEEN TWICE ARE SKIPPED BY observe, THEIR REVISION IS NOT NEWER)
+    def _poll(self):
+        since = None
+        while not self._stop.is_set():
+            try:
+                if since is None:
+                    since = self._newest()
+                else:
+                    newest = since
+                    for user in self.collection.find(
+                        {"updatedAt": {"$gte": since - self.overlap}},
+                        {"_id": 0, "email": 1, "rev": 1, "updatedAt": 1},
+                    ).sort("updatedAt", pymongo.ASCENDING):
+                        self.cache.observe(user["email"], user.get("rev", 0), user["updatedAt"])
+                        newest = max(newest, user["updatedAt"])
+                    since = newest
+            except PyMongoError as e:
+                logging.error(f"Summary Cache Poll Failed : {e}")
+            self._stop.wait(self.interval)
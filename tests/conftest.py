@@ -0,0 +1,64 @@
+# SHARED FIXTURES OF THE TESTS
+#
+#   pip install -r requirements-dev.txt
+#   python -m pytest
+#
+# EVERYTHING RUNS ON MONGOMOCK: THE STORE TESTS GET AN EMPTY DATABASE EACH, THE
+# ROUTE TESTS SHARE ONE APP AND TELL THEIR DATA APART BY A NEW USER PER TEST
+import os
+import sys
+import uuid
+import pytest
+import mongomock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# SET BEFORE THE APP IS IMPORTED: NO REAL DATABASE, SESSIONS OR BACKGROUND JOBS
+os.environ["mongo_url"] = "mongomock://"
+os.environ["SESSION_BACKEND"] = "memory"
+os.environ["PASSWORD_WORKERS"] = "0"
+os.environ["RECURRING_SCHEDULER"] = "0"
+os.environ["LOGIN_MAX_PER_IP"] = "1000"
+os.environ["JINJA_CACHE_DIR"] = "off"
+
+
+# AN EMPTY DATABASE WITH THE INDEXES OF EVERY COLLECTION
+@pytest.fixture
+def db():
+    import expense_store
+    import otp_store
+    import recurring
+
+    database = mongomock.MongoClient()["ExpenseTracker"]
+    expense_store.ensure_indexes(database[expense_store.COLLECTION])
+    otp_store.ensure_indexes(database[otp_store.COLLECTION])
+    recurring.ensure_indexes(database[recurring.COLLECTION])
+    return database
+
+
+@pytest.fixture(scope="session")
+def application(tmp_path_factory):
+    import application
+
+    application.create_app(
+        {
+            "TESTING": True,
+            "SECRET_KEY": "tests",
+            "LOG_FILE": str(tmp_path_factory.mktemp("logs") / "Logs.log"),
+        }
+    )
+    return application
+
+
+# A TEST CLIENT LOGGED IN AS A NEW USER WITH A BUDGET, AND ITS EMAIL
+@pytest.fixture
+def user(application):
+    email = f"test-{uuid.uuid4().hex}@example.com"
+    client = application.app.test_client()
+    client.post(
+        "/register",
+        data={"name": "Test", "email": email, "password": "pw", "confirm_password": "pw"},
+    )
+    client.post("/", data={"email": email, "password": "pw"})
+    client.post("/add_budget", data={"budget_amount": "1000"})
+    return client, email
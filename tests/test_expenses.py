@@ -0,0 +1,81 @@
+# ADDING AN EXPENSE: ONCE PER IDEMPOTENCY KEY, AND NOTHING LEFT BEHIND WHEN IT FAILS
+import analytics
+import expense_store
+import rollups
+import user_store
+
+EXPENSE = {"title": "Lunch", "amount": "250", "category": "Food", "date": "2025-01-15"}
+
+
+def saved_expenses(application, email):
+    return [
+        expense
+        for bucket in application.expenseCollection.find({"user": email})
+        for expense in bucket["expenses"]
+    ]
+
+
+def test_retried_post_is_saved_once(application, user):
+    client, email = user
+    for _ in range(3):
+        client.post("/add_expense", data=dict(EXPENSE, op="key-1"))
+
+    summary = user_store.find_summary(application.userCollection, email)
+    assert summary["spent"] == 250
+    assert len(summary["expenses"]) == 1
+    assert len(saved_expenses(application, email)) == 1
+    assert rollups.check(application.expenseCollection, application.rollupCollection, email) == []
+
+
+def test_posts_with_other_keys_are_all_saved(application, user):
+    client, email = user
+    client.post("/add_expense", data=dict(EXPENSE, op="key-1"))
+    client.post("/add_expense", data=dict(EXPENSE, op="key-2"))
+
+    assert user_store.find_summary(application.userCollection, email)["spent"] == 500
+    assert len(saved_expenses(application, email)) == 2
+
+
+def test_failed_user_update_takes_the_expense_back(application, user, monkeypatch):
+    client, email = user
+
+    def down(*args, **kwargs):
+        raise RuntimeError("Database Down")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(user_store, "record_expense", down)
+        client.post("/add_expense", data=dict(EXPENSE, op="key-1"))
+    assert saved_expenses(application, email) == []
+    assert user_store.find_summary(application.userCollection, email)["spent"] == 0
+
+    # THE RETRY OF THE SAME POST IS SAVED
+    client.post("/add_expense", data=dict(EXPENSE, op="key-1"))
+    assert len(saved_expenses(application, email)) == 1
+    assert user_store.find_summary(application.userCollection, email)["spent"] == 250
+
+
+def test_history_cached_under_the_new_revision_has_the_expense(application, user, monkeypatch):
+    client, email = user
+    # AN /api/analytics OF ANOTHER WORKER AFTER EVERY WRITE OF THE POST: IT CACHES
+    # THE HISTORY UNDER THE REVISION THE USER HAS AT THAT MOMENT
+    def analytics_request():
+        rev = user_store.find_summary(application.userCollection, email)["rev"]
+        if application.analyticsCache.get(email, rev) is None:
+            application.analyticsCache.put(
+                email, rev, analytics.load(application.expenseCollection, email)
+            )
+
+    def then_analytics(write):
+        def wrapper(*args, **kwargs):
+            result = write(*args, **kwargs)
+            analytics_request()
+            return result
+
+        return wrapper
+
+    monkeypatch.setattr(expense_store, "add_expense", then_analytics(expense_store.add_expense))
+    monkeypatch.setattr(user_store, "record_expense", then_analytics(user_store.record_expense))
+    client.post("/add_expense", data=dict(EXPENSE, op="key-1"))
+
+    rev = user_store.find_summary(application.userCollection, email)["rev"]
+    assert len(application.analyticsCache.get(email, rev)) == 1
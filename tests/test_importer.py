@@ -0,0 +1,69 @@
+# BULK IMPORT: DUPLICATES SKIPPED, TOTALS COUNTED ONCE ACROSS A FAILED AND A REPEATED IMPORT
+import pytest
+import expense_store
+import importer
+import user_store
+
+EMAIL = "import@example.com"
+
+
+def rows(prefix, dates):
+    return [
+        {"date": date, "amount": 10, "title": f"{prefix}{n}", "category": "Food"}
+        for n, date in enumerate(dates)
+    ]
+
+
+def run(db, rows):
+    return importer.import_expenses(
+        db[user_store.COLLECTION], db[expense_store.COLLECTION], EMAIL, rows, batch_size=4
+    )
+
+
+def state(db):
+    user = user_store.find_summary(db[user_store.COLLECTION], EMAIL)
+    count = sum(bucket["count"] for bucket in db[expense_store.COLLECTION].find({"user": EMAIL}))
+    return user["spent"], count, [e["date"] for e in user["expenses"]]
+
+
+@pytest.fixture
+def june(db):
+    user_store.create_user(db[user_store.COLLECTION], "Test", EMAIL, "hash")
+    return rows("june", [f"2025-06-{day:02d}" for day in range(1, 11)])
+
+
+def test_duplicates_in_the_upload_and_in_the_database_are_skipped(db, june):
+    result = run(db, june + june[:3])
+    assert (result["imported"], result["duplicates"]) == (10, 3)
+    result = run(db, june)
+    assert (result["imported"], result["duplicates"]) == (0, 10)
+    assert state(db)[:2] == (100, 10)
+
+
+def test_old_statement_keeps_the_latest_recent_expenses(db, june):
+    run(db, june)
+    latest = state(db)[2]
+    run(db, rows("old", [f"2020-01-{day:02d}" for day in range(1, 9)]))
+    assert state(db) == (180, 18, latest)
+
+
+def test_import_again_after_a_failed_bucket_write(db, june, monkeypatch):
+    real = expense_store.bucket_requests
+    calls = []
+
+    def second_fails(email, expenses):
+        calls.append(email)
+        if len(calls) == 2:
+            raise RuntimeError("Database Down")
+        return real(email, expenses)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(expense_store, "bucket_requests", second_fails)
+        with pytest.raises(RuntimeError):
+            run(db, june)
+    # THE SECOND BATCH IS COUNTED ON THE USER BUT NOT IN THE BUCKETS
+    assert state(db)[:2] == (80, 4)
+
+    result = run(db, june)
+    assert (result["imported"], result["duplicates"]) == (6, 4)
+    assert state(db)[:2] == (100, 10)
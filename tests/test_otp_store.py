@@ -0,0 +1,61 @@
+# RESET CODES: ONE USE, A FEW WRONG GUESSES, AN EXPIRY AND A COOLDOWN ON NEW CODES
+from datetime import timedelta
+import otp_store
+
+SECRET = "tests"
+EMAIL = "reset@example.com"
+
+
+# THE TTL INDEX OF MONGOMOCK DELETES BY THE REAL CLOCK, SO THE TESTS START FROM NOW
+def issued(db, code="123456"):
+    now = otp_store._now()
+    assert otp_store.issue(db[otp_store.COLLECTION], SECRET, EMAIL, code, now=now)
+    return db[otp_store.COLLECTION], now
+
+
+def test_right_code_works_once(db):
+    collection, now = issued(db)
+    assert otp_store.redeem(collection, SECRET, EMAIL, "123456", now=now)
+    assert not otp_store.redeem(collection, SECRET, EMAIL, "123456", now=now)
+
+
+def test_only_the_hmac_is_saved(db):
+    collection, _ = issued(db)
+    assert "123456" not in collection.find_one({"email": EMAIL})["code"]
+
+
+def test_code_stops_working_after_max_attempts(db):
+    collection, now = issued(db)
+    for _ in range(otp_store.MAX_ATTEMPTS):
+        assert not otp_store.redeem(collection, SECRET, EMAIL, "000000", now=now)
+    assert not otp_store.redeem(collection, SECRET, EMAIL, "123456", now=now)
+
+
+def test_expired_code_is_refused(db):
+    collection, now = issued(db)
+    later = now + otp_store.LIFETIME + timedelta(seconds=1)
+    assert not otp_store.redeem(collection, SECRET, EMAIL, "123456", now=later)
+
+
+def test_new_code_waits_for_the_cooldown_and_keeps_the_attempts(db):
+    collection, now = issued(db)
+    otp_store.redeem(collection, SECRET, EMAIL, "000000", now=now)
+
+    soon = now + otp_store.COOLDOWN / 2
+    assert not otp_store.issue(collection, SECRET, EMAIL, "654321", now=soon)
+    assert otp_store.redeem(collection, SECRET, EMAIL, "123456", now=soon)
+
+    collection, now = issued(db)
+    otp_store.redeem(collection, SECRET, EMAIL, "000000", now=now)
+    later = now + otp_store.COOLDOWN
+    assert otp_store.issue(collection, SECRET, EMAIL, "654321", now=later)
+    assert collection.find_one({"email": EMAIL})["attempts"] == 1
+    assert not otp_store.redeem(collection, SECRET, EMAIL, "123456", now=later)
+    assert otp_store.redeem(collection, SECRET, EMAIL, "654321", now=later)
+
+
+def test_issue_limiter_counts_per_ip_in_its_window():
+    limiter = otp_store.IssueLimiter(per_ip=2, window=10)
+    assert [limiter.allow("1.1.1.1", now=t) for t in (0, 1, 2)] == [True, True, False]
+    assert limiter.allow("2.2.2.2", now=2)
+    assert limiter.allow("1.1.1.1", now=11)
@@ -0,0 +1,76 @@
+# THE SCHEDULER WRITES EVERY DUE OCCURRENCE ONCE, ALSO WHEN A RUN CRASHED HALF WAY
+from datetime import datetime, timedelta
+import pytest
+import expense_store
+import recurring
+import rollups
+import user_store
+
+EMAIL = "recurring@example.com"
+NOW = datetime(2025, 3, 10, 12)
+
+
+@pytest.fixture
+def scheduler(db):
+    user_store.create_user(db[user_store.COLLECTION], "Test", EMAIL, "hash")
+    rules = db[recurring.COLLECTION]
+    recurring.add_rule(
+        rules,
+        recurring.new_rule(EMAIL, "expense", 5, "daily", datetime(2025, 3, 1), "Coffee", "Food"),
+    )
+    recurring.add_rule(rules, recurring.new_rule(EMAIL, "budget", 100, "weekly", datetime(2025, 3, 1)))
+    return recurring.Scheduler.from_env(db, clock=lambda: NOW)
+
+
+def state(db):
+    user = user_store.find_summary(db[user_store.COLLECTION], EMAIL)
+    expenses = [
+        e for bucket in db[expense_store.COLLECTION].find({"user": EMAIL}) for e in bucket["expenses"]
+    ]
+    mismatched = rollups.check(db[expense_store.COLLECTION], db[rollups.COLLECTION], EMAIL)
+    return user["spent"], user["budget"], len(expenses), mismatched
+
+
+def test_run_writes_every_due_occurrence_once(db, scheduler):
+    result = scheduler.run()
+    assert result["expenses"] == 10 and result["budgets"] == 2
+    assert state(db) == (50, 200, 10, [])
+    assert scheduler.run()["rules"] == 0
+    assert state(db) == (50, 200, 10, [])
+
+
+def test_run_after_a_crash_finishes_the_pending_batch(db, scheduler, monkeypatch):
+    # THE CRASH COMES AFTER THE USERS WERE UPDATED, BEFORE THE BUCKETS
+    with monkeypatch.context() as patch:
+
+        def crash(*args):
+            raise RuntimeError("Worker Killed")
+
+        patch.setattr(expense_store, "bucket_requests", crash)
+        with pytest.raises(RuntimeError):
+            scheduler.run()
+    assert state(db)[:3] == (50, 200, 0)
+    assert db[recurring.COLLECTION].count_documents({"pending": {"$exists": True}}) == 2
+
+    # THE NEXT RUN WRITES THE EXPENSES, THE USER UPDATE IS NOT APPLIED AGAIN
+    result = scheduler.run()
+    assert result["expenses"] == 10
+    assert state(db) == (50, 200, 10, [])
+    assert db[recurring.COLLECTION].count_documents({"pending": {"$exists": True}}) == 0
+
+
+def test_claimed_batch_is_applied_by_the_next_run(db, scheduler):
+    rules = list(db[recurring.COLLECTION].find({}, recurring.RULE_FIELDS))
+    scheduler._claim(rules, NOW)
+    assert state(db)[:3] == (0, 0, 0)
+
+    scheduler.run()
+    assert state(db) == (50, 200, 10, [])
+
+
+def test_scheduler_waits_for_the_lease_of_another(db, scheduler):
+    other = recurring.Scheduler.from_env(db, clock=lambda: NOW)
+    assert other._acquire(NOW)
+    assert scheduler.run() is None
+    other._release(NOW)
+    assert scheduler.run()["expenses"] == 10
@@ -0,0 +1,50 @@
+# THE CHECKER FINDS THE MONTHS WHOSE ROLLUP DOES NOT MATCH THE BUCKETS, THE REPAIR
+# REBUILDS THEM
+from datetime import datetime
+import expense_store
+import rollups
+
+EMAIL = "rollups@example.com"
+
+
+def add(db, date, amount, category="Food", rollup=True):
+    expense = expense_store.new_expense(date, amount, "Expense", category)
+    expense_store.add_expense(db[expense_store.COLLECTION], EMAIL, expense)
+    if rollup:
+        rollups.record(db[rollups.COLLECTION], EMAIL, [expense])
+
+
+def check(db):
+    return rollups.check(db[expense_store.COLLECTION], db[rollups.COLLECTION], EMAIL)
+
+
+def test_rollups_written_with_the_expenses_match(db):
+    add(db, datetime(2025, 1, 5), 100)
+    add(db, datetime(2025, 1, 5), 50, "Rent")
+    add(db, datetime(2025, 2, 1), 20)
+    assert check(db) == []
+
+
+def test_missing_stale_and_left_over_months_are_found_and_repaired(db):
+    add(db, datetime(2025, 1, 5), 100)
+    add(db, datetime(2025, 2, 1), 20, rollup=False)
+    db[rollups.COLLECTION].update_one({"user": EMAIL, "month": "2025-01"}, {"$inc": {"total": 1}})
+    db[rollups.COLLECTION].insert_one(
+        {"user": EMAIL, "month": "2024-12", "total": 5, "count": 1, "days": {}, "categories": {}}
+    )
+    assert check(db) == ["2024-12", "2025-01", "2025-02"]
+
+    rollups.rebuild(db[expense_store.COLLECTION], db[rollups.COLLECTION], EMAIL, months=check(db))
+    assert check(db) == []
+    assert db[rollups.COLLECTION].find_one({"month": "2024-12"}) is None
+
+
+def test_expense_taken_back_is_found_until_rebuilt(db):
+    add(db, datetime(2025, 1, 5), 100)
+    expense = expense_store.new_expense(datetime(2025, 1, 6), 30, "Expense", "Taxi")
+    expense_store.add_expense(db[expense_store.COLLECTION], EMAIL, expense)
+    rollups.record(db[rollups.COLLECTION], EMAIL, [expense])
+    expense_store.remove_expense(db[expense_store.COLLECTION], EMAIL, expense)
+    assert check(db) == ["2025-01"]
+    rollups.rebuild(db[expense_store.COLLECTION], db[rollups.COLLECTION], EMAIL)
+    assert check(db) == []
@@ -0,0 +1,203 @@
+# USER DATA ACCESS
+# EVERY QUERY ASKS MONGODB ONLY FOR THE FIELDS THE VIEW NEEDS, SO THE PASSWORD HASH
+# AND THE OLDER EXPENSES NEVER LEAVE THE SERVER
+#
+# EVERY CHANGE OF THE TOTALS IS ONE find_one_and_update THAT ALSO BUMPS "rev", THE
+# REVISION OF THE USER. A FORM POST CARRIES AN IDEMPOTENCY KEY: THE UPDATE ONLY
+# MATCHES WHEN THE KEY IS NOT IN "ops" YET AND PUSHES IT THERE, SO A RETRIED POST IS
+# APPLIED ONCE. A WRITE THAT MUST NOT OVERWRITE A CHANGE THE USER HAS NOT SEEN
+# (RESET) ALSO MATCHES ON THE "rev" THE PAGE WAS RENDERED WITH
+#
+# EVERY WRITE ALSO SETS "updatedAt" (SERVER TIME), THE CACHE OF THE SUMMARIES POLLS
+# ON IT WHEN THE SERVER HAS NO CHANGE STREAMS
+import pymongo
+import expense_store
+
+# NAME OF THE COLLECTION HOLDING THE USERS
+COLLECTION = "User"
+
+# NUMBER OF EXPENSES SHOWN ON THE HOME PAGE
+RECENT_SIZE = 5
+
+# NUMBER OF IDEMPOTENCY KEYS REMEMBERED PER USER
+OPS_SIZE = 20
+
+# FIELDS NEEDED TO BUILD THE SESSION SUMMARY
+SUMMARY_PROJECTION = {
+    "_id": 0,
+    "name": 1,
+    "email": 1,
+    "budget": 1,
+    "spent": 1,
+    "rev": 1,
+    "recent": {"$slice": -RECENT_SIZE},
+}
+
+# THE LOGIN ALSO NEEDS THE PASSWORD HASH TO VERIFY THE USER
+LOGIN_PROJECTION = dict(SUMMARY_PROJECTION, password=1)
+
+
+# SHAPE EVERY USER DOCUMENT MUST HAVE (ENFORCED BY MONGODB)
+SCHEMA = {
+    "bsonType": "object",
+    "required": ["name", "email", "password", "budget", "spent"],
+    "properties": {
+        "name": {"bsonType": "string"},
+        "email": {"bsonType": "string"},
+        "password": {"bsonType": "string"},
+        "budget": {"bsonType": ["int", "long", "double"]},
+        "spent": {"bsonType": ["int", "long", "double"]},
+        "recent": {"bsonType": "array", "maxItems": RECENT_SIZE},
+        "rev": {"bsonType": ["int", "long"], "minimum": 0},
+        "ops": {"bsonType": "array", "maxItems": OPS_SIZE},
+        "updatedAt": {"bsonType": "date"},
+    },
+}
+
+
+# ONE USER PER EMAIL, ALSO THE INDEX OF EVERY LOOKUP BY EMAIL, AND THE USERS BY LAST
+# WRITE FOR THE POLL OF THE SUMMARY CACHE
+def ensure_indexes(collection):
+    collection.create_index("email", unique=True, name="email_unique")
+    collection.create_index("updatedAt", name="updated_at")
+
+
+# BUILD THE DASHBOARD SUMMARY SAVED IN THE SESSION FROM A PROJECTED USER DOCUMENT
+def to_summary(user):
+    return {
+        "name": user["name"],
+        "email": user["email"],
+        "budget": user["budget"],
+        "spent": user["spent"],
+        "balance": user["budget"] - user["spent"],
+        "rev": user.get("rev", 0),
+        "expenses": [
+            dict(e, date=expense_store.format_date(e["date"]))
+            for e in user.get("recent", [])
+        ],
+    }
+
+
+# SAVE A NEW USER (RAISES DuplicateKeyError WHEN THE EMAIL IS ALREADY REGISTERED)
+def create_user(collection, name, email, password_hash):
+    collection.insert_one(
+        {
+            "name": name,
+            "email": email,
+            "password": password_hash,
+            "recent": [],
+            "budget": 0,
+            "spent": 0,
+            "rev": 0,
+            "ops": [],
+        }
+    )
+
+
+# SAVE A NEW PASSWORD HASH
+def set_password(collection, email, password_hash):
+    collection.update_one({"email": email}, {"$set": {"password": password_hash}})
+
+
+# IS THERE A USER WITH THIS EMAIL (READS ONLY THE INDEX ENTRY AND THE _id)
+def exists(collection, email):
+    return collection.find_one({"email": email}, {"_id": 1}) is not None
+
+
+# FETCH THE USER FOR THE LOGIN (SUMMARY FIELDS + PASSWORD HASH)
+def find_for_login(collection, email):
+    return collection.find_one({"email": email}, LOGIN_PROJECTION)
+
+
+# FETCH ONLY THE DASHBOARD SUMMARY OF THE USER
+def find_summary(collection, email):
+    user = collection.find_one({"email": email}, SUMMARY_PROJECTION)
+    return to_summary(user) if user else None
+
+
+class Conflict(Exception):
+    # THE USER CHANGED SINCE THE PAGE WAS RENDERED, NOTHING WAS WRITTEN
+    pass
+
+
+# QUERY AND UPDATE OF A WRITE: BUMP "rev" AND "updatedAt", AND WITH A KEY ONLY MATCH
+# WHEN THE KEY WAS NOT USED YET AND REMEMBER IT
+def _versioned(email, update, key=None):
+    query = {"email": email}
+    update = dict(update)
+    update["$inc"] = dict(update.get("$inc", {}), rev=1)
+    update["$currentDate"] = {"updatedAt": True}
+    if key is not None:
+        query["ops"] = {"$ne": key}
+        update["$push"] = dict(
+            update.get("$push", {}), ops={"$each": [key], "$slice": -OPS_SIZE}
+        )
+    return query, update
+
+
+# APPLY AN UPDATE AND BUILD THE SUMMARY FROM THE WRITE RESULT WITHOUT RE-READING
+# RETURNS (SUMMARY, APPLIED). APPLIED IS FALSE WHEN THE KEY WAS ALREADY USED, THEN
+# THE SUMMARY IS READ AGAIN. RAISES Conflict WHEN "rev" IS NOT THE CURRENT REVISION
+def _update_summary(collection, email, update, key=None, rev=None):
+    query, update = _versioned(email, update, key)
+    if rev is not None:
+        query["rev"] = rev
+    user = collection.find_one_and_update(
+        query,
+        update,
+        # WITH THE _id MONGOMOCK READS THE UPDATED DOCUMENT BACK BY _id, NOT BY THE
+        # QUERY (WHICH NO LONGER MATCHES ONCE THE KEY IS IN "ops")
+        projection=dict(SUMMARY_PROJECTION, _id=1),
+        return_document=pymongo.ReturnDocument.AFTER,
+    )
+    if user is not None:
+        return to_summary(user), True
+    # NOTHING MATCHED: FIND OUT WHY (ONLY ON THE RETRY OR CONFLICT PATH)
+    user = collection.find_one({"email": email}, dict(SUMMARY_PROJECTION, ops=1))
+    if user is None:
+        return None, False
+    if key is not None and key in user.get("ops", []):
+        return to_summary(user), False
+    raise Conflict()
+
+
+# ADD THE EXPENSE TO THE TOTAL AND TO THE LAST FIVE EXPENSES
+def record_expense(collection, email, expense, key=None):
+    return _update_summary(
+        collection,
+        email,
+        {
+            "$push": {"recent": {"$each": [expense], "$slice": -RECENT_SIZE}},
+            "$inc": {"spent": expense["amount"]},
+        },
+        key=key,
+    )
+
+
+# MOVE THE USER TO A NEW REVISION WITHOUT CHANGING ANYTHING ELSE, SO THE COPIES
+# CACHED UNDER THE OLD ONE ARE NOT USED ANY MORE
+def touch(collection, email):
+    collection.update_one(*_versioned(email, {}))
+
+
+# ONE UPDATE OF A bulk_write ADDING TO THE SPENT AMOUNT AND THE BUDGET OF A USER AND
+# TO ITS LAST FIVE EXPENSES (NEWEST LAST), APPLIED ONCE PER KEY
+def totals_request(email, spent=0, budget=0, recent=(), key=None):
+    update = {"$inc": {"spent": spent, "budget": budget}}
+    if recent:
+        update["$push"] = {"recent": {"$each": list(recent), "$slice": -RECENT_SIZE}}
+    query, update = _versioned(email, update, key)
+    return pymongo.UpdateOne(query, update)
+
+
+# ADD THE AMOUNT TO THE BUDGET
+def add_budget(collection, email, amount, key=None):
+    return _update_summary(collection, email, {"$inc": {"budget": amount}}, key=key)
+
+
+# RESET THE BUDGET AND THE SPENT AMOUNT (THE EXPENSES ARE KEPT), ONLY IF THE USER
+# IS STILL AT REVISION "rev" WHEN IT IS GIVEN
+def reset_totals(collection, email, rev=None):
+    return _update_summary(
+        collection, email, {"$set": {"budget": 0, "spent": 0}}, rev=rev
+    )
@@ -0,0 +1,14 @@
+# PRODUCTION ENTRY POINT
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# WITH WEB_PRELOAD=1 GUNICORN LOADS THIS MODULE ONCE IN THE MASTER: THE IMPORTS AND
+# THE TEMPLATES ARE WARMED UP BEFORE THE FORK AND EVERY WORKER OPENS ITS OWN
+# DATABASE CONNECTION AND THREADS IN THE post_fork HOOK (gunicorn.conf.py)
+import os
+from application import create_app, warm_up
+
+if os.environ.get("WEB_PRELOAD") == "1":
+    app = warm_up()
+else:
+    app = create_app()